@@ -0,0 +1,284 @@
+"""
+Benchmarks for receive path: LineBuffer framing, MessageParser and BotRunner dispatch.
+
+Run from repository root:
+
+    python -m benchmarks.run                                  # print results as JSON
+    python -m benchmarks.run --output results/HEAD.json       # save results
+    python -m benchmarks.run --compare results/main.json      # compare against saved results
+
+Measured for every scenario of benchmarks.traffic:
+    parse_lines_per_sec: Message.from_bytes(...) + reading params, parser alone
+    pipeline_lines_per_sec: socket sized chunks fed through LineBuffer, parsed and dispatched
+                            to handlers of real BotRunner i.e what run_forever does per read
+    alloc_peak_bytes_per_line: average of tracemalloc peak while one line is parsed and dispatched.
+                               CPython doesn't count allocations in release builds so memory
+                               high-water mark is used as allocation pressure proxy
+    handler_p50_us/handler_p99_us: latency of single handler call, timed by BotRunner._dispatch
+
+Throughput is best of --repeat runs (after one warm-up run), it is the least noisy estimate on busy machine.
+Compare only results produced on the same machine with same --lines and --seed.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.traffic import SCENARIOS, generate, to_chunks
+from src.client import IRCClient
+from src.line_buffer import LineBuffer
+from src.parsing import Message, MessageParser
+from src.runner import BotRunner
+
+NICK = "benchbot"
+
+# metric name and whether bigger value is better
+METRICS: dict[str, bool] = {
+    "parse_lines_per_sec": True,
+    "pipeline_lines_per_sec": True,
+    "alloc_peak_bytes_per_line": False,
+    "handler_p50_us": False,
+    "handler_p99_us": False,
+}
+
+
+class _LatencySamples:
+    """Stands in for Histogram in dispatch table and keeps every observation"""
+
+    def __init__(self):
+        self.samples: list[float] = []
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * percentile / 100), len(ordered) - 1)]
+
+
+def _create_runner(config_dir: str) -> tuple[BotRunner, _LatencySamples]:
+    config_path = os.path.join(config_dir, "config.json")
+    with open(config_path, "w") as fp:
+        json.dump(
+            {
+                "NICK": NICK,
+                "SERVER": "127.0.0.1",
+                "PORT": 6667,
+                "IDENT": NICK,
+                "REALNAME": NICK,
+                "CHAN": ["#chan0", "#chan1"],
+                "PROXY_SERVER": "",
+                "PROXY_PORT": 0,
+            },
+            fp,
+        )
+
+    client = IRCClient(config_path=config_path)
+    # handlers queue replies (e.g PONG) which require connection, nothing is actually sent
+    client.is_connected = True
+    runner = BotRunner(client)
+
+    latency = _LatencySamples()
+    for entries in runner._dispatch_table.values():
+        entries[:] = [(handler, latency) for handler, _ in entries]
+
+    return runner, latency
+
+
+def _bench_parse(lines: list[bytes], repeat: int) -> float:
+    from_bytes = Message.from_bytes
+    best = float("inf")
+    # first round only warms up caches
+    for round in range(repeat + 1):
+        gc.collect()
+        started = time.perf_counter()
+        for line in lines:
+            from_bytes(line).params
+        if round:
+            best = min(best, time.perf_counter() - started)
+
+    return len(lines) / best
+
+
+def _bench_pipeline(
+    runner: BotRunner, chunks: list[bytes], line_count: int, repeat: int
+) -> float:
+    best = float("inf")
+    for round in range(repeat + 1):
+        buffer = LineBuffer()
+        runner.client.send_queue.clear()
+        gc.collect()
+        started = time.perf_counter()
+        for chunk in chunks:
+            buffer.feed(chunk)
+            for msg in MessageParser.parse_lines(buffer.lines()):
+                runner._dispatch(msg)
+        if round:
+            best = min(best, time.perf_counter() - started)
+
+    return line_count / best
+
+
+def _bench_alloc(runner: BotRunner, lines: list[bytes]) -> float:
+    runner.client.send_queue.clear()
+    total = 0
+    tracemalloc.start()
+    try:
+        for line in lines:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            runner._dispatch(Message.from_bytes(line))
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    return total / len(lines)
+
+
+def run_scenario(name: str, line_count: int, seed: int, repeat: int) -> dict:
+    lines = generate(name, line_count, NICK, seed)
+    chunks = to_chunks(lines)
+
+    with tempfile.TemporaryDirectory() as config_dir, open(
+        os.devnull, "w"
+    ) as devnull, contextlib.redirect_stdout(devnull):
+        # some handlers print, don't let terminal speed affect results
+        runner, latency = _create_runner(config_dir)
+        try:
+            parse_rate = _bench_parse(lines, repeat)
+            pipeline_rate = _bench_pipeline(runner, chunks, line_count, repeat)
+            samples = list(latency.samples)
+            alloc = _bench_alloc(runner, lines)
+        finally:
+            runner.client.socket.close()
+
+    return {
+        "parse_lines_per_sec": round(parse_rate),
+        "pipeline_lines_per_sec": round(pipeline_rate),
+        "alloc_peak_bytes_per_line": round(alloc, 1),
+        "handler_calls": len(samples),
+        "handler_p50_us": round(_percentile(samples, 50) * 1e6, 2),
+        "handler_p99_us": round(_percentile(samples, 99) * 1e6, 2),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return result.stdout.strip()
+
+
+def compare(old: dict, new: dict, max_regression: float | None) -> bool:
+    """Prints change of every metric. Returns False if any metric regressed over max_regression %"""
+    ok = True
+    print(f"{'scenario':<18} {'metric':<28} {'old':>12} {'new':>12} {'change':>8}")
+    for scenario, results in new["scenarios"].items():
+        old_results = old["scenarios"].get(scenario)
+        if old_results is None:
+            continue
+
+        for metric, higher_is_better in METRICS.items():
+            before, after = old_results.get(metric), results[metric]
+            if not before:
+                continue
+
+            change = (after - before) / before * 100
+            regression = -change if higher_is_better else change
+            flag = ""
+            if max_regression is not None and regression > max_regression:
+                flag = "  REGRESSION"
+                ok = False
+
+            print(
+                f"{scenario:<18} {metric:<28} {before:>12} {after:>12} {change:>+7.1f}%{flag}"
+            )
+
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="scenario to run, can be given multiple times (default: all)",
+    )
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON into this file")
+    parser.add_argument(
+        "--compare", help="JSON results of earlier run to compare against"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="with --compare exit with status 1 if any metric got worse by more than this %%",
+    )
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "lines": args.lines,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "scenarios": {
+            name: run_scenario(name, args.lines, args.seed, args.repeat)
+            for name in args.scenario or SCENARIOS
+        },
+    }
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if not args.compare:
+        if not args.output:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+        return 0
+
+    with open(args.compare, "r") as fp:
+        old = json.load(fp)
+
+    for key in ("lines", "seed"):
+        if old["meta"].get(key) != results["meta"][key]:
+            print(
+                f"WARNING: {key} differs from compared run, results are not comparable"
+            )
+
+    return 0 if compare(old, results, args.max_regression) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
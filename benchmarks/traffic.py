@@ -0,0 +1,190 @@
+"""
+Synthetic IRC traffic for benchmarks.
+
+Every scenario is generated from seeded random.Random so that same seed and line count always
+produce byte for byte same traffic. This is what makes results of different commits comparable.
+
+Style guide: scenarios are plain functions taking (rng, nick, lines) and returning list of raw
+             lines without trailing \\r\\n. Register new scenarios in SCENARIOS, keep existing
+             ones unchanged so that old results stay comparable.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import random
+import string
+
+from collections.abc import Callable
+
+SERVER = "irc.bench.example"
+CHANNELS = [f"#chan{i}" for i in range(8)]
+
+
+def _nick(rng: random.Random) -> str:
+    return rng.choice(string.ascii_letters) + "".join(
+        rng.choices(string.ascii_letters + string.digits + "_-[]", k=rng.randint(2, 14))
+    )
+
+
+def _source(rng: random.Random) -> str:
+    nick = _nick(rng)
+    return f"{nick}!~{nick[:9].lower()}@{rng.randint(1, 254)}.host{rng.randint(1, 99)}.example"
+
+
+def _text(rng: random.Random, min_words: int = 3, max_words: int = 30) -> str:
+    words = (
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 10)))
+        for _ in range(rng.randint(min_words, max_words))
+    )
+    return " ".join(words)
+
+
+def ping_mix(rng: random.Random, nick: str, lines: int) -> list[bytes]:
+    """Quiet connection: keepalive PING/PONG with occasional chatter in between"""
+    result: list[bytes] = []
+    for _ in range(lines):
+        roll = rng.random()
+        if roll < 0.4:
+            line = f"PING :{SERVER}"
+        elif roll < 0.6:
+            line = f":{SERVER} PONG {SERVER} :rtt-{rng.getrandbits(40)}"
+        else:
+            line = f":{_source(rng)} PRIVMSG {rng.choice(CHANNELS)} :{_text(rng)}"
+
+        result.append(line.encode())
+
+    return result
+
+
+def names_who_burst(rng: random.Random, nick: str, lines: int) -> list[bytes]:
+    """JOIN burst: RPL_NAMREPLY (353) and RPL_WHOREPLY (352) listings of big channels"""
+    result: list[bytes] = []
+    while len(result) < lines:
+        channel = rng.choice(CHANNELS)
+        for _ in range(rng.randint(5, 40)):
+            names = " ".join(
+                rng.choice(("", "", "", "+", "@")) + _nick(rng)
+                for _ in range(rng.randint(10, 30))
+            )
+            result.append(f":{SERVER} 353 {nick} = {channel} :{names}".encode())
+        result.append(f":{SERVER} 366 {nick} {channel} :End of /NAMES list.".encode())
+
+        for _ in range(rng.randint(20, 80)):
+            other = _nick(rng)
+            result.append(
+                (
+                    f":{SERVER} 352 {nick} {channel} ~{other[:9].lower()} "
+                    f"{rng.randint(1, 254)}.host.example {SERVER} {other} "
+                    f"{rng.choice(('H', 'G', 'H@', 'H+'))} :0 {_text(rng, 1, 3)}"
+                ).encode()
+            )
+        result.append(f":{SERVER} 315 {nick} {channel} :End of /WHO list.".encode())
+
+    return result[:lines]
+
+
+def mode_storm(rng: random.Random, nick: str, lines: int) -> list[bytes]:
+    """Netsplit/takeover style flood of channel MODE changes, some of them targeting the bot"""
+    result: list[bytes] = []
+    for _ in range(lines):
+        flag = rng.choice(("+o", "-o", "+v", "-v", "+b", "-b"))
+        if flag[1] == "b":
+            param = f"*!*@{rng.randint(1, 254)}.host.example"
+        elif rng.random() < 0.1:
+            param = nick
+        else:
+            param = _nick(rng)
+
+        result.append(
+            f":{_source(rng)} MODE {rng.choice(CHANNELS)} {flag} {param}".encode()
+        )
+
+    return result
+
+
+def privmsg_flood(rng: random.Random, nick: str, lines: int) -> list[bytes]:
+    """Busy channels: PRIVMSG/NOTICE from many users, none of which bot handles"""
+    return [
+        (
+            f":{_source(rng)} {rng.choice(('PRIVMSG', 'PRIVMSG', 'PRIVMSG', 'NOTICE'))} "
+            f"{rng.choice(CHANNELS)} :{_text(rng)}"
+        ).encode()
+        for _ in range(lines)
+    ]
+
+
+def _tag_value(rng: random.Random, length: int) -> str:
+    # include characters which must be escaped in tag values
+    alphabet = string.ascii_letters + string.digits + "\\; "
+    value = "".join(rng.choices(alphabet, k=length))
+    return value.replace("\\", "\\\\").replace(";", "\\:").replace(" ", "\\s")
+
+
+def tagged_lines(rng: random.Random, nick: str, lines: int) -> list[bytes]:
+    """IRCv3 tagged messages with long tag sections (server-time, msgid, client tags)"""
+    result: list[bytes] = []
+    for _ in range(lines):
+        tags = [
+            f"time=2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T1{rng.randint(0, 9)}:"
+            f"{rng.randint(10, 59)}:{rng.randint(10, 59)}.{rng.randint(100, 999)}Z",
+            f"msgid={rng.getrandbits(128):032x}",
+            f"account={_nick(rng)}",
+        ]
+        # client tags can make tag section several kilobytes long
+        for i in range(rng.randint(1, 12)):
+            tags.append(f"+example.com/tag{i}={_tag_value(rng, rng.randint(10, 300))}")
+
+        command = rng.choice(("PRIVMSG", "PRIVMSG", "TAGMSG", "TOPIC"))
+        trailing = "" if command == "TAGMSG" else f" :{_text(rng, 5, 60)}"
+        result.append(
+            f"@{';'.join(tags)} :{_source(rng)} {command} {rng.choice(CHANNELS)}{trailing}".encode()
+        )
+
+    return result
+
+
+def mixed(rng: random.Random, nick: str, lines: int) -> list[bytes]:
+    """Weighted blend of all other scenarios interleaved in small runs"""
+    weights = (
+        (privmsg_flood, 50),
+        (ping_mix, 10),
+        (names_who_burst, 20),
+        (mode_storm, 10),
+        (tagged_lines, 10),
+    )
+    result: list[bytes] = []
+    while len(result) < lines:
+        (scenario,) = rng.choices(
+            [scenario for scenario, _ in weights], [weight for _, weight in weights]
+        )
+        result.extend(scenario(rng, nick, rng.randint(1, 50)))
+
+    return result[:lines]
+
+
+SCENARIOS: dict[str, Callable[[random.Random, str, int], list[bytes]]] = {
+    "ping_mix": ping_mix,
+    "names_who_burst": names_who_burst,
+    "mode_storm": mode_storm,
+    "privmsg_flood": privmsg_flood,
+    "tagged_lines": tagged_lines,
+    "mixed": mixed,
+}
+
+
+def generate(
+    name: str, lines: int, nick: str = "benchbot", seed: int = 0
+) -> list[bytes]:
+    """Generates lines of scenario. Same arguments always produce same lines"""
+    return SCENARIOS[name](random.Random(f"{name}:{seed}"), nick, lines)
+
+
+def to_chunks(lines: list[bytes], chunk_size: int = 4096) -> list[bytes]:
+    """
+    Joins lines into stream and splits it into chunks of chunk_size like socket reads would,
+    so chunk boundaries rarely match line boundaries
+    """
+    stream = b"".join(line + b"\r\n" for line in lines)
+    return [stream[i : i + chunk_size] for i in range(0, len(stream), chunk_size)]
@@ -0,0 +1,230 @@
+import asyncio
+import selectors
+import socket
+import sys
+import time
+
+from src.client import IRCClient, require_connection
+from src.send_queue import Priority
+from src.tls import TLSContext
+from src.warm_restart import StateSnapshot
+
+
+async def wait_socket(sock: socket.socket, event: int) -> None:
+    """Waits until sock is ready for event (selectors.EVENT_READ or EVENT_WRITE)"""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    fd = sock.fileno()
+    if event & selectors.EVENT_READ:
+        add, remove = loop.add_reader, loop.remove_reader
+    else:
+        add, remove = loop.add_writer, loop.remove_writer
+    add(fd, lambda: ready.done() or ready.set_result(None))
+    try:
+        await ready
+    finally:
+        remove(fd)
+
+
+class AsyncIRCClient(IRCClient):
+    """
+    asyncio variant of IRCClient. Connection is handled with asyncio streams on top of
+    non-blocking TrackingSocket so that traffic logging works exactly like in IRCClient.
+
+    All command methods (pong, join_channels, query_self, ...) are inherited as is and stay
+    synchronous. They only put lines into send queue, AsyncBotRunner's sender task flushes
+    the queue into the stream. Only methods which wait for network or time are coroutines.
+    """
+
+    def __init__(self, proxy: bool = False, config_path: str = "./config.json"):
+        super().__init__(proxy=proxy, config_path=config_path)
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        # set whenever line is queued so that sender task wakes up
+        self.send_event: asyncio.Event = asyncio.Event()
+        # set when connect(...) has looked for standby proxy connection
+        self.proxy_standby_taken: asyncio.Event = asyncio.Event()
+
+    def _send(self, line: str, priority: Priority = Priority.NORMAL) -> None:
+        super()._send(line, priority)
+        self.send_event.set()
+
+    def _write_line(self, line: str) -> None:
+        if self._writer is None:
+            raise RuntimeError("Stream is not open, connect before sending anything")
+
+        self._writer.write(f"{line}\r\n".encode("utf-8"))
+
+    async def connect(self):  # type: ignore[override]
+        """Connects to current server without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        self.socket.setblocking(False)
+        if self.proxy is None:
+            connecting = loop.sock_connect(self.socket, (self.server, self.port))
+        else:
+            connecting = self._connect_through_proxy()
+        try:
+            await asyncio.wait_for(connecting, self.settings.connect_timeout)
+        except asyncio.TimeoutError as err:
+            raise TimeoutError(
+                f"timed out after {self.settings.connect_timeout}s"
+            ) from err
+
+        if self.tls_context is None:
+            self._reader, self._writer = await asyncio.open_connection(sock=self.socket)
+        else:
+            await self._start_tls_stream(self.tls_context)
+        self._mark_connected()
+
+    async def _connect_through_proxy(self) -> None:
+        """Same as proxy part of IRCClient.connect(...) but waits on the event loop"""
+        started = time.perf_counter()
+        negotiation = self._begin_proxy_connect()
+        # standby has been used up (or found dropped), new one can be warmed up right away
+        self.proxy_standby_taken.set()
+        try:
+            while event := negotiation.step():
+                await wait_socket(negotiation.sock, event)
+        except BaseException:
+            negotiation.sock.close()
+            raise
+        self._finish_proxy_connect(negotiation, time.perf_counter() - started)
+        self.socket.setblocking(False)
+
+    async def _start_tls_stream(self, context: TLSContext) -> None:
+        """
+        Opens stream with TLS over connected socket. Handshake runs on the event loop
+        (asyncio does TLS over memory buffers), TrackingSSLObject logs plaintext so
+        logging of the socket itself is turned off.
+        """
+        self.socket.track_traffic = False
+        started = time.perf_counter()
+        self._reader, self._writer = await asyncio.open_connection(
+            sock=self.socket,
+            ssl=context,
+            server_hostname=self.server,
+            ssl_handshake_timeout=self.settings.connect_timeout,
+        )
+        tls = self._writer.get_extra_info("ssl_object")
+        if tls is not None:
+            context.record_handshake(tls, time.perf_counter() - started)
+
+    async def drain(self) -> None:
+        """Waits until written data has been flushed to the socket"""
+        if self._writer is None or not self.is_connected:
+            return
+
+        try:
+            await self._writer.drain()
+        except ConnectionError:
+            self.is_connected = False
+
+    async def reconnect(self):  # type: ignore[override]
+        """
+        Same as IRCClient.reconnect(...) except that waiting is done with asyncio.sleep
+        so other tasks on the loop keep running while bot waits.
+        """
+        self._prepare_reconnect()
+        await self.close()
+        self._reset_connection_state()
+
+        while True:
+            await asyncio.sleep(self._next_reconnect_delay())
+            self.socket = self._create_socket()
+            try:
+                await self.connect()
+            except OSError as err:
+                print(
+                    f"Connecting to {self.server}:{self.port} failed: {err}",
+                    file=sys.stderr,
+                )
+                self.socket.close()
+                self._rotate_server()
+                continue
+
+            self.send_credentials()
+            return
+
+    async def resume_session(self, snapshot: StateSnapshot) -> None:  # type: ignore[override]
+        """Same as IRCClient.resume_session(...) but opens stream on the adopted socket"""
+        super().resume_session(snapshot)
+        self.socket.setblocking(False)
+        self._reader, self._writer = await asyncio.open_connection(sock=self.socket)
+
+    async def prepare_handoff(self) -> list[bytes]:
+        """
+        Gets connection ready to be handed over to another process: stops reading, waits until
+        written data has reached the socket and moves data stream has already read from the
+        socket into receive buffer. Returns complete lines found there, caller must dispatch
+        them before exporting state. Unread data stays in the socket for the next owner.
+        """
+        if self._reader is None or self._writer is None:
+            return []
+
+        transport = self._writer.transport
+        transport.pause_reading()
+        while transport.get_write_buffer_size() and not transport.is_closing():
+            await asyncio.sleep(0.01)
+
+        while True:
+            # reading is paused so read returns right away until stream's buffer is empty
+            try:
+                chunk = await asyncio.wait_for(self._reader.read(16384), 0.05)
+            except asyncio.TimeoutError:
+                break
+
+            if not chunk:
+                self.is_connected = False
+                break
+
+            self._recv_buffer.feed(chunk)
+
+        return list(self._recv_buffer.lines())
+
+    def abort_handoff(self) -> None:
+        """Continues reading after prepare_handoff(...) when connection stays in this process"""
+        if self._writer is not None:
+            self._writer.transport.resume_reading()
+
+    async def close(self):  # type: ignore[override]
+        """Closes the stream and updates connection status"""
+        writer, self._writer, self._reader = self._writer, None, None
+        self.is_connected = False
+        self.is_registered = False
+        self._pending_pings.clear()
+        if writer is None:
+            self.socket.close()
+            return
+
+        if self.tls_context is not None:
+            tls = writer.get_extra_info("ssl_object")
+            if tls is not None:
+                self.tls_context.remember(tls)
+
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    @require_connection
+    async def receive_message(self) -> list[bytes]:  # type: ignore[override]
+        """
+        Waits for data from server and returns every complete line received so far.
+        Partial lines are kept in receive buffer same way as in IRCClient.receive_message(...)
+
+        NOTE: If server has closed the connection empty list is returned and is_connected is set to False.
+        """
+        assert self._reader is not None
+        try:
+            chunk = await self._reader.read(16384)
+        except ConnectionError:
+            chunk = b""
+
+        if not chunk:
+            self.is_connected = False
+            return []
+
+        self._last_received_at = time.monotonic()
+        self._recv_buffer.feed(chunk)
+        return list(self._recv_buffer.lines())
@@ -0,0 +1,274 @@
+import asyncio
+import signal
+import sys
+
+from collections.abc import Coroutine
+from typing import Any
+
+from src.async_client import AsyncIRCClient, wait_socket
+from src.calendar_sync import CalendarSync
+from src.parsing import Message, MessageParser
+from src.runner import BotRunner, _on_response
+from src.topic_scheduler import TopicScheduler
+
+
+class AsyncBotRunner(BotRunner):
+    """
+    asyncio variant of BotRunner. Handlers (and their decorators) are inherited from BotRunner
+    as is, only the main loop differs. Additional periodic work (calendar polling, topic
+    scheduling, ...) can be run on the same event loop by registering it with add_task(...)
+    before calling run_forever().
+
+    NOTE: handlers are still synchronous functions, they must not block. If handler needs to wait
+          for something it should schedule a task instead.
+    """
+
+    def __init__(
+        self,
+        client: AsyncIRCClient,
+        topic_scheduler: TopicScheduler | None = None,
+        calendar_sync: CalendarSync | None = None,
+    ):
+        super().__init__(client, topic_scheduler, calendar_sync)
+        self.client: AsyncIRCClient = client
+        self._background: list[Coroutine[Any, Any, None]] = []
+        self._tasks: set[asyncio.Task[None]] = set()
+        # wakes up topic loop when schedules change or bot gets registered
+        self._topics_changed: asyncio.Event = asyncio.Event()
+        self.topic_scheduler.listener = self._topics_changed.set
+        # wakes up config loop when reload is requested
+        self._config_changed: asyncio.Event = asyncio.Event()
+        # wakes up calendar loop when worker thread has finished a fetch
+        self._calendar_results: asyncio.Event = asyncio.Event()
+        # wakes up profiling loop when profiling is toggled or started by admin
+        self._profiling_changed: asyncio.Event = asyncio.Event()
+        self._reload_signal: int | None = None
+        self._restart_signal: int | None = None
+        self._profile_signal: int | None = None
+
+    def add_task(self, coro: Coroutine[Any, Any, None]) -> None:
+        """Registers coroutine which runs alongside main loop until the runner stops"""
+        self._background.append(coro)
+
+    async def _sender(self) -> None:
+        """Flushes send queue whenever lines are queued and flood control allows it"""
+        send_queue = self.client.send_queue
+        while True:
+            delay = send_queue.next_send_delay()
+            if delay is None or not self.client.is_connected:
+                self.client.send_event.clear()
+                await self.client.send_event.wait()
+                continue
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            self.client.flush_send_queue()
+            await self.client.drain()
+
+    @_on_response("001")  # overriding handler must be registered again
+    def _handle_welcome(self, msg: Message) -> None:
+        super()._handle_welcome(msg)
+        self._topics_changed.set()
+
+    async def _topic_loop(self) -> None:
+        """Sleeps until next topic boundary or until schedules change and applies due topics"""
+        while True:
+            self._topics_changed.clear()
+            self._apply_scheduled_topics()
+            timeout = (
+                self.topic_scheduler.time_until_next()
+                if self.client.is_registered
+                else None
+            )
+            try:
+                await asyncio.wait_for(self._topics_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _health_check(self) -> None:
+        """
+        Pings idle connection and closes it when PING isn't answered in time, which makes
+        main loop reconnect. Matching PONG is used for measuring round trip time as well.
+        """
+        while True:
+            timeout = self.client.time_until_health_check()
+            # nothing to check while disconnected, main loop is reconnecting
+            await asyncio.sleep(1.0 if timeout is None else max(timeout, 0.01))
+            if not self.client.check_health():
+                print("Server stopped responding, reconnecting", file=sys.stderr)
+                # main loop sees closed stream as disconnect
+                await self.client.close()
+
+    def request_config_reload(self) -> None:
+        super().request_config_reload()
+        self._config_changed.set()
+
+    def install_reload_signal(self, signum: int = signal.SIGHUP) -> None:
+        """
+        Reloads config whenever process receives signum. Handler is registered to the event
+        loop once run_forever() starts so that reload runs on the loop instead of
+        interrupting whatever the loop was doing.
+        """
+        self._reload_signal = signum
+
+    def request_warm_restart(self) -> None:
+        super().request_warm_restart()
+        # main loop checks the flag after each read, PONG makes sure read returns soon
+        if self.client.is_registered:
+            self.client.ping()
+
+    def install_restart_signal(self, signum: int = signal.SIGUSR2) -> None:
+        """Same as install_reload_signal(...) but for warm restart"""
+        self._restart_signal = signum
+
+    def request_profile_toggle(self) -> None:
+        super().request_profile_toggle()
+        self._profiling_changed.set()
+
+    def install_profile_signal(self, signum: int = signal.SIGTTIN) -> None:
+        """Same as install_reload_signal(...) but for toggling profiling"""
+        self._profile_signal = signum
+
+    @_on_response("PRIVMSG")  # overriding handler must be registered again
+    def _handle_privmsg(self, msg: Message) -> None:
+        super()._handle_privmsg(msg)
+        # profiler may have been started with duration
+        self._profiling_changed.set()
+
+    async def _profile_loop(self) -> None:
+        """Toggles profiling requested by signal and stops profilers when they expire"""
+        while True:
+            self._profiling_changed.clear()
+            self._run_profiler()
+            try:
+                await asyncio.wait_for(
+                    self._profiling_changed.wait(), self._time_until_profiling()
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _warm_restart(self) -> None:
+        """Hands over connection to the new process, see BotRunner.warm_restart(...)"""
+        for msg in MessageParser.parse_lines(await self.client.prepare_handoff()):
+            self._dispatch(msg)
+
+        self.warm_restart()
+        # still here i.e exec failed
+        self.client.abort_handoff()
+
+    async def _initialize_connection(self):  # type: ignore[override]
+        snapshot = self._load_snapshot()
+        if snapshot is not None:
+            await self.client.resume_session(snapshot)
+            for msg in MessageParser.parse_lines(self.client.buffered_lines()):
+                self._dispatch(msg)
+            return
+
+        await self.client.connect()
+        self.client.send_credentials()
+
+    async def _proxy_standby_loop(self) -> None:
+        """Keeps standby connection to proxy warm, see ProxyStandby"""
+        standby = self.client.proxy_standby
+        assert standby is not None
+        taken = self.client.proxy_standby_taken
+        while True:
+            taken.clear()
+            event = standby.poll()
+            waiting = (
+                wait_socket(standby.socket, event)
+                if event and standby.socket is not None
+                else taken.wait()
+            )
+            try:
+                await asyncio.wait_for(waiting, standby.time_until_next())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _config_loop(self) -> None:
+        """Applies config reloads requested by signal and polls config file if watching is enabled"""
+        while True:
+            self._config_changed.clear()
+            self._reload_config_if_needed()
+            try:
+                await asyncio.wait_for(
+                    self._config_changed.wait(), self._time_until_config_check()
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _calendar_loop(self) -> None:
+        """Applies calendar fetches as soon as workers finish them and starts due fetches"""
+        assert self.calendar_sync is not None
+        loop = asyncio.get_running_loop()
+        self.calendar_sync.fetcher.listener = lambda: loop.call_soon_threadsafe(
+            self._calendar_results.set
+        )
+        try:
+            while True:
+                self._calendar_results.clear()
+                self._sync_calendars()
+                try:
+                    await asyncio.wait_for(
+                        self._calendar_results.wait(),
+                        self.calendar_sync.time_until_next(),
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.calendar_sync.fetcher.listener = None
+
+    async def run_forever(self) -> None:  # type: ignore[override]
+        """
+        Starts main bot loop as coroutine. Use asyncio.run(runner.run_forever())
+        or await it from existing event loop.
+        """
+
+        await self._initialize_connection()
+
+        self._tasks.add(asyncio.create_task(self._sender()))
+        self._tasks.add(asyncio.create_task(self._health_check()))
+        self._tasks.add(asyncio.create_task(self._topic_loop()))
+        self._tasks.add(asyncio.create_task(self._config_loop()))
+        self._tasks.add(asyncio.create_task(self._profile_loop()))
+        if self.calendar_sync is not None:
+            self._tasks.add(asyncio.create_task(self._calendar_loop()))
+        if self.client.proxy_standby is not None:
+            self._tasks.add(asyncio.create_task(self._proxy_standby_loop()))
+        loop = asyncio.get_running_loop()
+        if self._reload_signal is not None:
+            loop.add_signal_handler(self._reload_signal, self.request_config_reload)
+        if self._restart_signal is not None:
+            loop.add_signal_handler(self._restart_signal, self.request_warm_restart)
+        if self._profile_signal is not None:
+            loop.add_signal_handler(self._profile_signal, self.request_profile_toggle)
+        for coro in self._background:
+            self._tasks.add(asyncio.create_task(coro))
+        self._background.clear()
+
+        try:
+            while True:
+                lines = await self.client.receive_message()
+                for msg in MessageParser.parse_lines(lines):
+                    self._dispatch(msg)
+
+                if self._restart_requested:
+                    await self._warm_restart()
+
+                if not self.client.is_connected:
+                    await self.client.reconnect()
+        finally:
+            if self._reload_signal is not None:
+                loop.remove_signal_handler(self._reload_signal)
+            if self._restart_signal is not None:
+                loop.remove_signal_handler(self._restart_signal)
+            if self._profile_signal is not None:
+                loop.remove_signal_handler(self._profile_signal)
+
+            for task in self._tasks:
+                task.cancel()
+
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks.clear()
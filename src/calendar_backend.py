@@ -0,0 +1,352 @@
+"""
+Module for calendar backends which provide events for EventStore.
+
+Every backend implements CalendarBackend.list_events(...) which follows semantics of
+Google Calendar API events.list (https://developers.google.com/calendar/api/guides/sync):
+    - without sync token every event of the calendar is returned (full sync)
+    - with sync token only events changed since the token was issued are returned,
+      deleted events are returned with cancelled=True
+    - if token is no longer valid SyncTokenExpired is raised and caller must do full sync
+
+Local file backends can't tell which events were deleted from the file, they answer with full
+sync whenever the file has changed.
+
+Style guide: backends must not keep any state which EventStore relies on. Sync token is
+             the only thing passed between syncs so that backends can be swapped freely.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import itertools
+import json
+import os
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+
+class SyncTokenExpired(Exception):
+    """Raised when backend can't continue incremental sync from given token"""
+
+
+@dataclass(frozen=True, slots=True)
+class CalendarEvent:
+    id: str
+    summary: str
+    start: datetime
+    end: datetime
+    updated: datetime
+    cancelled: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class SyncResult:
+    events: list[CalendarEvent]
+    next_sync_token: str
+    # True when events contain whole calendar and previous state must be discarded
+    full_sync: bool
+
+
+def sync_result_to_json(result: SyncResult) -> dict:
+    """Plain JSON serializable form of result, e.g for SharedCache"""
+    return {
+        "events": [
+            {
+                "id": event.id,
+                "summary": event.summary,
+                "start": event.start.isoformat(),
+                "end": event.end.isoformat(),
+                "updated": event.updated.isoformat(),
+                "cancelled": event.cancelled,
+            }
+            for event in result.events
+        ],
+        "next_sync_token": result.next_sync_token,
+        "full_sync": result.full_sync,
+    }
+
+
+def sync_result_from_json(data: dict) -> SyncResult:
+    """Reverse of sync_result_to_json(...)"""
+    return SyncResult(
+        [
+            CalendarEvent(
+                id=item["id"],
+                summary=item["summary"],
+                start=parse_datetime(item["start"]),
+                end=parse_datetime(item["end"]),
+                updated=parse_datetime(item["updated"]),
+                cancelled=item["cancelled"],
+            )
+            for item in data["events"]
+        ],
+        data["next_sync_token"],
+        data["full_sync"],
+    )
+
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Parses ISO 8601 datetime or date into timezone aware datetime.
+    Dates (all-day events) and naive datetimes are interpreted as UTC.
+    """
+    if len(value) == 10:
+        parsed = datetime.combine(date.fromisoformat(value), datetime.min.time())
+    else:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    return parsed
+
+
+class CalendarBackend(ABC):
+    @abstractmethod
+    def list_events(self, calendar_id: str, sync_token: str | None) -> SyncResult:
+        """See module docstring for semantics"""
+
+
+def _file_version(path: str) -> str:
+    """Changes whenever file is written, used as sync token of file backends"""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _sync_file(
+    events: list[CalendarEvent], version: str, sync_token: str | None
+) -> SyncResult:
+    """
+    Synchronization for backends which read whole file and can't tell which events were
+    deleted from it. Sync token is version of the file (see _file_version): while file stays
+    the same nothing has changed, otherwise every event is returned as full sync so that
+    events removed from the file are dropped too.
+    """
+    if sync_token == version:
+        return SyncResult([], version, False)
+
+    return SyncResult([event for event in events if not event.cancelled], version, True)
+
+
+class JSONFileBackend(CalendarBackend):
+    """
+    Reads events from local JSON file in following format:
+
+        {
+            "<calendar_id>": [
+                {
+                    "id": "...",
+                    "summary": "...",
+                    "start": "2024-01-01T10:00:00+02:00",
+                    "end": "2024-01-01T11:00:00+02:00",
+                    "updated": "2023-12-24T12:00:00Z",
+                    "status": "cancelled"  # optional, marks deleted event
+                }
+            ]
+        }
+
+    Sync returns nothing while file is unchanged and whole calendar after it has changed
+    (see _sync_file). File is read again only when it changes.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._version: str | None = None
+        self._calendars: dict[str, list[CalendarEvent]] = {}
+
+    def _load(self) -> str:
+        version = _file_version(self.path)
+        if version == self._version:
+            return version
+
+        with open(self.path, "r") as fp:
+            data = json.load(fp)
+
+        self._calendars = {
+            calendar_id: [
+                CalendarEvent(
+                    id=item["id"],
+                    summary=item.get("summary", ""),
+                    start=parse_datetime(item["start"]),
+                    end=parse_datetime(item["end"]),
+                    updated=parse_datetime(item.get("updated", item["start"])),
+                    cancelled=item.get("status") == "cancelled",
+                )
+                for item in items
+            ]
+            for calendar_id, items in data.items()
+        }
+        self._version = version
+        return version
+
+    def list_events(self, calendar_id: str, sync_token: str | None) -> SyncResult:
+        version = self._load()
+        return _sync_file(self._calendars.get(calendar_id, []), version, sync_token)
+
+
+def _unfold_ics(text: str) -> list[str]:
+    # Long content lines are folded by inserting CRLF followed by space or tab (RFC5545 3.1)
+    lines: list[str] = []
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and lines:
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+
+    return lines
+
+
+def _parse_ics_datetime(params: dict[str, str], value: str) -> datetime:
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d").replace(tzinfo=timezone.utc)
+
+    parsed = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return parsed.replace(tzinfo=timezone.utc)
+
+    if "TZID" in params:
+        return parsed.replace(tzinfo=ZoneInfo(params["TZID"]))
+
+    return parsed.replace(tzinfo=timezone.utc)
+
+
+def _unescape_ics_text(value: str) -> str:
+    return (
+        value.replace("\\n", " ")
+        .replace("\\N", " ")
+        .replace("\\,", ",")
+        .replace("\\;", ";")
+        .replace("\\\\", "\\")
+    )
+
+
+class ICSFileBackend(CalendarBackend):
+    """
+    Reads events from local iCalendar (.ics) files, one file per calendar
+    e.g ICSFileBackend({"work": "./calendars/work.ics"}). Only VEVENT components with
+    UID, SUMMARY, DTSTART, DTEND, LAST-MODIFIED/DTSTAMP and STATUS properties are used,
+    recurrence rules are not expanded. Syncs the same way as JSONFileBackend.
+    """
+
+    def __init__(self, paths: dict[str, str]):
+        self.paths: dict[str, str] = paths
+        # calendar id -> (file version, events)
+        self._cache: dict[str, tuple[str, list[CalendarEvent]]] = {}
+
+    def _parse(self, text: str) -> list[CalendarEvent]:
+        events: list[CalendarEvent] = []
+        current: dict[str, tuple[dict[str, str], str]] | None = None
+        for line in _unfold_ics(text):
+            name_params, _, value = line.partition(":")
+            name, *raw_params = name_params.split(";")
+            params = dict(param.partition("=")[::2] for param in raw_params)
+            name = name.upper()
+
+            if name == "BEGIN" and value.upper() == "VEVENT":
+                current = {}
+            elif name == "END" and value.upper() == "VEVENT" and current is not None:
+                events.append(self._to_event(current))
+                current = None
+            elif current is not None:
+                current[name] = (params, value)
+
+        return events
+
+    @staticmethod
+    def _to_event(props: dict[str, tuple[dict[str, str], str]]) -> CalendarEvent:
+        start = _parse_ics_datetime(*props["DTSTART"])
+        end = _parse_ics_datetime(*props["DTEND"]) if "DTEND" in props else start
+        updated_prop = props.get("LAST-MODIFIED") or props.get("DTSTAMP")
+        updated = _parse_ics_datetime(*updated_prop) if updated_prop else start
+        return CalendarEvent(
+            id=props["UID"][1],
+            summary=_unescape_ics_text(props.get("SUMMARY", ({}, ""))[1]),
+            start=start,
+            end=end,
+            updated=updated,
+            cancelled=props.get("STATUS", ({}, ""))[1].upper() == "CANCELLED",
+        )
+
+    def list_events(self, calendar_id: str, sync_token: str | None) -> SyncResult:
+        path = self.paths[calendar_id]
+        version = _file_version(path)
+        cached = self._cache.get(calendar_id)
+        if cached is None or cached[0] != version:
+            with open(path, "r", encoding="utf-8") as fp:
+                cached = (version, self._parse(fp.read()))
+            self._cache[calendar_id] = cached
+
+        return _sync_file(cached[1], version, sync_token)
+
+
+class MockGoogleBackend(CalendarBackend):
+    """
+    In-memory stand-in for Google Calendar API. Keeps change log of every modification
+    and hands out opaque sync tokens pointing to the log like the real API does.
+    Tokens older than max_log_size changes are rejected with SyncTokenExpired (API returns 410 Gone).
+
+    request_count tells how many list_events calls were made, use it to estimate API quota usage.
+    """
+
+    def __init__(self, max_log_size: int = 10000):
+        self.max_log_size: int = max_log_size
+        self.request_count: int = 0
+        self._events: dict[str, dict[str, CalendarEvent]] = {}
+        # (sequence number, calendar id, event id) of every change
+        self._log: list[tuple[int, str, str]] = []
+        self._sequence = itertools.count(1)
+        self._last_sequence: int = 0
+
+    def _record(self, calendar_id: str, event_id: str) -> None:
+        self._last_sequence = next(self._sequence)
+        self._log.append((self._last_sequence, calendar_id, event_id))
+        if len(self._log) > self.max_log_size:
+            del self._log[: len(self._log) - self.max_log_size]
+
+    def put_event(self, calendar_id: str, event: CalendarEvent) -> None:
+        """Creates or updates event"""
+        self._events.setdefault(calendar_id, {})[event.id] = event
+        self._record(calendar_id, event.id)
+
+    def delete_event(self, calendar_id: str, event_id: str) -> None:
+        event = self._events.get(calendar_id, {}).get(event_id)
+        if event is None:
+            return
+
+        self._events[calendar_id][event_id] = replace(
+            event, cancelled=True, updated=datetime.now(timezone.utc)
+        )
+        self._record(calendar_id, event_id)
+
+    def list_events(self, calendar_id: str, sync_token: str | None) -> SyncResult:
+        self.request_count += 1
+        events = self._events.get(calendar_id, {})
+        next_token = str(self._last_sequence)
+
+        if sync_token is None:
+            return SyncResult(
+                [event for event in events.values() if not event.cancelled],
+                next_token,
+                True,
+            )
+
+        if not sync_token.isdigit():
+            raise SyncTokenExpired(f"Invalid sync token {sync_token!r}")
+
+        since = int(sync_token)
+        oldest = self._log[0][0] if self._log else self._last_sequence + 1
+        if since + 1 < oldest and since != self._last_sequence:
+            raise SyncTokenExpired(f"Sync token {sync_token!r} has expired")
+
+        changed_ids = {
+            event_id
+            for sequence, log_calendar, event_id in self._log
+            if sequence > since and log_calendar == calendar_id
+        }
+        return SyncResult(
+            [events[event_id] for event_id in changed_ids], next_token, False
+        )
@@ -0,0 +1,404 @@
+"""
+Module for keeping topic schedules in sync with calendars without blocking the IRC loop.
+
+Backend calls (HTTP requests, parsing .ics files, ...) can take seconds. They run in bounded
+thread pool (CalendarFetcher) and results come back through thread-safe queue, which the thread
+running the IRC loop drains (CalendarSync.poll). That thread is the only one touching EventStore
+and TopicScheduler, so neither of them needs locking and PINGs are answered while fetches
+are in flight.
+
+Style guide: worker threads only call the backend and put the outcome into the queue.
+             Everything else (bookkeeping of requests, timeouts, metrics, applying results)
+             happens on the thread which owns the fetcher.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from src.calendar_backend import (
+    CalendarBackend,
+    CalendarEvent,
+    ICSFileBackend,
+    SyncResult,
+    SyncTokenExpired,
+    sync_result_from_json,
+    sync_result_to_json,
+)
+from src.event_store import EventStore
+from src.metrics import MetricsRegistry
+from src.settings import RuntimeSettings
+from src.shared_cache import SharedCache
+from src.topic_scheduler import TopicScheduler, entries_from_events
+from src.topic_template import TopicTemplate, entries_from_template
+
+
+def load_calendar_file(path: str) -> dict[str, str]:
+    """
+    Loads channel -> iCalendar file mapping from JSON file in following format:
+
+        {"#channel": "./calendars/channel.ics", "#other": "./calendars/other.ics"}
+
+    Relative paths are resolved against directory of the JSON file.
+    """
+    with open(path, "r") as fp:
+        data = json.load(fp)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    return {
+        channel: os.path.join(directory, calendar_path)
+        for channel, calendar_path in data.items()
+    }
+
+
+def load_calendar_sync(
+    path: str,
+    settings: RuntimeSettings,
+    template: TopicTemplate | None = None,
+    shared_cache: SharedCache | None = None,
+) -> CalendarSync:
+    """
+    Creates CalendarSync for calendars of load_calendar_file(path) configured by settings.
+    With shared_cache fetch results are shared with other processes using the same cache
+    for one poll interval.
+    """
+    channels = load_calendar_file(path)
+    # calendar id is path of the file so that channels sharing a file share the fetch
+    backend = ICSFileBackend({path: path for path in channels.values()})
+    fetcher = CalendarFetcher(
+        backend,
+        max_workers=settings.calendar_workers,
+        timeout=settings.calendar_fetch_timeout,
+        retries=settings.calendar_fetch_retries,
+        shared_cache=shared_cache,
+        cache_ttl=settings.calendar_poll_interval,
+    )
+    return CalendarSync(
+        fetcher, channels, settings.calendar_poll_interval, template=template
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class FetchResult:
+    """Outcome of fetching one calendar, exactly one of result and error is set"""
+
+    calendar_id: str
+    result: SyncResult | None
+    error: str | None = None
+    attempts: int = 1
+    # seconds spent in backend calls including retries
+    duration: float = 0.0
+
+
+class _Request:
+    __slots__ = ("calendar_id", "deadline", "cancelled", "future")
+
+    def __init__(self, calendar_id: str, deadline: float):
+        self.calendar_id: str = calendar_id
+        self.deadline: float = deadline
+        # set when request is cancelled or has timed out, stops retries of the worker
+        self.cancelled: threading.Event = threading.Event()
+        self.future: Future[None] | None = None
+
+
+class CalendarFetcher:
+    """
+    Runs CalendarBackend.list_events(...) in at most max_workers threads. Each calendar has
+    at most one request in flight, failed calls are retried with exponential backoff and
+    expired sync token falls back to full sync.
+
+    Finished fetches are collected with results(), which never blocks. listener (if set)
+    is called from the worker thread right after result has been queued, e.g
+    lambda: loop.call_soon_threadsafe(event.set) wakes up asyncio loop.
+
+    With shared_cache results are cached per (calendar, sync token) for cache_ttl seconds, so
+    processes which poll the same calendar (e.g workers of NetworkSupervisor) call backend
+    once between them. Backends must issue the same sync tokens to every caller for this to
+    pay off, as file backends do.
+
+    NOTE: Python threads can't be interrupted. Request which exceeds timeout is reported as
+          failed and whatever it returns later is dropped, but the call keeps its worker
+          thread until backend returns. Backends doing network I/O should use socket
+          timeouts of their own.
+    """
+
+    def __init__(
+        self,
+        backend: CalendarBackend,
+        max_workers: int = 4,
+        timeout: float = 30.0,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        shared_cache: SharedCache | None = None,
+        cache_ttl: float | None = None,
+    ):
+        self.backend: CalendarBackend = backend
+        self.shared_cache: SharedCache | None = shared_cache
+        self.cache_ttl: float | None = cache_ttl
+        self.timeout: float = timeout
+        self.retries: int = retries
+        self.retry_delay: float = retry_delay
+        self.listener: Callable[[], None] | None = None
+        self._clock: Callable[[], float] = clock
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="calendar"
+        )
+        # results put by workers, request is passed along to tell stale results apart
+        self._results: queue.SimpleQueue[tuple[_Request, FetchResult]] = (
+            queue.SimpleQueue()
+        )
+        self._requests: dict[str, _Request] = {}
+        metrics = MetricsRegistry()
+        self._fetch_seconds = metrics.histogram(
+            "calendar_fetch_seconds", "Time spent fetching calendars from backend"
+        )
+        self._errors = metrics.counter(
+            "calendar_fetch_errors_total", "Calendar fetches which failed or timed out"
+        )
+
+    def __contains__(self, calendar_id: str) -> bool:
+        """True if fetch of the calendar is in flight"""
+        return calendar_id in self._requests
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def submit(self, calendar_id: str, sync_token: str | None) -> bool:
+        """Starts fetching changes of the calendar. Returns False if fetch is already in flight"""
+        if calendar_id in self._requests:
+            return False
+
+        request = _Request(calendar_id, self._clock() + self.timeout)
+        self._requests[calendar_id] = request
+        request.future = self._executor.submit(self._fetch, request, sync_token)
+        return True
+
+    def cancel(self, calendar_id: str) -> None:
+        """Forgets request in flight, its result is never reported"""
+        request = self._requests.pop(calendar_id, None)
+        if request is not None:
+            request.cancelled.set()
+            if request.future is not None:
+                request.future.cancel()
+
+    def _list_events(self, calendar_id: str, sync_token: str | None) -> SyncResult:
+        if self.shared_cache is None:
+            return self._list_backend_events(calendar_id, sync_token)
+
+        data = self.shared_cache.get_or_fetch(
+            f"calendar:{calendar_id}:{sync_token or ''}",
+            lambda: sync_result_to_json(
+                self._list_backend_events(calendar_id, sync_token)
+            ),
+            self.cache_ttl,
+        )
+        return sync_result_from_json(data)
+
+    def _list_backend_events(
+        self, calendar_id: str, sync_token: str | None
+    ) -> SyncResult:
+        try:
+            return self.backend.list_events(calendar_id, sync_token)
+        except SyncTokenExpired:
+            return self.backend.list_events(calendar_id, None)
+
+    def _fetch(self, request: _Request, sync_token: str | None) -> None:
+        """Runs in worker thread"""
+        attempts = 0
+        started = time.perf_counter()
+        while True:
+            attempts += 1
+            try:
+                result = self._list_events(request.calendar_id, sync_token)
+            except Exception as err:
+                error = f"{type(err).__name__}: {err}"
+            else:
+                outcome = FetchResult(
+                    request.calendar_id,
+                    result,
+                    None,
+                    attempts,
+                    time.perf_counter() - started,
+                )
+                break
+
+            delay = self.retry_delay * 2 ** (attempts - 1)
+            if attempts > self.retries or self._clock() + delay >= request.deadline:
+                outcome = FetchResult(
+                    request.calendar_id,
+                    None,
+                    error,
+                    attempts,
+                    time.perf_counter() - started,
+                )
+                break
+
+            # wait() returns True when cancelled, no point in retrying then
+            if request.cancelled.wait(delay):
+                return
+
+        if request.cancelled.is_set():
+            return
+
+        self._results.put((request, outcome))
+        if self.listener is not None:
+            self.listener()
+
+    def next_deadline(self) -> float | None:
+        """Time (see clock) when the earliest request in flight times out"""
+        return min((r.deadline for r in self._requests.values()), default=None)
+
+    def results(self) -> list[FetchResult]:
+        """Finished and timed out fetches since last call. Doesn't block"""
+        finished: list[FetchResult] = []
+        while True:
+            try:
+                request, outcome = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            # result of cancelled or timed out request, calendar may have a newer one in flight
+            if self._requests.get(outcome.calendar_id) is not request:
+                continue
+
+            del self._requests[outcome.calendar_id]
+            self._fetch_seconds.observe(outcome.duration)
+            if outcome.error is not None:
+                self._errors.inc()
+            finished.append(outcome)
+
+        now = self._clock()
+        for request in [r for r in self._requests.values() if r.deadline <= now]:
+            self.cancel(request.calendar_id)
+            self._errors.inc()
+            finished.append(
+                FetchResult(
+                    request.calendar_id, None, f"Timed out after {self.timeout}s"
+                )
+            )
+
+        return finished
+
+    def shutdown(self) -> None:
+        """Cancels every request and stops worker threads once running calls return"""
+        for calendar_id in list(self._requests):
+            self.cancel(calendar_id)
+
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class CalendarSync:
+    """
+    Periodically fetches calendars mapped to channels and replaces topic schedules
+    of those channels with events of the calendar.
+
+    Calendars are polled every interval seconds, failed fetch is tried again after
+    the same interval. Several channels may share one calendar, which is fetched once.
+
+    NOTE: poll(...) and time_until_next() must be called from the same thread,
+          the one which owns the scheduler.
+    """
+
+    def __init__(
+        self,
+        fetcher: CalendarFetcher,
+        channels: dict[str, str],
+        interval: float = 300.0,
+        render: Callable[[CalendarEvent], str] = lambda event: event.summary,
+        clock: Callable[[], float] = time.monotonic,
+        template: TopicTemplate | None = None,
+    ):
+        self.fetcher: CalendarFetcher = fetcher
+        self.store: EventStore = EventStore(fetcher.backend)
+        # channel -> calendar id
+        self.channels: dict[str, str] = dict(channels)
+        self.interval: float = interval
+        self.render: Callable[[CalendarEvent], str] = render
+        # when set topics are rendered with template instead of render(...)
+        self.template: TopicTemplate | None = template
+        self._clock: Callable[[], float] = clock
+        # calendar id -> time (see clock) when it is fetched next, 0 fetches on first poll
+        self._next_fetch: dict[str, float] = dict.fromkeys(self.channels.values(), 0.0)
+        # calendars whose events have been applied to schedules at least once
+        self._synced: set[str] = set()
+
+    def pending(self) -> int:
+        """Number of fetches in flight"""
+        return len(self.fetcher)
+
+    def time_until_next(self) -> float | None:
+        """
+        Seconds until next fetch is due or request in flight times out.
+        Doesn't account for results arriving, see CalendarFetcher.listener for that.
+        """
+        deadlines = [
+            due
+            for calendar_id, due in self._next_fetch.items()
+            if calendar_id not in self.fetcher
+        ]
+        deadline = self.fetcher.next_deadline()
+        if deadline is not None:
+            deadlines.append(deadline)
+
+        if not deadlines:
+            return None
+
+        return max(min(deadlines) - self._clock(), 0.0)
+
+    def _apply(self, calendar_id: str, scheduler: TopicScheduler) -> None:
+        events = self.store.events(calendar_id)
+        if self.template is not None:
+            entries = entries_from_template(events, self.template)
+        else:
+            entries = entries_from_events(events, self.render)
+        for channel, mapped in self.channels.items():
+            if mapped == calendar_id:
+                scheduler.set_schedule(channel, entries)
+
+    def poll(self, scheduler: TopicScheduler) -> int:
+        """
+        Applies finished fetches to schedules and starts fetches which are due.
+        Returns number of calendars whose schedules were updated.
+        """
+        now = self._clock()
+        updated = 0
+        for outcome in self.fetcher.results():
+            calendar_id = outcome.calendar_id
+            if calendar_id not in self._next_fetch:
+                continue  # calendar was unmapped while fetching
+
+            self._next_fetch[calendar_id] = now + self.interval
+            if outcome.result is None:
+                print(
+                    f"Fetching calendar {calendar_id} failed after "
+                    f"{outcome.attempts} attempt(s): {outcome.error}",
+                    file=sys.stderr,
+                )
+                continue
+
+            changed = self.store.apply(calendar_id, outcome.result)
+            if changed or calendar_id not in self._synced:
+                self._synced.add(calendar_id)
+                self._apply(calendar_id, scheduler)
+                updated += 1
+
+        for calendar_id, due in self._next_fetch.items():
+            if due <= now and calendar_id not in self.fetcher:
+                self.fetcher.submit(calendar_id, self.store.sync_token(calendar_id))
+
+        return updated
+
+    def shutdown(self) -> None:
+        self.fetcher.shutdown()
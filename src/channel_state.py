@@ -0,0 +1,352 @@
+"""
+Module for tracking members of joined channels and their prefix modes (op, voice, ...).
+
+State is fed from server messages: NAMES (353/366) and WHO (352/315) bursts, JOIN, PART, KICK,
+QUIT, NICK, MODE and AWAY (IRCv3 away-notify). This way questions such as "is bot operator on #channel" are answered
+locally instead of asking server with WHOIS/WHO.
+
+Style guide: nicks and channel names are stored casefolded according to server's CASEMAPPING
+             and interned with sys.intern(...), so the same nick on many channels is stored only
+             once. Prefix modes of a member are kept as bit mask (small int) instead of string/set.
+             Every public method takes names as received from server, casefolding is done here.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import sys
+
+from collections.abc import Iterable, Iterator
+
+# Case mappings from ISUPPORT CASEMAPPING token (https://modern.ircdocs.horse/#casemapping-parameter)
+_RFC1459 = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ[]\\~", "abcdefghijklmnopqrstuvwxyz{}|^"
+)
+_STRICT_RFC1459 = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ[]\\", "abcdefghijklmnopqrstuvwxyz{}|"
+)
+_ASCII = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+_CASEMAPPINGS: dict[str, dict[int, int]] = {
+    "rfc1459": _RFC1459,
+    "strict-rfc1459": _STRICT_RFC1459,
+    "ascii": _ASCII,
+}
+
+# Used until server sends RPL_ISUPPORT, values are defaults from RFC2812
+_DEFAULT_PREFIX = "(ov)@+"
+_DEFAULT_CHANMODES = "beI,k,l,imnpst"
+
+
+class _Channel:
+    __slots__ = ("members", "pending")
+
+    def __init__(self):
+        # casefolded nick -> bit mask of prefix modes, bit 0 is the highest prefix (usually op)
+        self.members: dict[str, int] = {}
+        # NAMES/WHO listing which is still being received, replaces members once it ends
+        self.pending: dict[str, int] | None = None
+
+
+class ChannelStateStore:
+    """
+    Membership and prefix modes of channels the bot is on.
+
+    NAMES and WHO bursts are collected separately and swapped in when end numeric (366/315)
+    arrives, so that listing replaces previous state instead of merging into it
+    (members which left while bot wasn't watching disappear).
+
+    NOTE: state of a channel exists only between bot's own JOIN and PART/KICK. Messages
+          about channels bot isn't on are ignored.
+    """
+
+    def __init__(self):
+        self._channels: dict[str, _Channel] = {}
+        # casefolded nicks of members who are away (WHO flag G or away-notify)
+        self._away: set[str] = set()
+        self._casemap: dict[int, int] = _RFC1459
+        # prefix mode letter -> bit and prefix symbol -> bit, e.g {"o": 1, "v": 2} and {"@": 1, "+": 2}
+        self._mode_bits: dict[str, int] = {}
+        self._symbol_bits: dict[str, int] = {}
+        # channel mode letters which take parameter when set / when unset
+        self._param_on_set: frozenset[str] = frozenset()
+        self._param_on_unset: frozenset[str] = frozenset()
+        self.set_isupport({})
+
+    def __contains__(self, channel: str) -> bool:
+        return self._fold(channel) in self._channels
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def _fold(self, name: str) -> str:
+        return sys.intern(name.translate(self._casemap))
+
+    def set_isupport(self, isupport: dict[str, str]) -> None:
+        """
+        Applies PREFIX, CHANMODES and CASEMAPPING tokens of RPL_ISUPPORT.
+        Call this before any channel is joined, tracked names are not re-folded.
+        """
+        self._casemap = _CASEMAPPINGS.get(
+            isupport.get("CASEMAPPING", "").lower(), _RFC1459
+        )
+
+        prefix = isupport.get("PREFIX", _DEFAULT_PREFIX)
+        modes, _, symbols = prefix.lstrip("(").partition(")")
+        if len(modes) != len(symbols):
+            modes, _, symbols = _DEFAULT_PREFIX.lstrip("(").partition(")")
+
+        self._mode_bits = {mode: 1 << i for i, mode in enumerate(modes)}
+        self._symbol_bits = {symbol: 1 << i for i, symbol in enumerate(symbols)}
+
+        # CHANMODES=A,B,C,D: A (lists) and B always take parameter, C only when set, D never
+        groups = (isupport.get("CHANMODES") or _DEFAULT_CHANMODES).split(",")
+        groups += [""] * (4 - len(groups))
+        always = set(groups[0]) | set(groups[1]) | set(modes)
+        self._param_on_set = frozenset(always | set(groups[2]))
+        self._param_on_unset = frozenset(always)
+
+    def casefold(self, name: str) -> str:
+        """Nick or channel name in form where names which server considers equal are identical"""
+        return name.translate(self._casemap)
+
+    def same_nick(self, a: str, b: str) -> bool:
+        """Compares nicks (or channel names) using server's case mapping"""
+        return self.casefold(a) == self.casefold(b)
+
+    def clear(self) -> None:
+        """Forgets every channel. Call this when connection is lost"""
+        self._channels.clear()
+        self._away.clear()
+
+    def export(self) -> dict[str, dict[str, int]]:
+        """
+        Members of every tracked channel as {channel: {nick: prefix bits}} with casefolded names.
+        Bits are only meaningful with the same PREFIX token, see restore(...)
+        """
+        return {name: dict(state.members) for name, state in self._channels.items()}
+
+    def export_away(self) -> list[str]:
+        """Casefolded nicks of members who are away"""
+        return sorted(self._away)
+
+    def restore(
+        self, channels: dict[str, dict[str, int]], away: Iterable[str] = ()
+    ) -> None:
+        """
+        Replaces tracked channels with output of export(...) and export_away(). Call
+        set_isupport(...) with tokens of the same connection first so that prefix bits
+        and case mapping match.
+        """
+        self._channels.clear()
+        for name, members in channels.items():
+            state = self._channels[self._fold(name)] = _Channel()
+            state.members = {self._fold(nick): bits for nick, bits in members.items()}
+
+        self._away = {self._fold(nick) for nick in away}
+
+    def _parse_prefixes(self, name: str) -> tuple[str, int]:
+        # with multi-prefix capability server lists every prefix e.g "@+nick"
+        bits = 0
+        i = 0
+        symbol_bits = self._symbol_bits
+        while i < len(name) and name[i] in symbol_bits:
+            bits |= symbol_bits[name[i]]
+            i += 1
+
+        return name[i:], bits
+
+    # ---- bursts ----
+
+    def _pending(self, channel: str) -> dict[str, int] | None:
+        state = self._channels.get(self._fold(channel))
+        if state is None:
+            return None
+
+        if state.pending is None:
+            state.pending = {}
+
+        return state.pending
+
+    def _end_listing(self, channel: str) -> None:
+        state = self._channels.get(self._fold(channel))
+        if state is not None and state.pending is not None:
+            state.members = state.pending
+            state.pending = None
+
+    def names_reply(self, channel: str, names: Iterable[str]) -> None:
+        """RPL_NAMREPLY (353), names are prefixed with membership symbols e.g @nick"""
+        pending = self._pending(channel)
+        if pending is None:
+            return
+
+        for name in names:
+            nick, bits = self._parse_prefixes(name)
+            if nick:
+                pending[self._fold(nick)] = bits
+
+    def names_end(self, channel: str) -> None:
+        """RPL_ENDOFNAMES (366)"""
+        self._end_listing(channel)
+
+    def who_reply(self, channel: str, nick: str, flags: str) -> None:
+        """RPL_WHOREPLY (352), flags are e.g "H@" (here, op) or "G+" (gone, voiced)"""
+        pending = self._pending(channel)
+        if pending is None:
+            return
+
+        # first character is H/G, then optional * (ircop), then membership prefixes
+        _, bits = self._parse_prefixes(flags[1:].lstrip("*"))
+        folded = self._fold(nick)
+        pending[folded] = bits
+        if flags.startswith("G"):
+            self._away.add(folded)
+        else:
+            self._away.discard(folded)
+
+    def who_end(self, channel: str) -> None:
+        """RPL_ENDOFWHO (315)"""
+        self._end_listing(channel)
+
+    # ---- membership changes ----
+
+    def join(self, channel: str, nick: str, is_self: bool = False) -> None:
+        """Nick joined channel. Bot's own JOIN starts tracking the channel from scratch"""
+        key = self._fold(channel)
+        if is_self:
+            state = self._channels[key] = _Channel()
+        else:
+            state = self._channels.get(key)
+            if state is None:
+                return
+
+        state.members[self._fold(nick)] = 0
+
+    def part(self, channel: str, nick: str, is_self: bool = False) -> None:
+        """Nick left channel by PART or KICK. Bot leaving stops tracking the channel"""
+        key = self._fold(channel)
+        if is_self:
+            self._channels.pop(key, None)
+            return
+
+        state = self._channels.get(key)
+        if state is not None:
+            folded = self._fold(nick)
+            state.members.pop(folded, None)
+            if folded in self._away and not self.channels_of(nick):
+                self._away.discard(folded)
+
+    def quit(self, nick: str) -> None:
+        folded = self._fold(nick)
+        self._away.discard(folded)
+        for state in self._channels.values():
+            state.members.pop(folded, None)
+
+    def nick_change(self, old: str, new: str) -> None:
+        old_folded = self._fold(old)
+        new_folded = self._fold(new)
+        for state in self._channels.values():
+            bits = state.members.pop(old_folded, None)
+            if bits is not None:
+                state.members[new_folded] = bits
+
+        if old_folded in self._away:
+            self._away.discard(old_folded)
+            self._away.add(new_folded)
+
+    def set_away(self, nick: str, away: bool) -> None:
+        """AWAY with message (away=True) or without (back), pushed with away-notify"""
+        if away:
+            self._away.add(self._fold(nick))
+        else:
+            self._away.discard(self._fold(nick))
+
+    def apply_mode(
+        self, channel: str, modes: str, params: list[str]
+    ) -> list[tuple[str, str, bool]]:
+        """
+        Applies channel MODE e.g apply_mode("#chan", "+ov-v", ["a", "b", "c"]).
+        Returns membership changes as (nick, mode, added) tuples in order they were applied,
+        other mode changes (bans, keys, ...) are skipped over.
+        """
+        state = self._channels.get(self._fold(channel))
+        changes: list[tuple[str, str, bool]] = []
+        adding = True
+        param_index = 0
+        for mode in modes:
+            if mode in "+-":
+                adding = mode == "+"
+                continue
+
+            takes_param = mode in (
+                self._param_on_set if adding else self._param_on_unset
+            )
+            if not takes_param:
+                continue
+
+            if param_index >= len(params):
+                break
+
+            param = params[param_index]
+            param_index += 1
+            bit = self._mode_bits.get(mode)
+            if bit is None:
+                continue
+
+            changes.append((param, mode, adding))
+            if state is None:
+                continue
+
+            folded = self._fold(param)
+            if folded in state.members:
+                if adding:
+                    state.members[folded] |= bit
+                else:
+                    state.members[folded] &= ~bit
+
+        return changes
+
+    # ---- queries ----
+
+    def has_mode(self, channel: str, nick: str, mode: str) -> bool:
+        state = self._channels.get(self._fold(channel))
+        bit = self._mode_bits.get(mode)
+        if state is None or bit is None:
+            return False
+
+        return bool(state.members.get(self._fold(nick), 0) & bit)
+
+    def is_op(self, channel: str, nick: str) -> bool:
+        """True if nick has operator status (or higher, e.g owner/admin) on channel"""
+        state = self._channels.get(self._fold(channel))
+        op_bit = self._mode_bits.get("o")
+        if state is None or op_bit is None:
+            return False
+
+        bits = state.members.get(self._fold(nick), 0)
+        # prefixes are ordered from highest to lowest so any bit below op's counts
+        return bits != 0 and bits & -bits <= op_bit
+
+    def is_away(self, nick: str) -> bool:
+        return self._fold(nick) in self._away
+
+    def is_member(self, channel: str, nick: str) -> bool:
+        state = self._channels.get(self._fold(channel))
+        return state is not None and self._fold(nick) in state.members
+
+    def member_count(self, channel: str) -> int:
+        state = self._channels.get(self._fold(channel))
+        return 0 if state is None else len(state.members)
+
+    def members(self, channel: str) -> Iterator[str]:
+        """Casefolded nicks on channel"""
+        state = self._channels.get(self._fold(channel))
+        if state is not None:
+            yield from state.members
+
+    def channels_of(self, nick: str) -> list[str]:
+        """Casefolded names of tracked channels where nick is"""
+        folded = self._fold(nick)
+        return [
+            name for name, state in self._channels.items() if folded in state.members
+        ]
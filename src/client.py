@@ -1,15 +1,28 @@
+import base64
 import json
 import logging
+import os
 import socket
+import ssl
 import sys
 import time
 
 from pydantic import BaseModel
 from functools import wraps
-from typing import Callable, ParamSpec, TypeVar, Concatenate
+from typing import Callable, Iterator, ParamSpec, TypeVar, Concatenate
+from src.channel_state import ChannelStateStore
 from src.delay_utility import ReconnectDelayUtility
+from src.line_buffer import LineBuffer
+from src.metrics import MetricsRegistry
+from src.parsing import MessageParser
+from src.send_queue import Priority, SendQueue
+from src.settings import RuntimeSettings
+from src.socks5 import ProxyConfig, ProxyStandby, Socks5Negotiation, negotiate
+from src.tls import TLSContext, create_tls_context
+from src.topic_template import TemplatedTopic, fit_topic, topic_limit
 from src.tracking_socket import TrackingSocket
-
+from src.traffic_capture import CONNECTED, open_capture
+from src.warm_restart import StateSnapshot, socket_peer
 
 # required for python 3.11. In later versions
 # more modern syntax can be utilized in function definitions
@@ -33,6 +46,23 @@ def require_connection(
     return wrapper
 
 
+# IRCv3 capabilities requested whenever server offers them. With these server pushes state
+# changes (away status, accounts, all prefixes of members) instead of bot having to poll for them
+WANTED_CAPS = frozenset(
+    (
+        "multi-prefix",
+        "batch",
+        "message-tags",
+        "server-time",
+        "away-notify",
+        "extended-join",
+    )
+)
+
+# AUTHENTICATE payloads are split into chunks of this many bytes (https://ircv3.net/specs/extensions/sasl-3.1)
+_SASL_CHUNK = 400
+
+
 class _BotConfig(BaseModel):
     """
     Configuration class for bot. This should mirror fields in config.json
@@ -69,62 +99,343 @@ class IRCClient:
     joining to channels, sending messages and changing channel topics
     """
 
-    def __init__(self, proxy: bool = False):
-        self.config: _BotConfig = _BotConfig.from_json("./config.json")
+    def __init__(self, proxy: bool = False, config_path: str = "./config.json"):
+        self.config_path: str = config_path
+        self._config_mtime: int | None = self._read_config_mtime()
+        self.config: _BotConfig = _BotConfig.from_json(config_path)
+        self.settings: RuntimeSettings = RuntimeSettings.from_env()
 
         self.nick: str = self.config.NICK
+        # server from config.json is tried first, fallbacks from settings when it fails
+        self.servers: list[tuple[str, int]] = [
+            (self.config.SERVER, self.config.PORT),
+            *self.settings.parse_fallback_servers(),
+        ]
+        self._server_index: int = 0
         self.server: str = self.config.SERVER
         self.port: int = self.config.PORT
         self.ident: str = self.config.IDENT
         self.realname: str = self.config.REALNAME
         self.chan: list[str] = self.config.CHAN
-
-        # dictionary with key being channel name and value
-        # indicating if client is channel operator or not
-        self.op_state: dict[str, bool] = {key: False for key in self.chan}
-
-        if proxy:
-            raise NotImplementedError
-            # self.proxy_server: str = self.config.PROXY_SERVER
-            # self.proxy_port: int = self.config.PROXY_PORT
-            # self.socket = socks.socksocket()
-            # self.socket.set_proxy(socks.SOCKS5, self.proxy_server, self.proxy_port)
-
-        else:
-            self.socket: TrackingSocket = TrackingSocket(
-                socket.AF_INET, socket.SOCK_STREAM
+        # shared by every connection so that TLS sessions can be resumed on reconnect
+        self.tls_context: TLSContext | None = (
+            create_tls_context(self.settings.tls_verify, self.settings.tls_ca_file)
+            if self.settings.tls
+            else None
+        )
+
+        # members and their modes on joined channels, op_state is kept in sync with it by BotRunner
+        self.channel_state: ChannelStateStore = ChannelStateStore()
+        # dictionary with key being channel name folded with server's case mapping
+        # (channel_state.casefold) and value indicating if client is channel operator or not
+        self.op_state: dict[str, bool] = {
+            self.channel_state.casefold(key): False for key in self.chan
+        }
+        # last topic seen for each channel (RPL_TOPIC or TOPIC), used to skip redundant TOPIC writes,
+        # keyed by folded channel name like op_state since server may send name in other case
+        self.topics: dict[str, str] = {}
+        # topics sent but not yet confirmed by server
+        self._pending_topics: dict[str, str] = {}
+
+        # every server is connected through SOCKS5 proxy when proxy is set
+        self.proxy: ProxyConfig | None = (
+            ProxyConfig(
+                self.config.PROXY_SERVER,
+                self.config.PROXY_PORT,
+                self.settings.proxy_username,
+                self.settings.proxy_password,
             )
+            if proxy
+            else None
+        )
+        # kept warm by BotRunner/AsyncBotRunner, taken by connect(...)
+        self.proxy_standby: ProxyStandby | None = (
+            ProxyStandby(
+                self.proxy,
+                self.settings.proxy_standby_max_age,
+                self.settings.connect_timeout,
+            )
+            if self.proxy is not None and self.settings.proxy_standby_max_age > 0
+            else None
+        )
+        self.socket: TrackingSocket = self._create_socket()
 
         self._logger: logging.Logger = logging.getLogger("irc-bot")
         self.is_connected: bool = False
         self.is_credentials_sent: bool = False
-        self.reconnect_util: ReconnectDelayUtility = ReconnectDelayUtility()
+        # set when server has accepted registration (RPL_WELCOME)
+        self.is_registered: bool = False
+        self.reconnect_util: ReconnectDelayUtility = ReconnectDelayUtility(
+            self.settings.reconnect_base_delay,
+            self.settings.reconnect_max_delay,
+            self.settings.reconnect_max_attempts or None,
+        )
+        # persistent receive buffer, partial lines are carried over between reads
+        self._recv_buffer: LineBuffer = LineBuffer()
+        # outgoing lines wait here until flood control allows sending them
+        self.send_queue: SendQueue = SendQueue(
+            self.settings.send_rate, self.settings.send_burst
+        )
+        # tokens server advertised in RPL_ISUPPORT (005) e.g {"TOPICLEN": "390"}
+        self.isupport: dict[str, str] = {}
+        # capabilities server offers (CAP LS/NEW) with their values and the ones enabled (CAP ACK)
+        self.available_caps: dict[str, str] = {}
+        self.caps: set[str] = set()
+        # set from CAP LS until CAP END, server holds registration open meanwhile
+        self.is_negotiating_caps: bool = False
+        self._sasl_in_progress: bool = False
+
+        # PING tokens waiting for PONG and time they were queued at
+        self._pending_pings: dict[str, float] = {}
+        self._disconnected_at: float | None = None
+        self._registered_at: float | None = None
+        # last time anything was received, used for detecting idle/dead link
+        self._last_received_at: float = time.monotonic()
+        metrics = MetricsRegistry()
+        self._ping_rtt = metrics.histogram(
+            "irc_ping_rtt_seconds", "Time from queuing PING until matching PONG"
+        )
+        self._last_ping_rtt = metrics.gauge(
+            "irc_last_ping_rtt_seconds", "Round trip time of the latest answered PING"
+        )
+        self._last_reconnect_duration = metrics.gauge(
+            "irc_last_reconnect_duration_seconds",
+            "Time from losing connection until server accepted registration again",
+        )
+        self._proxy_connects = {
+            standby: metrics.counter(
+                "irc_proxy_connects_total",
+                "Connections established through proxy",
+                standby="true" if standby else "false",
+            )
+            for standby in (False, True)
+        }
+        self._proxy_connect_seconds = metrics.histogram(
+            "irc_proxy_connect_seconds",
+            "Time from starting proxy negotiation until proxy had connected to server",
+        )
+
+    def _read_config_mtime(self) -> int | None:
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def config_changed(self) -> bool:
+        """True if config file has been modified since it was last (re)loaded"""
+        return self._read_config_mtime() != self._config_mtime
+
+    def reload_config(self) -> tuple[list[str], list[str]] | None:
+        """
+        Re-reads config file and applies it to the live connection. Connection is kept,
+        only channels which were added or removed are joined or parted and op_state is
+        updated for them. Changed NICK is applied with NICK command.
+        SERVER/PORT, IDENT and REALNAME take effect on next reconnect.
+
+        Returns (joined, parted) channels or None if new config is invalid,
+        in which case old config stays in use.
+        """
+        self._config_mtime = self._read_config_mtime()
+        try:
+            config = _BotConfig.from_json(self.config_path)
+        except (OSError, ValueError) as err:
+            # ValueError covers both malformed JSON and failed validation
+            print(f"Config reload failed, keeping old config: {err}", file=sys.stderr)
+            return None
+
+        old, self.config = self.config, config
+        self.ident = config.IDENT
+        self.realname = config.REALNAME
+        if (config.SERVER, config.PORT) != (old.SERVER, old.PORT):
+            self.servers[0] = (config.SERVER, config.PORT)
+
+        if config.NICK != old.NICK:
+            if self.is_registered:
+                # nick is updated when server confirms the change
+                self._send(f"NICK {config.NICK}", Priority.HIGH)
+            else:
+                self.nick = config.NICK
+
+        return self._apply_channels(config.CHAN)
+
+    def _apply_channels(self, channels: list[str]) -> tuple[list[str], list[str]]:
+        casefold = self.channel_state.casefold
+        current = {casefold(chan): chan for chan in self.chan}
+        wanted = {casefold(chan): chan for chan in channels}
+        joined = [chan for key, chan in wanted.items() if key not in current]
+        parted = [chan for key, chan in current.items() if key not in wanted]
+        self.chan = list(channels)
+
+        for chan in parted:
+            self.op_state.pop(casefold(chan), None)
+            self.topics.pop(casefold(chan), None)
+            self._pending_topics.pop(casefold(chan), None)
+            if self.is_registered:
+                self._send(f"PART {chan}")
+
+        for chan in joined:
+            self.op_state[casefold(chan)] = False
+            if self.is_registered:
+                # JOINs are merged by send queue, op_state is updated from NAMES reply
+                self._send(f"JOIN {chan}")
+
+        return joined, parted
+
+    def _create_socket(self) -> TrackingSocket:
+        return TrackingSocket(socket.AF_INET, socket.SOCK_STREAM)
+
+    def _send(self, line: str, priority: Priority = Priority.NORMAL) -> None:
+        """
+        Queues single line to be sent to the server. All outgoing commands should go through here
+        so that flood control applies to everything. Lines are written by flush_send_queue(...)
+
+        NOTE: line must not contain trailing \\r\\n it is added when line is written
+        """
+        self.send_queue.put(line, priority)
+
+    def _write_line(self, line: str) -> None:
+        """Writes line straight to the transport bypassing send queue"""
+        self.socket.sendall(f"{line}\r\n".encode("utf-8"))
+
+    def flush_send_queue(self) -> None:
+        """Writes every queued line which flood control allows to be sent right now"""
+        if not self.is_connected:
+            return
+
+        for line in self.send_queue.pop_ready():
+            self._write_line(line)
+
+    def update_isupport(self, tokens: dict[str, str | None]) -> None:
+        """
+        Applies tokens from RPL_ISUPPORT (005). Server can send multiple 005 lines
+        and negated tokens (None values) remove previously advertised ones.
+        """
+        for key, value in tokens.items():
+            if value is None:
+                self.isupport.pop(key, None)
+            else:
+                self.isupport[key] = value
+
+        casefold = self.channel_state.casefold
+        names = {casefold(chan): chan for chan in self.chan}
+        self.channel_state.set_isupport(self.isupport)
+        # case mapping may have changed, fold names of op_state again with the new one
+        self.op_state = {
+            casefold(names.get(key, key)): value for key, value in self.op_state.items()
+        }
+        maxtargets = self.isupport.get("MAXTARGETS", "")
+        self.send_queue.set_target_limits(
+            MessageParser.parse_targmax(self.isupport.get("TARGMAX", "")),
+            int(maxtargets) if maxtargets.isdigit() else None,
+        )
 
     def connect(self):
-        """Connects to server specified in config.json"""
+        """
+        Connects to current server (server from config.json unless failover has happened),
+        through proxy if client was created with proxy=True
+        """
         # Handle connection and set NICK and IDENT for bot
-        self.socket.connect((self.server, self.port))
+        self.socket.settimeout(self.settings.connect_timeout)
+        if self.proxy is None:
+            self.socket.connect((self.server, self.port))
+        else:
+            started = time.perf_counter()
+            negotiation = self._begin_proxy_connect()
+            try:
+                negotiate(negotiation, self.settings.connect_timeout)
+            except BaseException:
+                negotiation.sock.close()
+                raise
+            self._finish_proxy_connect(negotiation, time.perf_counter() - started)
+            self.socket.settimeout(self.settings.connect_timeout)
+        if self.tls_context is not None:
+            self.socket = self._start_tls(self.tls_context)
+        self._mark_connected()
+
+    def _mark_connected(self) -> None:
+        """
+        Bookkeeping shared by IRCClient and AsyncIRCClient once connect has succeeded
+        (proxy and TLS included). Traffic capture gets one CONNECTED record per connection.
+        """
         self.is_connected = True
+        self._last_received_at = time.monotonic()
+        capture = open_capture()
+        if capture is not None:
+            capture.write(CONNECTED, b"", 0)
 
-    def send_credentials(self):
+    def _begin_proxy_connect(self) -> Socks5Negotiation:
         """
-        Sends necessary NICK and USER fields to a server.
-        More information can be found from IRC protocol (https://www.rfc-editor.org/rfc/rfc1459)
+        Negotiation connecting proxy to current server. Standby connection is used when there is
+        one, otherwise negotiation starts from scratch on self.socket. Shared by IRCClient
+        and AsyncIRCClient which drive it to completion.
         """
-        self.socket.sendall(f"NICK {self.nick}\r\n".encode())
-        self.socket.sendall(f"USER {self.nick} * * :{self.nick}\r\n".encode())
+        assert self.proxy is not None
+        negotiation = (
+            self.proxy_standby.take() if self.proxy_standby is not None else None
+        )
+        if negotiation is None:
+            # handshake (and proxy credentials) stays out of traffic log and capture
+            self.socket.track_traffic = False
+            negotiation = Socks5Negotiation(self.socket, self.proxy)
+        negotiation.connect_to(self.server, self.port)
+        return negotiation
+
+    def _finish_proxy_connect(
+        self, negotiation: Socks5Negotiation, seconds: float
+    ) -> None:
+        """Makes established negotiation the connection of the bot"""
+        standby = negotiation.sock is not self.socket
+        if standby:
+            # standby is plain socket, tracking (and capture of the connection) starts here
+            self.socket.close()
+            self.socket = TrackingSocket(fileno=negotiation.sock.detach())
+        else:
+            self.socket.track_traffic = True
+        self._proxy_connects[standby].inc()
+        self._proxy_connect_seconds.observe(seconds)
 
-    def reconnect(self):
+    def _start_tls(self, context: TLSContext) -> TrackingSocket:
         """
-        Closes the previous socket. Creates new one before trying to reconnect server.
-        This should be only called when server closes the connection without giving proper
-        ERROR message. If reconnection still fails after N tries specified in ReconnectDelayUtility bot will close
-        default is 60s, 5min and 1h.
-
-        param int delay - Specifies how many seconds bot waits after connection is closed
-                           before trying to create new socket and connect to a server.
+        Wraps connected socket with TLS and completes handshake within connect_timeout,
+        cached session of the server is offered so that handshake can be resumed
         """
+        started = time.perf_counter()
+        tls_socket = context.wrap_socket(
+            self.socket, server_hostname=self.server, do_handshake_on_connect=False
+        )
+        try:
+            tls_socket.do_handshake()
+        except BaseException:
+            tls_socket.close()
+            raise
+
+        context.record_handshake(tls_socket, time.perf_counter() - started)
+        return tls_socket
+
+    def _rotate_server(self) -> None:
+        """Moves to next server in the list, wraps around to the first one"""
+        self._server_index = (self._server_index + 1) % len(self.servers)
+        self.server, self.port = self.servers[self._server_index]
+
+    def _prepare_reconnect(self) -> None:
+        """
+        Bookkeeping shared by IRCClient and AsyncIRCClient before reconnect attempts start.
+        Must be called before _reset_connection_state() since it inspects the lost connection.
+        """
+        if self._disconnected_at is None:
+            self._disconnected_at = time.monotonic()
+
+        if self._registered_at is not None:
+            if (
+                time.monotonic() - self._registered_at
+                >= self.settings.reconnect_stable_after
+            ):
+                self.reconnect_util.reset()
+        else:
+            # connection died before registration, try next server instead
+            self._rotate_server()
 
+    def _next_reconnect_delay(self) -> float:
         delay = self.reconnect_util.get_next_delay()
         if delay == -1:
             print(
@@ -132,50 +443,434 @@ class IRCClient:
                 "Closing...",
                 file=sys.stderr,
             )
-
-            self.close()
-            self.reconnect_util.stop_timer()
             sys.exit(1)
 
+        return delay
+
+    def send_credentials(self):
+        """
+        Sends necessary NICK and USER fields to a server.
+        More information can be found from IRC protocol (https://www.rfc-editor.org/rfc/rfc1459)
+
+        CAP LS is sent first so that servers supporting IRCv3 hold registration open until
+        capabilities (and SASL) are negotiated, see caps_offered(...). Servers without CAP
+        support ignore it and register right away.
+        """
+        self.is_negotiating_caps = True
+        self._send("CAP LS 302", Priority.HIGH)
+        self._send(f"NICK {self.nick}", Priority.HIGH)
+        self._send(f"USER {self.nick} * * :{self.nick}", Priority.HIGH)
+
+    def _wants_sasl(self) -> bool:
+        if not self.settings.sasl_username or "sasl" not in self.available_caps:
+            return False
+
+        # value lists supported mechanisms, servers implementing CAP 3.1 send none
+        mechanisms = self.available_caps["sasl"]
+        return not mechanisms or "PLAIN" in mechanisms.split(",")
+
+    def caps_offered(self, caps: dict[str, str], more: bool = False) -> None:
+        """
+        Handles CAP LS (and CAP NEW after registration). Wanted capabilities which aren't
+        enabled yet are requested, negotiation ends right away if there is nothing to request.
+
+        param bool more: reply continues on next line, request is sent once whole list is received
+        """
+        self.available_caps.update(caps)
+        if more:
+            return
+
+        wanted = sorted(
+            cap
+            for cap in WANTED_CAPS
+            if cap in self.available_caps and cap not in self.caps
+        )
+        if self.is_negotiating_caps and self._wants_sasl():
+            wanted.append("sasl")
+
+        if wanted:
+            self._send(f"CAP REQ :{' '.join(wanted)}", Priority.HIGH)
+        else:
+            self.end_cap_negotiation()
+
+    def caps_acknowledged(self, caps: dict[str, str]) -> None:
+        """Handles CAP ACK, starts SASL if it was acknowledged during registration"""
+        for cap in caps:
+            if cap.startswith("-"):
+                self.caps.discard(cap[1:])
+            else:
+                self.caps.add(cap)
+
+        if "sasl" in caps and self.is_negotiating_caps:
+            self._sasl_in_progress = True
+            self._send("AUTHENTICATE PLAIN", Priority.HIGH)
+        elif not self._sasl_in_progress:
+            self.end_cap_negotiation()
+
+    def caps_rejected(self, caps: dict[str, str]) -> None:
+        """Handles CAP NAK, whole request is rejected so registration just continues without"""
+        if not self._sasl_in_progress:
+            self.end_cap_negotiation()
+
+    def caps_removed(self, caps: dict[str, str]) -> None:
+        """Handles CAP DEL i.e server no longer supports the capabilities"""
+        for cap in caps:
+            self.caps.discard(cap)
+            self.available_caps.pop(cap, None)
+
+    def sasl_continue(self, challenge: str) -> None:
+        """Answers AUTHENTICATE challenge, PLAIN has only one step (empty challenge "+")"""
+        if not self._sasl_in_progress or challenge != "+":
+            return
+
+        username = self.settings.sasl_username
+        payload = base64.b64encode(
+            f"{username}\0{username}\0{self.settings.sasl_password}".encode("utf-8")
+        ).decode("ascii")
+        chunks = [
+            payload[i : i + _SASL_CHUNK] for i in range(0, len(payload), _SASL_CHUNK)
+        ]
+        # payload ending exactly at chunk boundary is terminated with empty chunk
+        if not chunks or len(chunks[-1]) == _SASL_CHUNK:
+            chunks.append("+")
+
+        for chunk in chunks:
+            self._send(f"AUTHENTICATE {chunk}", Priority.HIGH)
+
+    def sasl_finished(self, success: bool, reason: str = "") -> None:
+        """Called with result numeric of SASL (903 success, 902/904-907 failure)"""
+        if not self._sasl_in_progress:
+            return
+
+        self._sasl_in_progress = False
+        if not success:
+            print(
+                f"SASL authentication as {self.settings.sasl_username} failed: {reason}",
+                file=sys.stderr,
+            )
+
+        self.end_cap_negotiation()
+
+    def end_cap_negotiation(self) -> None:
+        """Sends CAP END which lets server complete registration"""
+        if self.is_negotiating_caps:
+            self.is_negotiating_caps = False
+            self._send("CAP END", Priority.HIGH)
+
+    def reconnect(self):
+        """
+        Closes the previous socket and connects again, retrying with jittered exponential
+        backoff (see ReconnectDelayUtility) until connecting succeeds. Every failed attempt
+        moves to next server in servers list, after lost registered connection the same
+        server is tried first.
+
+        If reconnect_max_attempts (RuntimeSettings) consecutive attempts fail bot exits.
+        """
+        self._prepare_reconnect()
         self.close()
-        time.sleep(delay)
-        self.socket = TrackingSocket(socket.AF_INET, socket.SOCK_STREAM)
-        self.connect()
-        self.send_credentials()
+        self._reset_connection_state()
+
+        while True:
+            time.sleep(self._next_reconnect_delay())
+            self.socket = self._create_socket()
+            try:
+                self.connect()
+            except OSError as err:
+                print(
+                    f"Connecting to {self.server}:{self.port} failed: {err}",
+                    file=sys.stderr,
+                )
+                self.socket.close()
+                self._rotate_server()
+                continue
+
+            self.send_credentials()
+            return
+
+    def _reset_connection_state(self) -> None:
+        """Forgets everything learned from or queued for previous connection"""
+        self._recv_buffer.clear()
+        # lines queued for previous connection are meaningless for the new one
+        self.send_queue.clear()
+        self.isupport.clear()
+        self.available_caps.clear()
+        self.caps.clear()
+        self.is_negotiating_caps = False
+        self._sasl_in_progress = False
+        self.clear_topic_cache()
+        self.channel_state.clear()
+        self.channel_state.set_isupport(self.isupport)
+        self.op_state = {self.channel_state.casefold(key): False for key in self.chan}
+        self._registered_at = None
+
+    def export_state(self) -> StateSnapshot:
+        """
+        Snapshot of the session for warm restart (see src/warm_restart.py). Call this only
+        between reads, lines which are already handed out from receive buffer are not included.
+        """
+        return StateSnapshot(
+            pid=os.getpid(),
+            created_at=time.time(),
+            config_path=os.path.abspath(self.config_path),
+            # TLS state can't be handed over to another process, new one reconnects
+            fd=(
+                self.socket.fileno()
+                if self.is_connected and self.tls_context is None
+                else None
+            ),
+            peer=socket_peer(self.socket) if self.is_connected else None,
+            server=self.server,
+            port=self.port,
+            nick=self.nick,
+            is_registered=self.is_registered,
+            chan=list(self.chan),
+            isupport=dict(self.isupport),
+            caps=sorted(self.caps),
+            op_state=dict(self.op_state),
+            topics=dict(self.topics),
+            channels=self.channel_state.export(),
+            away=self.channel_state.export_away(),
+            recv_buffer=self._recv_buffer.pending().decode("latin-1"),
+            send_queue=[
+                (line, int(priority)) for line, priority in self.send_queue.pending()
+            ],
+            send_tokens=self.send_queue.bucket.tokens,
+        )
+
+    def resume_session(self, snapshot: StateSnapshot) -> None:
+        """
+        Continues session of the process which wrote snapshot before exec. Socket left open
+        by it is adopted and state restored as it was, nothing is sent to server except
+        JOIN/PART for channels which were added to or removed from config in between.
+
+        NOTE: snapshot must be resumable, see warm_restart.is_resumable(...)
+        """
+        assert snapshot.fd is not None and snapshot.fd != self.socket.fileno()
+        self.socket.close()
+        self.socket = TrackingSocket(fileno=snapshot.fd)
+        os.set_inheritable(snapshot.fd, False)
+        self.is_connected = True
+        self._last_received_at = time.monotonic()
+
+        self.server, self.port = snapshot.server, snapshot.port
+        if (self.server, self.port) in self.servers:
+            self._server_index = self.servers.index((self.server, self.port))
+        self.nick = snapshot.nick
+
+        # isupport first, it defines case mapping and prefix bits of channel state
+        self.update_isupport(snapshot.isupport)
+        self.caps = set(snapshot.caps)
+        self.channel_state.restore(snapshot.channels, snapshot.away)
+        self.op_state = dict(snapshot.op_state)
+        self.topics.update(snapshot.topics)
+        self.chan = list(snapshot.chan)
+
+        self._recv_buffer.feed(snapshot.recv_buffer.encode("latin-1"))
+        for line, priority in snapshot.send_queue:
+            self._send(line, Priority(priority))
+        if snapshot.send_tokens is not None:
+            self.send_queue.bucket.tokens = snapshot.send_tokens
+
+        if snapshot.is_registered:
+            self.mark_registered()
+
+        # config might have changed while new version was being deployed
+        self._apply_channels(self.config.CHAN)
+
+    def buffered_lines(self) -> Iterator[bytes]:
+        """Complete lines already in receive buffer, e.g ones carried over by warm restart"""
+        return self._recv_buffer.lines()
 
     def close(self):
         """Closes the bot socket and updates connection status"""
+        if self.tls_context is not None and isinstance(self.socket, ssl.SSLSocket):
+            self.tls_context.remember(self.socket)
         self.socket.close()
         self.is_connected = False
+        self.is_registered = False
+        self._pending_pings.clear()
 
     @require_connection
     def pong(self, answer: str):
         """Send pong to a server"""
-        self.socket.sendall(f"PONG :{answer}\r\n".encode())
+        self._send(f"PONG :{answer}", Priority.URGENT)
+
+    @require_connection
+    def ping(self, token: str | None = None):
+        """
+        Send ping to a server, server answers with PONG containing same token.
+        Round trip time is recorded when PONG is passed to pong_received(...)
+        """
+        if token is None:
+            token = f"rtt-{time.monotonic_ns()}"
+
+        if len(self._pending_pings) >= 16:
+            # server doesn't answer, don't let unanswered pings pile up
+            self._pending_pings.clear()
+
+        self._pending_pings[token] = time.monotonic()
+        self._send(f"PING :{token}", Priority.HIGH)
+
+    def check_health(self) -> bool:
+        """
+        Health check of the link, call this periodically (see time_until_health_check).
+        Sends PING if nothing has been received for health_check_interval seconds.
+        Returns False when PING has been left unanswered for health_check_timeout seconds
+        i.e link is dead even though socket hasn't noticed it (yet).
+        """
+        if not self.is_connected:
+            return True
+
+        now = time.monotonic()
+        if not self.is_registered:
+            # servers don't answer PING before registration, only wait for any reply
+            return now - self._last_received_at < (
+                self.settings.health_check_interval + self.settings.health_check_timeout
+            )
+
+        if self._pending_pings:
+            oldest = min(self._pending_pings.values())
+            return now - oldest < self.settings.health_check_timeout
+
+        if now - self._last_received_at >= self.settings.health_check_interval:
+            self.ping()
+
+        return True
+
+    def time_until_health_check(self) -> float | None:
+        """Seconds until check_health(...) has something to do, None when not connected"""
+        if not self.is_connected:
+            return None
+
+        if not self.is_registered:
+            deadline = (
+                self._last_received_at
+                + self.settings.health_check_interval
+                + self.settings.health_check_timeout
+            )
+        elif self._pending_pings:
+            deadline = (
+                min(self._pending_pings.values()) + self.settings.health_check_timeout
+            )
+        else:
+            deadline = self._last_received_at + self.settings.health_check_interval
+
+        return max(deadline - time.monotonic(), 0.0)
+
+    def pong_received(self, token: str) -> None:
+        sent_at = self._pending_pings.pop(token, None)
+        if sent_at is None:
+            return
+
+        rtt = time.monotonic() - sent_at
+        self._ping_rtt.observe(rtt)
+        self._last_ping_rtt.set(rtt)
+
+    def mark_registered(self) -> None:
+        """Called when server accepts registration (RPL_WELCOME)"""
+        self.is_registered = True
+        # server without CAP support registers without negotiation
+        self.is_negotiating_caps = False
+        self._sasl_in_progress = False
+        self._registered_at = time.monotonic()
+        if self._disconnected_at is not None:
+            self._last_reconnect_duration.set(time.monotonic() - self._disconnected_at)
+            self._disconnected_at = None
 
     @require_connection
-    def send_msg(self):
-        """Sends message to the channel. Only works after bot has joined to a channel"""
-        pass
+    def send_msg(self, target: str, text: str) -> None:
+        """
+        Sends message to the channel (or user). Sending to channel only works after bot
+        has joined it. Every line of text is sent as its own PRIVMSG.
+        """
+        for line in text.splitlines():
+            self._send(f"PRIVMSG {target} :{line}")
+
+    @require_connection
+    def notice(self, target: str, text: str) -> None:
+        """Sends NOTICE e.g reply to private message, servers never answer to NOTICE"""
+        for line in text.splitlines():
+            self._send(f"NOTICE {target} :{line}")
 
     @require_connection
-    def change_topic(self):
+    def change_topic(self, channel: str, topic: str | TemplatedTopic) -> bool:
         """
         Changes channel topic. Requires bot to have permissions to do so
         and bot must be connected to a server.
+
+        Topic is fitted to server's TOPICLEN and line length (templated topic drops optional
+        sections first) so that server stores exactly what was sent.
+
+        TOPIC is not sent if op_state shows that bot isn't operator on the channel or
+        if topic is already set (or being set) to the same value. Returns True if TOPIC was sent.
         """
-        pass
+        if not self.has_op(channel):
+            return False
+
+        limit = topic_limit(self.isupport, channel)
+        if isinstance(topic, TemplatedTopic):
+            topic = topic.render(limit)
+        else:
+            topic = fit_topic(topic, limit)
+
+        key = self.channel_state.casefold(channel)
+        if self._pending_topics.get(key, self.topics.get(key)) == topic:
+            return False
+
+        self._pending_topics[key] = topic
+        self._send(f"TOPIC {channel} :{topic}")
+        return True
+
+    def set_topic_cache(self, channel: str, topic: str) -> None:
+        """Records topic server reported for the channel"""
+        key = self.channel_state.casefold(channel)
+        self.topics[key] = topic
+        self._pending_topics.pop(key, None)
+
+    def discard_pending_topic(self, channel: str) -> None:
+        """Forgets unconfirmed topic change e.g when server rejected it"""
+        self._pending_topics.pop(self.channel_state.casefold(channel), None)
+
+    def clear_topic_cache(self) -> None:
+        self.topics.clear()
+        self._pending_topics.clear()
 
     @require_connection
     def join_channels(self):
-        """Joins channels specified in config.json"""
+        """
+        Joins channels specified in config.json. Send queue merges JOINs into
+        as few lines as server's limits allow
+        """
         for chan in self.chan:
-            self.socket.sendall(f"JOIN :{chan}\r\n".encode())
+            self._send(f"JOIN {chan}")
 
     @require_connection
-    def receive_message(self) -> bytes:
-        msg = self.socket.recv(2040, logging_decode=False)
-        return msg
+    def receive_message(self, timeout: float | None = None) -> Iterator[bytes]:
+        """
+        Reads available data from the socket and yields every complete line (without trailing \\r\\n).
+        Partial line at the end of the read is kept in receive buffer and completed on next call.
+
+        param float timeout: Seconds to wait for data, None waits until data arrives. If nothing is
+                             received within timeout nothing is yielded (connection stays open).
+
+        NOTE: If server has closed the connection nothing is yielded and is_connected is set to False.
+              Caller is responsible of reconnecting.
+        """
+        self.socket.settimeout(timeout)
+        try:
+            received = self._recv_buffer.fill(self.socket)
+        except (TimeoutError, BlockingIOError, ssl.SSLWantReadError):
+            return
+        except OSError:
+            # e.g connection reset by peer
+            received = 0
+
+        if received == 0:
+            self.is_connected = False
+            return
+
+        self._last_received_at = time.monotonic()
+        yield from self._recv_buffer.lines()
 
     @require_connection
     def query_who(self, channel: str) -> None:
@@ -186,15 +881,23 @@ class IRCClient:
         NOTE: this method returns None you must handle parsing
         response separately
         """
-        self.socket.sendall(f"WHO {channel}\r\n".encode("utf-8"))
+        self._send(f"WHO {channel}", Priority.LOW)
 
     @require_connection
     def query_self(self) -> None:
         """
         Send WHOIS query about client to the socket
         """
-        self.socket.sendall(f"WHOIS {self.nick}\r\n".encode("utf-8"))
+        self._send(f"WHOIS {self.nick}")
 
     @require_connection
     def set_op_state(self, channel: str, value: bool):
-        self.op_state[channel] = value
+        self.op_state[self.channel_state.casefold(channel)] = value
+
+    def has_op(self, channel: str) -> bool:
+        """True if op_state shows that bot is operator on channel, name may be in any case"""
+        return self.op_state.get(self.channel_state.casefold(channel), False)
+
+    def is_op(self, channel: str) -> bool:
+        """True if bot has operator status on channel according to tracked channel state"""
+        return self.channel_state.is_op(channel, self.nick)
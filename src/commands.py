@@ -0,0 +1,243 @@
+"""
+Module for answering schedule queries users send to channels:
+
+    !now      what is scheduled right now
+    !next     what starts next
+    !today    what is left of today
+
+Answers come from response cache keyed by channel and query. Cached answer is used until schedule
+of the channel is replaced (TopicScheduler.generation), the next schedule boundary passes or ttl
+runs out, whichever comes first. Requests are rate limited per user and per channel, and the same
+answer isn't repeated in a channel within collapse_window seconds, so a burst of people typing
+!now at once costs one PRIVMSG.
+
+Style guide: responder only decides what to answer, sending is left to caller. Requests which
+             are not answered (rate limited, collapsed, unknown command) return None and are
+             never answered later.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import time
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from src.metrics import Counter, MetricsRegistry
+from src.send_queue import MAX_LINE_BYTES, TokenBucket
+from src.topic_scheduler import TopicEntry, TopicScheduler
+from src.topic_template import fit_topic
+
+COMMANDS = ("!now", "!next", "!today")
+
+# rate limit buckets are pruned when there are more users (or channels) than this
+_MAX_BUCKETS = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class _CachedAnswer:
+    text: str
+    generation: int | None
+    # time (see clock) after which answer must be computed again
+    expires_at: float
+
+
+def _clock_time(timestamp: float) -> str:
+    return time.strftime("%H:%M", time.localtime(timestamp))
+
+
+def _describe(entry: TopicEntry) -> str:
+    return f"{_clock_time(entry.start)}-{_clock_time(entry.end)} {entry.topic}"
+
+
+class CommandResponder:
+    """
+    Answers !now/!next/!today in channels from topic schedules. Channel and nick keys are
+    casefolded with casefold (e.g ChannelState.casefold) so that differently cased names
+    share cache and rate limits.
+
+    param float user_rate/channel_rate: requests answered per second once burst is used up
+    """
+
+    def __init__(
+        self,
+        scheduler: TopicScheduler,
+        casefold: Callable[[str], str] = str.lower,
+        ttl: float = 60.0,
+        user_rate: float = 0.1,
+        user_burst: int = 3,
+        channel_rate: float = 0.5,
+        channel_burst: int = 5,
+        collapse_window: float = 10.0,
+        clock: Callable[[], float] = time.time,
+        monotonic: Callable[[], float] = time.monotonic,
+    ):
+        self.scheduler: TopicScheduler = scheduler
+        self.casefold: Callable[[str], str] = casefold
+        self.ttl: float = ttl
+        self.user_rate: float = user_rate
+        self.user_burst: int = user_burst
+        self.channel_rate: float = channel_rate
+        self.channel_burst: int = channel_burst
+        self.collapse_window: float = collapse_window
+        self._clock: Callable[[], float] = clock
+        self._monotonic: Callable[[], float] = monotonic
+        # (casefolded channel, command) -> answer
+        self._cache: dict[tuple[str, str], _CachedAnswer] = {}
+        # (casefolded channel, command) -> (time (see monotonic) it was sent, answer)
+        self._last_sent: dict[tuple[str, str], tuple[float, str]] = {}
+        self._user_buckets: dict[str, TokenBucket] = {}
+        self._channel_buckets: dict[str, TokenBucket] = {}
+        self._metrics: MetricsRegistry = MetricsRegistry()
+        self._counters: dict[tuple[str, str], Counter] = {}
+        self._cache_hits: Counter = self._metrics.counter(
+            "irc_bot_command_cache_hits_total", "Command answers served from cache"
+        )
+        self._cache_misses: Counter = self._metrics.counter(
+            "irc_bot_command_cache_misses_total",
+            "Command answers computed from schedule",
+        )
+
+    def _count(self, command: str, outcome: str) -> None:
+        counter = self._counters.get((command, outcome))
+        if counter is None:
+            counter = self._counters[(command, outcome)] = self._metrics.counter(
+                "irc_bot_commands_total",
+                "Commands users sent to channels by outcome",
+                command=command,
+                outcome=outcome,
+            )
+
+        counter.inc()
+
+    def _scheduled_channel(self, channel: str, key: str) -> str:
+        """Name of the channel in scheduler, server may send it in different case"""
+        if channel in self.scheduler:
+            return channel
+
+        for name in self.scheduler.channels():
+            if self.casefold(name) == key:
+                return name
+
+        return channel
+
+    def _answer(self, channel: str, command: str, now: float) -> tuple[str, float]:
+        """Answer to command and time until which it stays valid"""
+        scheduler = self.scheduler
+        boundary = scheduler.next_boundary(channel, now)
+        expires_at = (
+            now + self.ttl if boundary is None else min(now + self.ttl, boundary)
+        )
+        if command == "!now":
+            active = scheduler.active_entries(channel, now)
+            if not active:
+                return "Nothing scheduled right now", expires_at
+
+            return (
+                "Now: "
+                + "; ".join(
+                    f"{entry.topic} (until {_clock_time(entry.end)})"
+                    for entry in active
+                ),
+                expires_at,
+            )
+
+        if command == "!next":
+            entry = scheduler.next_entry(channel, now)
+            if entry is None:
+                return "Nothing scheduled", expires_at
+
+            when = time.strftime(
+                "%H:%M" if entry.start - now < 86400 else "%a %d.%m. %H:%M",
+                time.localtime(entry.start),
+            )
+            return f"Next: {entry.topic} at {when}", expires_at
+
+        midnight = (
+            (datetime.fromtimestamp(now) + timedelta(days=1))
+            .replace(hour=0, minute=0, second=0, microsecond=0)
+            .timestamp()
+        )
+        entries = scheduler.active_entries(channel, now)
+        entries.extend(scheduler.entries_starting(channel, now, midnight))
+        if not entries:
+            return "Nothing scheduled for the rest of today", min(expires_at, midnight)
+
+        return (
+            "Today: " + ", ".join(_describe(entry) for entry in entries),
+            min(expires_at, midnight),
+        )
+
+    def _cached_answer(self, channel: str, key: str, command: str) -> str:
+        now = self._clock()
+        generation = self.scheduler.generation(channel)
+        cached = self._cache.get((key, command))
+        if (
+            cached is not None
+            and cached.generation == generation
+            and now < cached.expires_at
+        ):
+            self._cache_hits.inc()
+            return cached.text
+
+        self._cache_misses.inc()
+        text, expires_at = self._answer(channel, command, now)
+        # whole reply must fit on one line: "PRIVMSG <channel> :<text>"
+        text = fit_topic(
+            text, MAX_LINE_BYTES - len(b"PRIVMSG  :") - len(channel.encode("utf-8"))
+        )
+        self._cache[(key, command)] = _CachedAnswer(text, generation, expires_at)
+        return text
+
+    def _bucket(
+        self, buckets: dict[str, TokenBucket], key: str, rate: float, burst: int
+    ) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= _MAX_BUCKETS:
+                # full buckets are the same as new ones, forgetting them changes nothing
+                for stale in [k for k, b in buckets.items() if b.tokens >= b.capacity]:
+                    del buckets[stale]
+            bucket = buckets[key] = TokenBucket(rate, burst, self._monotonic)
+
+        return bucket
+
+    def respond(self, channel: str, nick: str, text: str) -> str | None:
+        """Answer to message nick sent to channel, None if it isn't answered"""
+        command = text.split(maxsplit=1)[0].lower() if text else ""
+        if command not in COMMANDS:
+            return None
+
+        key = self.casefold(channel)
+        answer = self._cached_answer(
+            self._scheduled_channel(channel, key), key, command
+        )
+
+        now = self._monotonic()
+        last = self._last_sent.get((key, command))
+        if (
+            last is not None
+            and now - last[0] < self.collapse_window
+            and last[1] == answer
+        ):
+            self._count(command, "collapsed")
+            return None
+
+        user = self._bucket(
+            self._user_buckets, self.casefold(nick), self.user_rate, self.user_burst
+        )
+        channel_bucket = self._bucket(
+            self._channel_buckets, key, self.channel_rate, self.channel_burst
+        )
+        if user.tokens < 1 or channel_bucket.tokens < 1:
+            self._count(command, "rate_limited")
+            return None
+
+        user.try_consume()
+        channel_bucket.try_consume()
+        self._last_sent[(key, command)] = (now, answer)
+        self._count(command, "answered")
+        return answer
@@ -1,62 +1,59 @@
-import threading
-import copy
-from typing import Iterator
+import random
+
+from src.metrics import MetricsRegistry
 
 
 class ReconnectDelayUtility:
     """
     Utility class for managing the reconnection delays.
-    Has internal timer which starts when first delay is obtained. Timer resets after 2h.
-    If 3 tries of reconnection have been tried within those 2h. Program exits with sys.exit(1) i.e
-    program assumes that if 3 consecutive tries fail failure is critical and would need someone to look into it.
-    """
 
-    def __init__(
-        self, delays: list[int] | None = None, reset_window: int | None = None
-    ):
-        self._delays: list[int] = [60, 300, 3600]
-        self._reset_window: int = 7200  # in seconds
+    Delays grow exponentially with every consecutive attempt and are randomized ("full jitter",
+    see https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/):
+    n:th attempt waits random time between 0 and min(max_delay, base_delay * 2^(n-1)) seconds.
+    First attempt is therefore almost immediate, which gets bot back to channels within seconds
+    of a server restart, while jitter keeps bots of many networks (or many bots on same host)
+    from hammering recovering server at the same moment.
 
-        if delays is not None:
-            self._delays: list[int] = copy.copy(delays)
+    Attempts are counted until reset() is called, caller should do that once connection
+    has proven to be usable (see IRCClient.reconnect).
 
-        if reset_window is not None:
-            self._reset_window: int = reset_window
+    param int | None max_attempts: After this many consecutive attempts get_next_delay() returns -1
+                                   i.e caller should give up. None retries forever.
+    """
 
-        self._delay_iterator: Iterator[int] = iter(self._delays)
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        max_attempts: int | None = None,
+        *,
+        rng: random.Random | None = None,
+    ):
+        self._base_delay: float = base_delay
+        self._max_delay: float = max_delay
+        self._max_attempts: int | None = max_attempts
+        self._rng: random.Random = rng or random.Random()
         self.retry_attempts: int = 0
-        self.timer_thread: threading.Timer | None = None
+        self._reconnects = MetricsRegistry().counter(
+            "irc_reconnects_total", "Reconnection attempts"
+        )
 
-    def _start_timer(self):
-        if self.timer_thread:
-            self.timer_thread.cancel()
-
-        self.timer_thread = threading.Timer(self._reset_window, self._reset_timer)
-        self.timer_thread.daemon = True
-        self.timer_thread.start()
-
-    def _reset_timer(self):
-        self._delay_iterator = iter(self._delays)
+    def reset(self) -> None:
+        """Starts backoff from the beginning, next delay is at most base_delay again"""
         self.retry_attempts = 0
-        print("Reconnect timer is reseted")
-
-    def stop_timer(self):
-        """
-        Stops the timer. This must be called before program exits to guarantee graceful exit
-        on shutdown. Program will still halt if critical error happens in main thread but this guarantees
-        that thread exits as intended.
-
-        """
-        if self.timer_thread:
-            self.timer_thread.cancel()
 
-    def get_next_delay(self) -> int:
+    def get_next_delay(self) -> float:
         """
-        Obtain next delay from self._delay_iterator. Additionally starts internal
-        timer to keep track of when reconnection delays should reset. If self._delay_iterator is completely
-        exhausted returns -1 to indicate reconnection failure.
+        Returns seconds to wait before next reconnection attempt
+        or -1 if max_attempts consecutive attempts have already been made.
         """
+        if self._max_attempts is not None and self.retry_attempts >= self._max_attempts:
+            return -1
 
-        self._start_timer()
+        # cap exponent so that float doesn't overflow after many attempts
+        ceiling = min(
+            self._max_delay, self._base_delay * 2 ** min(self.retry_attempts, 64)
+        )
         self.retry_attempts += 1
-        return next(self._delay_iterator, -1)
+        self._reconnects.inc()
+        return self._rng.uniform(0, ceiling)
@@ -0,0 +1,93 @@
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+from src.calendar_backend import (
+    CalendarBackend,
+    CalendarEvent,
+    SyncResult,
+    SyncTokenExpired,
+)
+
+
+class _CalendarState:
+    __slots__ = ("events", "sync_token")
+
+    def __init__(self):
+        self.events: dict[str, CalendarEvent] = {}
+        self.sync_token: str | None = None
+
+    def apply(self, result: SyncResult) -> int:
+        """Applies sync result and returns number of changed events"""
+        if result.full_sync:
+            changed = len(self.events) + len(result.events)
+            self.events = {}
+        else:
+            changed = len(result.events)
+
+        for event in result.events:
+            if event.cancelled:
+                self.events.pop(event.id, None)
+            else:
+                self.events[event.id] = event
+
+        self.sync_token = result.next_sync_token
+        return changed
+
+
+class EventStore:
+    """
+    Local copy of calendar events kept up to date with incremental syncs.
+
+    Store only tracks events. Questions like "what is active now" are answered by
+    TopicScheduler from the schedule CalendarSync builds out of events() after each change.
+    """
+
+    def __init__(self, backend: CalendarBackend):
+        self.backend: CalendarBackend = backend
+        self._calendars: dict[str, _CalendarState] = {}
+        # incremented whenever any calendar changes, lets consumers cheaply detect changes
+        self.version: int = 0
+
+    def _state(self, calendar_id: str) -> _CalendarState:
+        state = self._calendars.get(calendar_id)
+        if state is None:
+            state = self._calendars[calendar_id] = _CalendarState()
+
+        return state
+
+    def calendars(self) -> list[str]:
+        return list(self._calendars)
+
+    def apply(self, calendar_id: str, result: SyncResult) -> int:
+        """
+        Applies result fetched from backend and returns number of changed events.
+        Use this when fetching is done elsewhere (e.g in worker thread).
+        """
+        changed = self._state(calendar_id).apply(result)
+        if changed:
+            self.version += 1
+
+        return changed
+
+    def sync(self, calendar_id: str) -> int:
+        """
+        Fetches changes of the calendar from backend and returns number of changed events.
+        Falls back to full sync if backend rejects the sync token.
+        """
+        token = self._state(calendar_id).sync_token
+        try:
+            result = self.backend.list_events(calendar_id, token)
+        except SyncTokenExpired:
+            result = self.backend.list_events(calendar_id, None)
+
+        return self.apply(calendar_id, result)
+
+    def sync_token(self, calendar_id: str) -> str | None:
+        return self._state(calendar_id).sync_token
+
+    def events(self, calendar_id: str) -> list[CalendarEvent]:
+        """Every stored event of the calendar ordered by start"""
+        return sorted(
+            self._state(calendar_id).events.values(), key=lambda event: event.start
+        )
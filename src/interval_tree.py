@@ -0,0 +1,117 @@
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class _Node(Generic[T]):
+    __slots__ = ("center", "left", "right", "by_start", "by_end")
+
+    def __init__(self, center: float):
+        self.center: float = center
+        self.left: _Node[T] | None = None
+        self.right: _Node[T] | None = None
+        # intervals overlapping center sorted by start ascending and by end descending
+        self.by_start: list[tuple[float, float, T]] = []
+        self.by_end: list[tuple[float, float, T]] = []
+
+
+def _build(intervals: list[tuple[float, float, T]]) -> _Node[T] | None:
+    if not intervals:
+        return None
+
+    # Median of start points is always inside at least one interval (start <= center < end)
+    # so every level consumes at least one interval and recursion terminates
+    starts = sorted(start for start, _, _ in intervals)
+    node: _Node[T] = _Node(starts[len(starts) // 2])
+
+    left: list[tuple[float, float, T]] = []
+    right: list[tuple[float, float, T]] = []
+    overlapping: list[tuple[float, float, T]] = []
+    for interval in intervals:
+        start, end, _ = interval
+        if end <= node.center:
+            left.append(interval)
+        elif start > node.center:
+            right.append(interval)
+        else:
+            overlapping.append(interval)
+
+    node.by_start = sorted(overlapping, key=lambda interval: interval[0])
+    node.by_end = sorted(overlapping, key=lambda interval: interval[1], reverse=True)
+    node.left = _build(left)
+    node.right = _build(right)
+    return node
+
+
+class IntervalTree(Generic[T]):
+    """
+    Static centered interval tree (https://en.wikipedia.org/wiki/Interval_tree#Centered_interval_tree)
+    over half-open intervals [start, end).
+
+    Tree is built once from all intervals, point queries take O(log n + k) where k is
+    number of matching intervals. Additionally keeps intervals sorted by start so that
+    "next interval starting after t" is a binary search.
+
+    NOTE: tree is immutable, build new one when intervals change
+    """
+
+    def __init__(self, intervals: Iterable[tuple[float, float, T]]):
+        items = [interval for interval in intervals if interval[0] < interval[1]]
+        self._root: _Node[T] | None = _build(items)
+        items.sort(key=lambda interval: interval[0])
+        self._sorted: list[tuple[float, float, T]] = items
+        self._starts: list[float] = [interval[0] for interval in items]
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def __iter__(self) -> Iterator[tuple[float, float, T]]:
+        """Every interval ordered by start"""
+        return iter(self._sorted)
+
+    def at(self, point: float) -> list[tuple[float, float, T]]:
+        """Returns every interval containing point i.e start <= point < end"""
+        found: list[tuple[float, float, T]] = []
+        node = self._root
+        while node is not None:
+            if point < node.center:
+                # every interval here ends after center so only start needs to be checked
+                for interval in node.by_start:
+                    if interval[0] > point:
+                        break
+                    found.append(interval)
+                node = node.left
+
+            elif point > node.center:
+                # every interval here starts before center so only end needs to be checked
+                for interval in node.by_end:
+                    if interval[1] <= point:
+                        break
+                    found.append(interval)
+                node = node.right
+
+            else:
+                # intervals in subtrees either end before or start after center
+                found.extend(node.by_start)
+                break
+
+        return found
+
+    def next_after(self, point: float) -> tuple[float, float, T] | None:
+        """Returns interval with the earliest start strictly after point"""
+        index = bisect_right(self._starts, point)
+        return self._sorted[index] if index < len(self._sorted) else None
+
+    def starting_between(
+        self, start: float, end: float
+    ) -> list[tuple[float, float, T]]:
+        """Returns intervals which start within [start, end)"""
+        return self._sorted[
+            bisect_left(self._starts, start) : bisect_left(self._starts, end)
+        ]
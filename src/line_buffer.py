@@ -0,0 +1,112 @@
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    import socket
+
+
+class LineBuffer:
+    """
+    Persistent receive buffer which frames incoming socket data into IRC lines.
+
+    Data is read straight into preallocated bytearray with socket.recv_into(...) so reading
+    doesn't allocate new bytes object for every chunk. Only complete lines are handed out,
+    incomplete line at the end of the read is kept in the buffer until rest of it arrives.
+    This matters especially on JOIN/NAMES/WHO bursts where server sends tens of kilobytes
+    at once and chunk boundaries almost never match line boundaries.
+
+    NOTE: lines are yielded without trailing \\r\\n (or plain \\n which some servers use).
+          Empty lines are skipped.
+    """
+
+    def __init__(self, size: int = 16384, max_size: int = 1 << 20):
+        self._buffer: bytearray = bytearray(size)
+        self._view: memoryview = memoryview(self._buffer)
+        self._max_size: int = max_size
+        # _start points to first unconsumed byte and _end to the end of received data
+        self._start: int = 0
+        self._end: int = 0
+
+    def __len__(self) -> int:
+        """Amount of buffered bytes which are not yet handed out as lines"""
+        return self._end - self._start
+
+    def clear(self) -> None:
+        """Drops all buffered data. Call this whenever underlying connection is replaced"""
+        self._start = 0
+        self._end = 0
+
+    def _make_room(self) -> None:
+        if self._start > 0:
+            # Move pending partial line to the beginning of the buffer. Lengths of the slices
+            # match so bytearray isn't resized (which isn't allowed while memoryview exists)
+            pending = self._end - self._start
+            self._buffer[:pending] = self._view[self._start : self._end]
+            self._start = 0
+            self._end = pending
+            return
+
+        # Buffer is full of single unterminated line, grow it or if that isn't possible
+        # drop the line altogether. IRC lines (even with IRCv3 tags) are nowhere near max_size
+        # so this only happens if server misbehaves.
+        size = len(self._buffer)
+        if size >= self._max_size:
+            self.clear()
+            return
+
+        self._view.release()
+        self._buffer.extend(bytes(min(size, self._max_size - size)))
+        self._view = memoryview(self._buffer)
+
+    def fill(self, sock: socket.socket) -> int:
+        """
+        Reads available data from sock into free space of the buffer.
+        Returns number of bytes read, 0 means that the peer has closed the connection.
+        """
+        if self._end == len(self._buffer):
+            self._make_room()
+
+        received = sock.recv_into(self._view[self._end :])
+        self._end += received
+        return received
+
+    def pending(self) -> bytes:
+        """Copy of buffered data which isn't handed out yet i.e start of incomplete line"""
+        return bytes(self._view[self._start : self._end])
+
+    def feed(self, data: bytes) -> None:
+        """Appends data to the buffer without socket. Mostly useful for replaying traffic"""
+        view = memoryview(data)
+        while view:
+            if self._end == len(self._buffer):
+                self._make_room()
+
+            n = min(len(view), len(self._buffer) - self._end)
+            self._view[self._end : self._end + n] = view[:n]
+            self._end += n
+            view = view[n:]
+
+    def lines(self) -> Iterator[bytes]:
+        """Yields every complete line currently in the buffer"""
+        find = self._buffer.find
+        while True:
+            newline = find(b"\n", self._start, self._end)
+            if newline == -1:
+                break
+
+            end = newline
+            if end > self._start and self._buffer[end - 1] == 0x0D:  # \r
+                end -= 1
+
+            line = bytes(self._view[self._start : end])
+            self._start = newline + 1
+            if line:
+                yield line
+
+        if self._start == self._end:
+            # Everything is consumed, start next read from the beginning of the buffer
+            self._start = 0
+            self._end = 0
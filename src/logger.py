@@ -17,14 +17,51 @@ Other conventions: All loggers created here should have some kind of base parent
                    during runtime and avoid duplicate handlers in loggers
 """
 
+import atexit
+import itertools
 import logging
+import queue
+
 from functools import cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Literal
+
+from src.settings import RuntimeSettings
+
+# background threads writing queued records, see LoggerManager.flush()
+_listeners: list[QueueListener] = []
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler which enqueues records as is. Default QueueHandler.prepare(...) formats
+    the message in the calling thread, here formatting is left for the listener thread
+    so that the logging thread only pays for creating the record.
+
+    NOTE: message arguments must not change after logging call since they are formatted later
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _SamplingFilter(logging.Filter):
+    """Lets through only first of every n records"""
+
+    def __init__(self, n: int):
+        super().__init__()
+        self._counter = itertools.count()
+        self._n: int = n
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return next(self._counter) % self._n == 0
 
 
 @cache  # Make this function only run once subsequent calls only return result of first call
 def _initialize_socket_logger() -> logging.Logger:
     """
-    Logger for tracking socket trafic.
+    Logger for tracking socket trafic. Records are passed through queue to a background
+    thread which formats and writes them, so slow stderr doesn't slow down socket I/O.
 
     extra formatter fields:
         %(traffic_direction): Shows if socket receives (RECEIVED <<<) or sends message (SENT >>>)
@@ -38,8 +75,43 @@ def _initialize_socket_logger() -> logging.Logger:
 
     ch = logging.StreamHandler()
     ch.setFormatter(formatter)
+
+    record_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = QueueListener(record_queue, ch, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    # flush remaining records on exit
+    atexit.register(listener.stop)
+
     logger.setLevel(logging.INFO)
-    logger.addHandler(ch)
+    logger.addHandler(_DeferredQueueHandler(record_queue))
+
+    return logger
+
+
+@cache
+def _initialize_socket_traffic_logger(
+    direction: Literal["in", "out"],
+) -> logging.Logger:
+    """
+    Child loggers of bot.socket for incoming (bot.socket.in) and outgoing (bot.socket.out) traffic.
+    Level and sampling of each direction is set with RuntimeSettings
+    (traffic_log_level_<direction> and traffic_log_sample_<direction>). Records propagate
+    to bot.socket which handles writing them.
+
+    extra formatter fields:
+        same as in _initialize_socket_logger
+    """
+
+    _initialize_socket_logger()
+    settings = RuntimeSettings.from_env()
+    level: str = getattr(settings, f"traffic_log_level_{direction}")
+    sample: int = getattr(settings, f"traffic_log_sample_{direction}")
+
+    logger = logging.getLogger(f"bot.socket.{direction}")
+    logger.setLevel(level.upper())
+    if sample > 1:
+        logger.addFilter(_SamplingFilter(sample))
 
     return logger
 
@@ -65,8 +137,20 @@ class LoggerManager:
             # Add name of the logger and its initialization function here
             # initialization function can be any kind of callable but must return
             # logging.Logger object
-            "socket": _initialize_socket_logger()
+            "socket": _initialize_socket_logger(),
+            "socket.in": _initialize_socket_traffic_logger("in"),
+            "socket.out": _initialize_socket_traffic_logger("out"),
         }
 
     def get_logger(self, name: str) -> logging.Logger:
         return self._loggers[name]
+
+    def flush(self) -> None:
+        """
+        Waits until every queued record has been written. Call this before replacing
+        the process with os.exec*(...) since atexit handlers don't run then.
+        """
+        for listener in _listeners:
+            # stop() writes out the queue, restart keeps logging working if exec fails
+            listener.stop()
+            listener.start()
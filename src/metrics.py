@@ -0,0 +1,267 @@
+"""
+Module for runtime metrics of the bot.
+
+Metrics are kept in MetricsRegistry and exposed in Prometheus text format
+(https://prometheus.io/docs/instrumenting/exposition_formats/) either through HTTP endpoint
+on localhost (MetricsServer) or by dumping them to stderr on signal (install_dump_signal).
+
+Style guide: metric names follow Prometheus conventions, prefix them with irc_ and end counters
+             with _total and durations with _seconds. Fetch metric objects once (e.g in __init__)
+             and keep reference to them, updating metric on hot path must be plain attribute update.
+             Keep label cardinality bounded, never use user controlled values as labels.
+"""
+
+import queue
+import signal
+import sys
+import threading
+
+from bisect import bisect_left
+from functools import cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import FrameType
+
+# Buckets in seconds covering everything from fast handlers (microseconds) to slow reconnects
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.00001,
+    0.00005,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1,
+    5,
+    30,
+)
+
+
+class Counter:
+    """
+    Monotonically increasing value.
+
+    NOTE: updates are not locked, under GIL lost increments are possible only when multiple
+          threads update same counter at the same time which is acceptable for metrics
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value: float = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets: tuple[float, ...] = buckets
+        # last slot counts observations larger than the largest bucket
+        self.counts: list[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+Metric = Counter | Gauge | Histogram
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Family:
+    __slots__ = ("kind", "help", "children")
+
+    def __init__(self, kind: str, help: str):
+        self.kind: str = kind
+        self.help: str = help
+        self.children: dict[tuple[tuple[str, str], ...], Metric] = {}
+
+
+class MetricsRegistry:
+    """
+    Process wide registry of metrics. Same as LoggerManager this is a singleton
+    so every module can fetch metrics without passing registry around.
+    """
+
+    _instance: "MetricsRegistry | None" = None
+    _families: dict[str, _Family]
+    _lock: threading.Lock
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super().__new__(cls)
+            instance._families = {}
+            instance._lock = threading.Lock()
+            cls._instance = instance
+
+        return cls._instance
+
+    def _get(self, kind: str, name: str, help: str, labels: dict[str, str], factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = _Family(kind, help)
+            elif family.kind != kind:
+                raise ValueError(
+                    f"Metric {name} is already registered as {family.kind}"
+                )
+
+            metric = family.children.get(key)
+            if metric is None:
+                metric = family.children[key] = factory()
+
+        return metric
+
+    def counter(self, name: str, help: str, **labels: str) -> Counter:
+        return self._get("counter", name, help, labels, Counter)
+
+    def gauge(self, name: str, help: str, **labels: str) -> Gauge:
+        return self._get("gauge", name, help, labels, Gauge)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        return self._get("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def render(self) -> str:
+        """Returns every metric in Prometheus text exposition format"""
+        lines: list[str] = []
+        with self._lock:
+            families = [
+                (name, family, list(family.children.items()))
+                for name, family in sorted(self._families.items())
+            ]
+
+        for name, family, children in families:
+            lines.append(f"# HELP {name} {family.help}")
+            lines.append(f"# TYPE {name} {family.kind}")
+            for labels, metric in children:
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(
+                        (*metric.buckets, float("inf")), metric.counts
+                    ):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        bucket_labels = _format_labels((*labels, ("le", le)))
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+
+                    lines.append(
+                        f"{name}_sum{_format_labels(labels)} {_format_value(metric.sum)}"
+                    )
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                else:
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_format_value(metric.value)}"
+                    )
+
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        body = MetricsRegistry().render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # scrapes would otherwise flood stderr
+        pass
+
+
+class MetricsServer:
+    """
+    Serves metrics at http://<host>:<port>/metrics from daemon thread.
+    Binds to localhost by default, metrics are not meant to be public.
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        self._server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="metrics-server", daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# signals which asked for dump, see install_dump_signal(...)
+_dump_requests: queue.SimpleQueue[int] = queue.SimpleQueue()
+
+
+def _request_dump(signum: int, frame: FrameType | None) -> None:
+    # Handler runs in the middle of whatever main thread was doing, e.g registering metric
+    # while holding registry lock which render() takes. SimpleQueue.put is reentrant so only
+    # the request is queued here, rendering and writing are done by the dump thread.
+    _dump_requests.put(signum)
+
+
+def _dump_loop() -> None:
+    while True:
+        _dump_requests.get()
+        sys.stderr.write(MetricsRegistry().render())
+        sys.stderr.flush()
+
+
+@cache
+def _start_dump_thread() -> None:
+    threading.Thread(target=_dump_loop, name="metrics-dump", daemon=True).start()
+
+
+def install_dump_signal(signum: int = signal.SIGUSR1) -> None:
+    """Dumps metrics to stderr whenever process receives signum (default SIGUSR1)"""
+    _start_dump_thread()
+    signal.signal(signum, _request_dump)
@@ -0,0 +1,350 @@
+"""
+Module for parsing raw IRC lines into messages.
+
+Message format follows RFC1459/RFC2812 (https://www.rfc-editor.org/rfc/rfc2812#section-2.3.1)
+extended with IRCv3 message tags (https://ircv3.net/specs/extensions/message-tags):
+
+    [@<tags> ]:[<prefix> ]<command> <params> [:<trailing>]
+
+Style guide: parsing is split into two phases. Splitting line into tags/prefix/command/params
+             is done once when Message is created, everything else (decoding params, unescaping
+             tags, splitting prefix into nick/user/host) is done lazily when caller first reads
+             the field and then cached. When adding new fields follow the same pattern and add
+             the cache attribute into __slots__.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import re
+
+from typing import Iterable, Iterator
+
+# Used as "not computed yet" marker for lazily computed fields, None is valid value for some of them
+_UNSET = object()
+
+# https://ircv3.net/specs/extensions/message-tags#escaping-values
+_TAG_ESCAPES: dict[str, str] = {
+    ":": ";",
+    "s": " ",
+    "\\": "\\",
+    "r": "\r",
+    "n": "\n",
+}
+
+
+# ISUPPORT values escape some characters as \xHH (https://modern.ircdocs.horse/#rplisupport-005)
+_ISUPPORT_ESCAPE = re.compile(r"\\x([0-9A-Fa-f]{2})")
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _unescape_tag_value(value: str) -> str:
+    if "\\" not in value:
+        return value
+
+    chars: list[str] = []
+    escaped = False
+    for char in value:
+        if escaped:
+            # Unknown escapes drop the backslash, trailing lone backslash is dropped as well
+            chars.append(_TAG_ESCAPES.get(char, char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        else:
+            chars.append(char)
+
+    return "".join(chars)
+
+
+class Message:
+    """
+    Single parsed IRC line. Only command is parsed eagerly since it is needed for dispatching,
+    rest of the fields are computed on first access.
+
+    NOTE: command is always uppercase string e.g "PRIVMSG" or numeric such as "001"
+    """
+
+    __slots__ = (
+        "raw",
+        "command",
+        "_tags_raw",
+        "_prefix_raw",
+        "_params_raw",
+        "_tags",
+        "_params",
+        "_source",
+    )
+
+    def __init__(
+        self,
+        raw: bytes,
+        command: str,
+        tags_raw: bytes | None,
+        prefix_raw: bytes | None,
+        params_raw: bytes,
+    ):
+        self.raw: bytes = raw
+        self.command: str = command
+        self._tags_raw: bytes | None = tags_raw
+        self._prefix_raw: bytes | None = prefix_raw
+        self._params_raw: bytes = params_raw
+        self._tags: dict[str, str | None] | object = _UNSET
+        self._params: list[str] | object = _UNSET
+        self._source: tuple[str, str | None, str | None] | object = _UNSET
+
+    @classmethod
+    def from_bytes(cls, line: bytes) -> Message:
+        """Splits raw line (without trailing \\r\\n) into tags, prefix, command and params"""
+        pos = 0
+        end = len(line)
+        tags_raw: bytes | None = None
+        prefix_raw: bytes | None = None
+
+        if line.startswith(b"@"):
+            space = line.find(b" ")
+            if space == -1:
+                space = end
+
+            tags_raw = line[1:space]
+            pos = space + 1
+            while pos < end and line[pos] == 0x20:
+                pos += 1
+
+        if line.startswith(b":", pos):
+            space = line.find(b" ", pos)
+            if space == -1:
+                space = end
+
+            prefix_raw = line[pos + 1 : space]
+            pos = space + 1
+            while pos < end and line[pos] == 0x20:
+                pos += 1
+
+        space = line.find(b" ", pos)
+        if space == -1:
+            command = line[pos:]
+            params_raw = b""
+        else:
+            command = line[pos:space]
+            params_raw = line[space + 1 :]
+
+        return cls(
+            line,
+            command.decode("ascii", errors="replace").upper(),
+            tags_raw,
+            prefix_raw,
+            params_raw,
+        )
+
+    @classmethod
+    def from_str(cls, line: str) -> Message:
+        return cls.from_bytes(line.encode("utf-8"))
+
+    def __repr__(self) -> str:
+        return f"Message({self.raw!r})"
+
+    def __str__(self) -> str:
+        return _decode(self.raw)
+
+    @property
+    def params(self) -> list[str]:
+        """Decoded parameters of the message, trailing parameter is the last item"""
+        if self._params is _UNSET:
+            self._params = self._split_params()
+
+        return self._params  # type: ignore[return-value]
+
+    def _split_params(self) -> list[str]:
+        raw = self._params_raw
+        if not raw:
+            return []
+
+        if raw.startswith(b":"):
+            return [_decode(raw[1:])]
+
+        trailing_at = raw.find(b" :")
+        if trailing_at == -1:
+            return [_decode(param) for param in raw.split()]
+
+        params = [_decode(param) for param in raw[:trailing_at].split()]
+        params.append(_decode(raw[trailing_at + 2 :]))
+        return params
+
+    @property
+    def trailing(self) -> str:
+        """Last parameter of the message or empty string if there is no parameters"""
+        params = self.params
+        return params[-1] if params else ""
+
+    @property
+    def tags(self) -> dict[str, str | None]:
+        """
+        IRCv3 message tags with unescaped values. Tags without value map to None
+        and messages without tags return empty dictionary
+        """
+        if self._tags is _UNSET:
+            tags: dict[str, str | None] = {}
+            if self._tags_raw:
+                for item in _decode(self._tags_raw).split(";"):
+                    if not item:
+                        continue
+
+                    key, sep, value = item.partition("=")
+                    tags[key] = _unescape_tag_value(value) if sep else None
+
+            self._tags = tags
+
+        return self._tags  # type: ignore[return-value]
+
+    @property
+    def prefix(self) -> str | None:
+        """Raw prefix (source) of the message e.g nick!user@host or server name"""
+        return None if self._prefix_raw is None else _decode(self._prefix_raw)
+
+    def _split_source(self) -> tuple[str, str | None, str | None]:
+        if self._source is _UNSET:
+            prefix = self.prefix or ""
+            nick, _, host = prefix.partition("@")
+            nick, _, user = nick.partition("!")
+            self._source = (nick, user or None, host or None)
+
+        return self._source  # type: ignore[return-value]
+
+    @property
+    def nick(self) -> str:
+        """Nick (or server name) part of the prefix, empty string if message has no prefix"""
+        return self._split_source()[0]
+
+    @property
+    def user(self) -> str | None:
+        return self._split_source()[1]
+
+    @property
+    def host(self) -> str | None:
+        return self._split_source()[2]
+
+
+class MessageParser:
+    """
+    Collection of parsing utilities used by BotRunner's handlers.
+    Helpers which extract data for specific responses return tuple of (data, err)
+    where err is None on success and otherwise describes why parsing failed.
+    """
+
+    @staticmethod
+    def parse(line: bytes | str) -> Message:
+        if isinstance(line, str):
+            return Message.from_str(line)
+
+        return Message.from_bytes(line)
+
+    @staticmethod
+    def parse_lines(lines: Iterable[bytes]) -> Iterator[Message]:
+        """Parses raw lines (e.g from IRCClient.receive_message) into messages one by one"""
+        from_bytes = Message.from_bytes
+        for line in lines:
+            yield from_bytes(line)
+
+    @staticmethod
+    def get_response_code(msg: Message) -> str:
+        return msg.command
+
+    @staticmethod
+    def get_mode_data(
+        msg: Message,
+    ) -> tuple[tuple[str, str, str], str | None]:
+        """
+        Returns (target, flag, param) of MODE message e.g ("#chan", "+o", "nick").
+        Param is empty string for modes without parameter.
+        """
+        params = msg.params
+        if msg.command != "MODE" or len(params) < 2:
+            return ("", "", ""), f"Malformed MODE message: {msg}"
+
+        param = params[2] if len(params) > 2 else ""
+        return (params[0], params[1], param), None
+
+    @staticmethod
+    def get_whois_channels_data(
+        msg: Message,
+    ) -> tuple[tuple[str, list[str]], str | None]:
+        """
+        Returns (nick, channels) of RPL_WHOISCHANNELS (319) message. Channel names
+        keep their membership prefixes e.g ["@#chan", "+#other", "#third"]
+        """
+        params = msg.params
+        if msg.command != "319" or len(params) < 3:
+            return ("", []), f"Malformed RPL_WHOISCHANNELS message: {msg}"
+
+        return (params[1], params[2].split()), None
+
+    @staticmethod
+    def get_isupport_tokens(
+        msg: Message,
+    ) -> tuple[dict[str, str | None], str | None]:
+        """
+        Returns tokens of RPL_ISUPPORT (005) message e.g {"TOPICLEN": "390", "EXCEPTS": ""}.
+        Tokens without value map to empty string and negated tokens (-KEY) map to None
+        which means that previously advertised token should be removed.
+        """
+        params = msg.params
+        if msg.command != "005" or len(params) < 3:
+            return {}, f"Malformed RPL_ISUPPORT message: {msg}"
+
+        tokens: dict[str, str | None] = {}
+        # first param is our nick and last one is "are supported by this server"
+        for token in params[1:-1]:
+            if token.startswith("-"):
+                tokens[token[1:]] = None
+                continue
+
+            key, _, value = token.partition("=")
+            tokens[key] = _ISUPPORT_ESCAPE.sub(
+                lambda match: chr(int(match.group(1), 16)), value
+            )
+
+        return tokens, None
+
+    @staticmethod
+    def get_cap_data(
+        msg: Message,
+    ) -> tuple[tuple[str, dict[str, str], bool], str | None]:
+        """
+        Returns (subcommand, capabilities, more) of CAP message e.g
+        ":server CAP nick LS * :sasl=PLAIN,EXTERNAL multi-prefix" ->
+        ("LS", {"sasl": "PLAIN,EXTERNAL", "multi-prefix": ""}, True).
+        more is True when reply continues on next line (multiline LS/LIST).
+        Disabled capabilities in ACK keep their prefix e.g {"-away-notify": ""}
+        """
+        params = msg.params
+        if msg.command != "CAP" or len(params) < 3:
+            return ("", {}, False), f"Malformed CAP message: {msg}"
+
+        more = len(params) > 3 and params[2] == "*"
+        caps: dict[str, str] = {}
+        for token in params[-1].split():
+            key, _, value = token.partition("=")
+            caps[key] = value
+
+        return (params[1].upper(), caps, more), None
+
+    @staticmethod
+    def parse_targmax(value: str) -> dict[str, int | None]:
+        """
+        Parses value of TARGMAX ISUPPORT token e.g "PRIVMSG:4,JOIN:" -> {"PRIVMSG": 4, "JOIN": None}
+        where None means that there is no limit
+        """
+        limits: dict[str, int | None] = {}
+        for item in value.split(","):
+            command, _, limit = item.partition(":")
+            if not command:
+                continue
+
+            limits[command.upper()] = int(limit) if limit.isdigit() else None
+
+        return limits
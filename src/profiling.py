@@ -0,0 +1,306 @@
+"""
+Module for profiling running bot without restarting it.
+
+Lag in production tends to disappear when the bot is restarted under a profiler, so profilers
+are switched on and off at runtime (signal or admin's private message, see BotRunner) and
+results are written into timestamped files in output directory:
+
+    cpu-<time>-<pid>.prof       cProfile stats of the loop thread, load with pstats or snakeviz
+    cpu-<time>-<pid>.txt        the same sorted by cumulative time
+    handlers-<time>-<pid>.txt   sampled wall time of message handlers
+    memory-<time>-<pid>.txt     largest tracemalloc allocations and changes since previous snapshot
+
+Style guide: profilers cost nothing while they are off. Nothing is hooked into the hot paths,
+             profilers are enabled only for the time they run (and BotRunner swaps in sampling
+             dispatch only while handlers are timed).
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+
+from collections.abc import Callable
+
+# what can be profiled, in the order status lists them
+KINDS = ("cpu", "handlers", "memory")
+
+# frames stored per traced allocation, more frames makes tracing slower
+_MEMORY_FRAMES = 1
+# lines of cProfile and tracemalloc output written to text files
+_TOP_LINES = 40
+
+_USAGE = (
+    "Usage: !profile status | cpu|handlers|memory [seconds] | snapshot "
+    "| stop [cpu|handlers|memory]"
+)
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Profiler:
+    """
+    Runtime profiling controls. Each kind of profiler runs until it is stopped
+    or for given number of seconds, poll() stops expired ones.
+
+    - cpu: cProfile of the thread which started it i.e the thread running the IRC loop
+    - handlers: wall time of every handler_sample:th dispatched message per handler
+    - memory: tracemalloc, snapshot() writes allocations and difference to previous snapshot
+
+    Methods return human readable outcome (including paths of written files)
+    to be shown to whoever asked for it.
+
+    NOTE: call everything from the thread running the IRC loop. cProfile only sees the thread
+          which enabled it.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        duration: float = 30.0,
+        handler_sample: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.output_dir: str = output_dir
+        # seconds profilers run when no duration is given
+        self.duration: float = duration
+        self.handler_sample: int = max(handler_sample, 1)
+        self._clock: Callable[[], float] = clock
+        # running kind -> time (see clock) when it is stopped, None runs until stopped
+        self._deadlines: dict[str, float | None] = {}
+        self._cpu: cProfile.Profile | None = None
+        # handler name -> sampled durations
+        self._handler_times: dict[str, list[float]] = {}
+        self._handler_countdown: int = 0
+        # tracemalloc may have been started by someone else (PYTHONTRACEMALLOC)
+        self._memory_owned: bool = False
+        self._memory_baseline: tracemalloc.Snapshot | None = None
+
+    def __contains__(self, kind: str) -> bool:
+        """True if profiler of the kind is running"""
+        return kind in self._deadlines
+
+    def __bool__(self) -> bool:
+        return bool(self._deadlines)
+
+    def _path(self, kind: str, extension: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.{extension}"
+        return os.path.join(self.output_dir, name)
+
+    def status(self) -> str:
+        if not self._deadlines:
+            return "Profiling is off"
+
+        now = self._clock()
+        running = [
+            kind if deadline is None else f"{kind} ({max(deadline - now, 0):.0f}s left)"
+            for kind, deadline in self._deadlines.items()
+        ]
+        return f"Profiling: {', '.join(running)}"
+
+    def start(self, kind: str, seconds: float | None = None) -> str:
+        """Starts profiler of the kind, runs until stopped if seconds is None"""
+        if kind not in KINDS:
+            return f"Unknown profiler {kind!r}"
+
+        if kind in self._deadlines:
+            return f"Already profiling {kind}"
+
+        if kind == "cpu":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as err:
+                # another profiler (or debugger) has claimed the thread
+                return f"Can't start cpu profiler: {err}"
+            self._cpu = profile
+        elif kind == "handlers":
+            self._handler_times = {}
+            self._handler_countdown = 0
+        else:
+            self._memory_owned = not tracemalloc.is_tracing()
+            if self._memory_owned:
+                tracemalloc.start(_MEMORY_FRAMES)
+            self._memory_baseline = self._take_snapshot()
+
+        self._deadlines[kind] = None if seconds is None else self._clock() + seconds
+        return f"Started {kind} profiler" + (
+            "" if seconds is None else f" for {seconds:g}s"
+        )
+
+    def stop(self, kind: str) -> str:
+        """Stops profiler of the kind and writes its results"""
+        if kind not in self._deadlines:
+            return f"Not profiling {kind}"
+
+        del self._deadlines[kind]
+        try:
+            if kind == "cpu":
+                return self._stop_cpu()
+            elif kind == "handlers":
+                return self._write_handlers()
+            else:
+                try:
+                    return self._write_memory()
+                finally:
+                    self._memory_baseline = None
+                    if self._memory_owned:
+                        tracemalloc.stop()
+        except OSError as err:
+            return f"Writing {kind} profile failed: {err}"
+
+    def stop_all(self) -> list[str]:
+        return [self.stop(kind) for kind in list(self._deadlines)]
+
+    def toggle(self) -> list[str]:
+        """Stops every profiler if any is running, otherwise starts all of them for duration"""
+        if self._deadlines:
+            return self.stop_all()
+
+        return [self.start(kind, self.duration) for kind in KINDS]
+
+    def snapshot(self) -> str:
+        """Writes memory snapshot while memory profiler keeps running"""
+        if "memory" not in self._deadlines:
+            return "Not profiling memory"
+
+        try:
+            return self._write_memory()
+        except OSError as err:
+            return f"Writing memory profile failed: {err}"
+
+    def time_until_next(self) -> float | None:
+        """Seconds until the earliest running profiler expires"""
+        deadlines = [d for d in self._deadlines.values() if d is not None]
+        if not deadlines:
+            return None
+
+        return max(min(deadlines) - self._clock(), 0.0)
+
+    def poll(self) -> list[str]:
+        """Stops expired profilers and returns their outcomes"""
+        now = self._clock()
+        return [
+            self.stop(kind)
+            for kind, deadline in list(self._deadlines.items())
+            if deadline is not None and deadline <= now
+        ]
+
+    def command(self, args: list[str]) -> list[str]:
+        """Runs "!profile <args>" command sent by admin"""
+        if not args or args == ["status"]:
+            return [self.status()]
+
+        action = args[0].lower()
+        if action == "stop" and len(args) <= 2:
+            if len(args) == 1:
+                return self.stop_all() or ["Profiling is off"]
+            return [self.stop(args[1].lower())]
+
+        if action == "snapshot" and len(args) == 1:
+            return [self.snapshot()]
+
+        if action in KINDS and len(args) <= 2:
+            seconds: float | None = self.duration
+            if len(args) == 2:
+                try:
+                    seconds = float(args[1])
+                except ValueError:
+                    return [_USAGE]
+                if not 0 < seconds < float("inf"):
+                    return ["Duration must be positive number of seconds"]
+            return [self.start(action, seconds)]
+
+        return [_USAGE]
+
+    def _stop_cpu(self) -> str:
+        assert self._cpu is not None
+        profile, self._cpu = self._cpu, None
+        profile.disable()
+        path = self._path("cpu", "prof")
+        profile.dump_stats(path)
+        with open(f"{path[: -len('.prof')]}.txt", "w") as fp:
+            stats = pstats.Stats(profile, stream=fp)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_TOP_LINES)
+
+        return f"CPU profile written to {path}"
+
+    def sample_handlers(self) -> bool:
+        """
+        Whether handlers of the message being dispatched are timed, true for every
+        handler_sample:th call. Only called while handlers are profiled.
+        """
+        self._handler_countdown -= 1
+        if self._handler_countdown > 0:
+            return False
+
+        self._handler_countdown = self.handler_sample
+        return True
+
+    def record_handler(self, name: str, seconds: float) -> None:
+        times = self._handler_times.get(name)
+        if times is None:
+            times = self._handler_times[name] = []
+        times.append(seconds)
+
+    def _write_handlers(self) -> str:
+        times, self._handler_times = self._handler_times, {}
+        path = self._path("handlers", "txt")
+        with open(path, "w") as fp:
+            fp.write(f"Every {self.handler_sample}. message sampled, times in ms\n\n")
+            fp.write(
+                f"{'handler':<32} {'samples':>8} {'total':>10} {'mean':>8} "
+                f"{'p50':>8} {'p99':>8} {'max':>8}\n"
+            )
+            for name, samples in sorted(times.items(), key=lambda i: -sum(i[1])):
+                samples.sort()
+                total = sum(samples)
+                fp.write(
+                    f"{name:<32} {len(samples):>8} {total * 1000:>10.3f} "
+                    f"{total / len(samples) * 1000:>8.3f} "
+                    f"{_percentile(samples, 0.5) * 1000:>8.3f} "
+                    f"{_percentile(samples, 0.99) * 1000:>8.3f} "
+                    f"{samples[-1] * 1000:>8.3f}\n"
+                )
+
+        return f"Handler timings written to {path}"
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                # allocations of cpu profiler running at the same time
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, pstats.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            )
+        )
+
+    def _write_memory(self) -> str:
+        snapshot = self._take_snapshot()
+        baseline, self._memory_baseline = self._memory_baseline, snapshot
+        path = self._path("memory", "txt")
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, "w") as fp:
+            fp.write(
+                f"Traced memory {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n\n"
+            )
+            fp.write("Largest allocations:\n")
+            for stat in snapshot.statistics("lineno")[:_TOP_LINES]:
+                fp.write(f"{stat}\n")
+
+            if baseline is not None:
+                fp.write("\nChanges since previous snapshot:\n")
+                for diff in snapshot.compare_to(baseline, "lineno")[:_TOP_LINES]:
+                    fp.write(f"{diff}\n")
+
+        return f"Memory snapshot written to {path}"
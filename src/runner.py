@@ -1,32 +1,71 @@
+import os
+import signal
+import sys
+import time
+
 from collections.abc import Callable
+from fnmatch import fnmatchcase
+from src.calendar_sync import CalendarSync
 from src.client import IRCClient
-from src.parsing import MessageParser
-
-from functools import wraps
+from src.commands import CommandResponder
+from src.logger import LoggerManager
+from src.metrics import Counter, Histogram, MetricsRegistry
+from src.parsing import Message, MessageParser
+from src.profiling import Profiler
+from src.topic_scheduler import TopicEntry, TopicScheduler
+from src.traffic_capture import flush_capture
+from src.warm_restart import (
+    RESUME_TOKEN_ENV,
+    StateSnapshot,
+    consume_snapshot,
+    is_resumable,
+    load_snapshot,
+    new_resume_token,
+    save_snapshot,
+    take_resume_token,
+)
+
+from types import FrameType
 from typing import ParamSpec, TypeVar
 
 T = TypeVar("T", covariant=True)
 P = ParamSpec("P")
 
 
-def _on_ping(func: Callable[P, T]) -> Callable[P, T | None]:
-    @wraps(func)
-    def _wrapper(*args: P.args, **kwargs: P.kwargs):
-        # Similarily to _on_response requires two args args[0] instance (self) and msg (str)
-        if len(args) < 2:
-            return None
+def _raise_system_exit(signum: int, frame: FrameType | None) -> None:
+    raise SystemExit(128 + signum)
+
+
+# Handler bound to runner instance and latency histogram of it
+_DispatchEntry = tuple[Callable[[Message], None], Histogram]
+
+# Commands are labels of irc_commands_total, anything past this many distinct
+# commands is counted as OTHER so that misbehaving server can't blow up label cardinality
+_MAX_COMMAND_LABELS = 128
+
+# Seconds between checks for finished calendar fetches while blocking loop waits for data
+_CALENDAR_RESULT_POLL_INTERVAL = 0.1
+# Seconds between steps of standby proxy connection warm-up while blocking loop waits for data
+_PROXY_STANDBY_POLL_INTERVAL = 0.05
 
-        if not isinstance(args[1], str):
-            raise TypeError(
-                f"Args[1] is expected to be string but got {type(args[1])} instead"
-            )
 
-        if args[1].startswith("PING"):
-            return func(*args, **kwargs)
+# Name of the attribute which stores commands handler is registered for.
+# BotRunner collects handlers marked with this attribute into its dispatch table
+_HANDLER_COMMANDS_ATTR = "_irc_commands"
 
-        return None
 
-    return _wrapper
+def _register_handler(func: Callable[P, T], command: str) -> Callable[P, T]:
+    commands: tuple[str, ...] = getattr(func, _HANDLER_COMMANDS_ATTR, ())
+    setattr(func, _HANDLER_COMMANDS_ATTR, (*commands, command))
+    return func
+
+
+def _on_ping(func: Callable[P, T]) -> Callable[P, T]:
+    """
+    Registers handler for PING messages. Ping has its own decorator because
+    its format is "PING <server_id>" instead of standard <prefix> <command> <params>
+    """
+    return _register_handler(func, "PING")
 
 
 def _on_response(target_response_code: str):
@@ -34,33 +73,16 @@ def _on_response(target_response_code: str):
     Decorator factory responsible of constructing decorators
     which can be hooked into a arbittuary event (for irc specific numerics/events check RFC2812)
 
+    Decorated function is not wrapped, decorator only registers it to be collected into
+    BotRunner's dispatch table so that it is called only for lines with matching command/numeric.
+    Same handler can be registered for multiple responses by stacking decorators.
+
     NOTE: This can be used with any normal message from server except PING.
           Handle ping with its own decorator (@_on_ping)
     """
 
-    def decor_wrapper(func: Callable[P, T]) -> Callable[P, T | None]:
-        @wraps(func)
-        def func_wrapper(*args: P.args, **kwargs: P.kwargs):
-            # Ensure that there is two arguments instance (self) and msg (str)
-            # this decorator expects these two to exist to work properly.
-            if len(args) < 2:
-                return None
-
-            # This decorator assumes that msg (args[1]) is decoded before (i.e type(args[1]) == str)
-            # handed over to parser, don't change unless absolutely necessary
-            if not isinstance(args[1], str):
-                raise TypeError(
-                    f"Args[1] is expected to be string but got {type(args[1])} instead"
-                )
-
-            msg: str = args[1]
-            response_code: str = MessageParser.get_response_code(msg)
-            if response_code == target_response_code:
-                return func(*args, **kwargs)
-
-            return None
-
-        return func_wrapper
+    def decor_wrapper(func: Callable[P, T]) -> Callable[P, T]:
+        return _register_handler(func, target_response_code)
 
     return decor_wrapper
 
@@ -78,15 +100,389 @@ class BotRunner:
                  for it with prefix handle_<response>
     """
 
-    def __init__(self, client: IRCClient):
+    def __init__(
+        self,
+        client: IRCClient,
+        topic_scheduler: TopicScheduler | None = None,
+        calendar_sync: CalendarSync | None = None,
+    ):
         self.client = client
+        self.topic_scheduler: TopicScheduler = topic_scheduler or TopicScheduler()
+        # fetches calendars in worker threads and updates topic_scheduler with their events
+        self.calendar_sync: CalendarSync | None = calendar_sync
+        self._metrics: MetricsRegistry = MetricsRegistry()
+        self._lines_parsed: Counter = self._metrics.counter(
+            "irc_lines_parsed_total", "Lines received from server and dispatched"
+        )
+        self._command_counters: dict[str, Counter] = {}
+        # shared by commands seen after _MAX_COMMAND_LABELS labels, created on first use
+        self._other_commands: Counter | None = None
+        self._dispatch_table: dict[str, list[_DispatchEntry]] = (
+            self._build_dispatch_table()
+        )
+        # set by SIGHUP (see install_reload_signal) or when watched config file changes
+        self._reload_requested: bool = False
+        self._next_config_check: float = time.monotonic()
+        # set by SIGUSR2 (see install_restart_signal)
+        self._restart_requested: bool = False
+        # command line warm restart executes, workers of NetworkSupervisor set their own
+        self.restart_argv: list[str] = list(sys.orig_argv)
+        settings = client.settings
+        self.profiler: Profiler = Profiler(
+            settings.profile_dir,
+            settings.profile_duration,
+            settings.profile_handler_sample,
+        )
+        # set by SIGTTIN (see install_profile_signal)
+        self._profile_toggle_requested: bool = False
+        # nick of admin who started profiling, told when profilers expire
+        self._profile_requester: str | None = None
+        # answers !now/!next/!today in channels from topic schedules
+        self.commands: CommandResponder = CommandResponder(
+            self.topic_scheduler,
+            client.channel_state.casefold,
+            settings.command_cache_ttl,
+            settings.command_user_rate,
+            settings.command_user_burst,
+            settings.command_channel_rate,
+            settings.command_channel_burst,
+            settings.command_collapse_window,
+        )
+
+    def _build_dispatch_table(self) -> dict[str, list[_DispatchEntry]]:
+        """
+        Collects handlers registered with @_on_response/@_on_ping into dictionary
+        keyed by command/numeric. Handlers are bound to this instance so that dispatching
+        is only dictionary lookup followed by direct calls.
+        """
+        table: dict[str, list[_DispatchEntry]] = {}
+        seen: set[str] = set()
+        # Walk MRO so that handlers defined in subclasses override parents with same name
+        for klass in type(self).__mro__:
+            for name, attr in vars(klass).items():
+                if name in seen:
+                    continue
+
+                seen.add(name)
+                for command in getattr(attr, _HANDLER_COMMANDS_ATTR, ()):
+                    latency = self._metrics.histogram(
+                        "irc_handler_latency_seconds",
+                        "Time spent in message handlers",
+                        handler=name,
+                    )
+                    table.setdefault(command, []).append((getattr(self, name), latency))
+
+        return table
+
+    def _count_command(self, command: str) -> None:
+        counter = self._command_counters.get(command)
+        if counter is None:
+            if len(self._command_counters) < _MAX_COMMAND_LABELS:
+                counter = self._command_counters[command] = self._metrics.counter(
+                    "irc_commands_total",
+                    "Received messages per command",
+                    command=command,
+                )
+            else:
+                # not stored, otherwise every new command would still grow the dict
+                if self._other_commands is None:
+                    self._other_commands = self._metrics.counter(
+                        "irc_commands_total",
+                        "Received messages per command",
+                        command="OTHER",
+                    )
+                counter = self._other_commands
+
+        counter.inc()
+
+    def _dispatch(self, msg: Message) -> None:
+        """Calls only handlers registered for command of the message"""
+        self._lines_parsed.inc()
+        self._count_command(msg.command)
+        for handler, latency in self._dispatch_table.get(msg.command, ()):
+            started = time.perf_counter()
+            handler(msg)
+            latency.observe(time.perf_counter() - started)
+
+    def _dispatch_sampled(self, msg: Message) -> None:
+        """
+        _dispatch(...) which also passes handler times of sampled messages to profiler.
+        Replaces _dispatch only while handlers are profiled (see _update_dispatch)
+        """
+        self._lines_parsed.inc()
+        self._count_command(msg.command)
+        sampled = self.profiler.sample_handlers()
+        for handler, latency in self._dispatch_table.get(msg.command, ()):
+            started = time.perf_counter()
+            handler(msg)
+            elapsed = time.perf_counter() - started
+            latency.observe(elapsed)
+            if sampled:
+                self.profiler.record_handler(handler.__name__, elapsed)
+
+    def _update_dispatch(self) -> None:
+        """Swaps sampling dispatch in and out as handler profiling starts and stops"""
+        if "handlers" in self.profiler:
+            self._dispatch = self._dispatch_sampled  # type: ignore[method-assign]
+        elif "_dispatch" in vars(self):
+            del self._dispatch
+
+    def _next_timeout(self) -> float | None:
+        """
+        Seconds main loop may wait for data from server before it has other work to do
+        (flush send queue or apply scheduled topics). None means no other work is pending.
+        """
+        timeouts = [
+            self.client.send_queue.next_send_delay(),
+            self.client.time_until_health_check(),
+            self._time_until_config_check(),
+            self._time_until_profiling(),
+        ]
+        if self.client.is_registered:
+            timeouts.append(self.topic_scheduler.time_until_next())
+        if self.calendar_sync is not None:
+            timeouts.append(self.calendar_sync.time_until_next())
+            if self.calendar_sync.pending():
+                # blocking read can't be woken up by worker threads, check results often
+                timeouts.append(_CALENDAR_RESULT_POLL_INTERVAL)
+        standby = self.client.proxy_standby
+        if standby is not None:
+            timeouts.append(standby.time_until_next())
+            if standby.pending():
+                # socket of the warm-up isn't waited on with server's socket, step it often
+                timeouts.append(_PROXY_STANDBY_POLL_INTERVAL)
+
+        return min((t for t in timeouts if t is not None), default=None)
+
+    def request_config_reload(self) -> None:
+        """
+        Asks main loop to reload config file. Only sets a flag so this is safe to call
+        from signal handler, reload itself happens on next loop iteration.
+        """
+        self._reload_requested = True
+
+    def install_reload_signal(self, signum: int = signal.SIGHUP) -> None:
+        """Reloads config whenever process receives signum (default SIGHUP)"""
+        signal.signal(signum, lambda signum, frame: self.request_config_reload())
+
+    def _time_until_config_check(self) -> float | None:
+        if self._reload_requested:
+            return 0.0
+
+        if self.client.settings.config_watch_interval <= 0:
+            return None
+
+        return max(self._next_config_check - time.monotonic(), 0.0)
+
+    def _reload_config_if_needed(self) -> None:
+        """Applies config file changes if reload was requested or watched file has changed"""
+        interval = self.client.settings.config_watch_interval
+        now = time.monotonic()
+        if interval > 0 and now >= self._next_config_check:
+            self._next_config_check = now + interval
+            if self.client.config_changed():
+                self._reload_requested = True
+
+        if not self._reload_requested:
+            return
+
+        self._reload_requested = False
+        result = self.client.reload_config()
+        if result is not None:
+            joined, parted = result
+            print(
+                f"Config reloaded. Joined: {joined or '-'}, parted: {parted or '-'}",
+                file=sys.stderr,
+            )
+
+    def request_warm_restart(self) -> None:
+        """
+        Asks main loop to restart the process without dropping connection (see warm_restart).
+        Only sets a flag so this is safe to call from signal handler.
+        """
+        self._restart_requested = True
+
+    def install_restart_signal(self, signum: int = signal.SIGUSR2) -> None:
+        """Warm restarts whenever process receives signum (default SIGUSR2)"""
+        signal.signal(signum, lambda signum, frame: self.request_warm_restart())
+
+    def install_stop_signal(self, signum: int = signal.SIGTERM) -> None:
+        """
+        Exits cleanly when process receives signum (default SIGTERM, what systemd and docker
+        stop with) so that atexit handlers flush traffic capture and log records
+        """
+        signal.signal(signum, _raise_system_exit)
+
+    def request_profile_toggle(self) -> None:
+        """
+        Asks main loop to stop profilers if any is running, otherwise to start all of them
+        (see Profiler.toggle). Only sets a flag so this is safe to call from signal handler.
+        """
+        self._profile_toggle_requested = True
+
+    def install_profile_signal(self, signum: int = signal.SIGTTIN) -> None:
+        """Toggles profiling whenever process receives signum (default SIGTTIN)"""
+        signal.signal(signum, lambda signum, frame: self.request_profile_toggle())
+
+    def _time_until_profiling(self) -> float | None:
+        if self._profile_toggle_requested:
+            return 0.0
+
+        return self.profiler.time_until_next()
+
+    def _report_profiling(self, outcomes: list[str], nick: str | None) -> None:
+        for outcome in outcomes:
+            print(outcome, file=sys.stderr)
+            if nick is not None and self.client.is_connected:
+                self.client.notice(nick, outcome)
+
+    def _run_profiler(self) -> None:
+        """Toggles profiling if requested by signal and stops expired profilers"""
+        if self._profile_toggle_requested:
+            self._profile_toggle_requested = False
+            self._profile_requester = None
+            self._report_profiling(self.profiler.toggle(), None)
+
+        if self.profiler:
+            self._report_profiling(self.profiler.poll(), self._profile_requester)
+            self._update_dispatch()
+
+    def _is_admin(self, msg: Message) -> bool:
+        if msg.prefix is None:
+            return False
+
+        casefold = self.client.channel_state.casefold
+        source = casefold(msg.prefix)
+        return any(
+            fnmatchcase(source, casefold(mask))
+            for mask in self.client.settings.parse_admins()
+        )
+
+    def export_state(self) -> StateSnapshot:
+        """Snapshot of client's session and topic schedules"""
+        snapshot = self.client.export_state()
+        snapshot.schedules = {
+            channel: (
+                # templated topics are stored rendered, without server's limits
+                [(entry.start, entry.end, str(entry.topic)) for entry in entries],
+                default,
+            )
+            for channel, (entries, default) in self.topic_scheduler.schedules().items()
+        }
+        return snapshot
+
+    def warm_restart(self) -> None:
+        """
+        Writes snapshot and replaces the process with new instance of itself started with
+        same command line, e.g to take new code into use. Connected socket is inherited
+        by the new process which continues the session where this one left off.
+        Returns only if exec fails, in which case this process just keeps running.
+        """
+        self._restart_requested = False
+        snapshot = self.export_state()
+        if snapshot.fd is not None:
+            snapshot.token = new_resume_token()
+        path = self.client.settings.snapshot_path
+        try:
+            save_snapshot(path, snapshot)
+        except OSError as err:
+            print(f"Warm restart failed, writing snapshot: {err}", file=sys.stderr)
+            return
+
+        if snapshot.fd is not None:
+            os.set_inheritable(snapshot.fd, True)
+
+        print(f"Warm restart, state saved to {path}", file=sys.stderr)
+        LoggerManager().flush()
+        flush_capture()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            os.execve(
+                sys.executable,
+                self.restart_argv,
+                {**os.environ, RESUME_TOKEN_ENV: snapshot.token},
+            )
+        except OSError as err:
+            print(f"Warm restart failed: {err}", file=sys.stderr)
+            if snapshot.fd is not None:
+                os.set_inheritable(snapshot.fd, False)
+
+    def _load_snapshot(self) -> StateSnapshot | None:
+        """
+        Restores topic schedules from snapshot of the same config. Schedules already set
+        (e.g from --topics file) take precedence. Returns snapshot if it was written by this
+        process before exec i.e session should be resumed with it, otherwise None.
+        Session can be resumed only once, descriptor and token are removed from the file.
+        """
+        token = take_resume_token()
+        path = self.client.settings.snapshot_path
+        snapshot, err = load_snapshot(path)
+        if err:
+            print(err, file=sys.stderr)
+            return None
+
+        if snapshot is None or snapshot.config_path != os.path.abspath(
+            self.client.config_path
+        ):
+            return None
+
+        resumable = is_resumable(snapshot, token, (self.client.socket.fileno(),))
+        try:
+            consume_snapshot(path, snapshot)
+        except OSError as err:
+            print(f"Updating snapshot {path} failed: {err}", file=sys.stderr)
+
+        for channel, (entries, default) in snapshot.schedules.items():
+            if channel not in self.topic_scheduler:
+                self.topic_scheduler.set_schedule(
+                    channel,
+                    (TopicEntry(start, end, topic) for start, end, topic in entries),
+                    default,
+                )
+
+        return snapshot if resumable else None
+
+    def _sync_calendars(self) -> None:
+        """Applies finished calendar fetches to topic schedules and starts due fetches"""
+        if self.calendar_sync is not None:
+            self.calendar_sync.poll(self.topic_scheduler)
+
+    def _apply_scheduled_topics(self) -> None:
+        """Changes topics of channels which have reached their next schedule boundary"""
+        if not self.client.is_registered:
+            # Boundaries stay due until bot has joined channels after registration
+            return
+
+        for channel, topic in self.topic_scheduler.pop_due():
+            if topic is not None:
+                self.client.change_topic(channel, topic)
+
+    def _update_op_state(self, channel: str, value: bool) -> None:
+        """
+        Updates op state of the channel. When bot gains op scheduled topic is applied
+        right away since it might have been skipped while bot lacked permissions.
+        """
+        had_op = self.client.has_op(channel)
+        self.client.set_op_state(channel, value)
+        if value and not had_op and self.client.is_registered:
+            topic = self.topic_scheduler.topic_at(channel)
+            if topic is not None:
+                self.client.change_topic(channel, topic)
 
     def _initialize_connection(self):
+        snapshot = self._load_snapshot()
+        if snapshot is not None:
+            self.client.resume_session(snapshot)
+            for msg in MessageParser.parse_lines(self.client.buffered_lines()):
+                self._dispatch(msg)
+            return
+
         self.client.connect()
         self.client.send_credentials()
 
     @_on_ping
-    def _handle_ping(self, msg: str) -> None:
+    def _handle_ping(self, msg: Message) -> None:
         """
         Handles answering to PING messages from server.
 
@@ -95,16 +491,61 @@ class BotRunner:
               format instead. Use @_on_ping decorator instead
         """
 
-        server_id = msg.split(":")[1]
-        self.client.pong(server_id)
+        self.client.pong(msg.trailing)
+
+    @_on_response("PONG")
+    def _handle_pong(self, msg: Message) -> None:
+        # <server> :<token>, token is what we sent in PING
+        self.client.pong_received(msg.trailing)
 
     @_on_response("001")  # numeric of Welcome is 001
-    def _handle_welcome(self, msg: str) -> None:
+    def _handle_welcome(self, msg: Message) -> None:
+        # op status is learned from NAMES burst of each JOIN, no WHOIS needed
+        self.client.mark_registered()
         self.client.join_channels()
-        self.client.query_self()
+
+    @_on_response("CAP")
+    def _handle_cap(self, msg: Message) -> None:
+        # <nick> <subcommand> [*] :<capabilities>
+        (subcommand, caps, more), err = MessageParser.get_cap_data(msg)
+        if err:
+            print(err)
+            return None
+
+        if subcommand in ("LS", "NEW"):
+            self.client.caps_offered(caps, more)
+        elif subcommand == "ACK":
+            self.client.caps_acknowledged(caps)
+        elif subcommand == "NAK":
+            self.client.caps_rejected(caps)
+        elif subcommand == "DEL":
+            self.client.caps_removed(caps)
+
+    @_on_response("AUTHENTICATE")
+    def _handle_authenticate(self, msg: Message) -> None:
+        if msg.params:
+            self.client.sasl_continue(msg.params[0])
+
+    @_on_response("903")  # numeric for RPL_SASLSUCCESS
+    @_on_response("902")  # numeric for ERR_NICKLOCKED
+    @_on_response("904")  # numeric for ERR_SASLFAIL
+    @_on_response("905")  # numeric for ERR_SASLTOOLONG
+    @_on_response("906")  # numeric for ERR_SASLABORTED
+    @_on_response("907")  # numeric for ERR_SASLALREADY
+    def _handle_sasl_result(self, msg: Message) -> None:
+        self.client.sasl_finished(msg.command == "903", msg.trailing)
+
+    @_on_response("005")  # numeric for RPL_ISUPPORT
+    def _handle_isupport(self, msg: Message) -> None:
+        tokens, err = MessageParser.get_isupport_tokens(msg)
+        if err:
+            print(err)
+            return None
+
+        self.client.update_isupport(tokens)
 
     @_on_response("319")  # numeric for RPL_WHOISCHANNELS
-    def _handle_whois_channels(self, msg: str) -> None:
+    def _handle_whois_channels(self, msg: Message) -> None:
         (user, channels), err = MessageParser.get_whois_channels_data(msg)
         if err:
             print(err)
@@ -114,21 +555,171 @@ class BotRunner:
             for chan in channels:
                 # clean up chan name to include only #<chan_name> format
                 chan_clean = chan[chan.find("#") :] if chan.find("#") != -1 else chan
-                self.client.set_op_state(chan_clean, chan.startswith("@"))
+                self._update_op_state(chan_clean, chan.startswith("@"))
+
+    def _sync_op_state(self, channel: str) -> None:
+        self._update_op_state(channel, self.client.is_op(channel))
+
+    def _is_self(self, nick: str) -> bool:
+        return self.client.channel_state.same_nick(nick, self.client.nick)
+
+    @_on_response("353")  # numeric for RPL_NAMREPLY
+    def _handle_names(self, msg: Message) -> None:
+        # <nick> <symbol> <channel> :[prefix]<nick>{ [prefix]<nick>}
+        params = msg.params
+        if len(params) < 4:
+            print(f"Malformed NAMES reply: {msg}")
+            return None
+
+        self.client.channel_state.names_reply(params[2], params[3].split())
+
+    @_on_response("366")  # numeric for RPL_ENDOFNAMES
+    def _handle_names_end(self, msg: Message) -> None:
+        params = msg.params
+        if len(params) < 2:
+            return None
+
+        self.client.channel_state.names_end(params[1])
+        self._sync_op_state(params[1])
 
     @_on_response("352")  # numeric of WHO is 352
-    def _handle_who(self, msg: str) -> None:
-        print("WHO received")
+    def _handle_who(self, msg: Message) -> None:
+        # <nick> <channel> <user> <host> <server> <nick> <flags> :<hopcount> <realname>
+        params = msg.params
+        if len(params) < 7:
+            print(f"Malformed WHO reply: {msg}")
+            return None
+
+        self.client.channel_state.who_reply(params[1], params[5], params[6])
+
+    @_on_response("315")  # numeric for RPL_ENDOFWHO
+    def _handle_who_end(self, msg: Message) -> None:
+        params = msg.params
+        if len(params) < 2:
+            return None
+
+        self.client.channel_state.who_end(params[1])
+        if params[1] in self.client.channel_state:
+            self._sync_op_state(params[1])
+
+    @_on_response("JOIN")
+    def _handle_join(self, msg: Message) -> None:
+        if not msg.params:
+            return None
+
+        is_self = self._is_self(msg.nick)
+        for channel in msg.params[0].split(","):
+            self.client.channel_state.join(channel, msg.nick, is_self)
+
+    @_on_response("PART")
+    def _handle_part(self, msg: Message) -> None:
+        if not msg.params:
+            return None
+
+        is_self = self._is_self(msg.nick)
+        for channel in msg.params[0].split(","):
+            self.client.channel_state.part(channel, msg.nick, is_self)
+            if is_self and self.client.has_op(channel):
+                self.client.set_op_state(channel, False)
+
+    @_on_response("KICK")
+    def _handle_kick(self, msg: Message) -> None:
+        # <channel> <nick> [:<reason>]
+        params = msg.params
+        if len(params) < 2:
+            return None
+
+        is_self = self._is_self(params[1])
+        self.client.channel_state.part(params[0], params[1], is_self)
+        if is_self and self.client.has_op(params[0]):
+            self.client.set_op_state(params[0], False)
+
+    @_on_response("QUIT")
+    def _handle_quit(self, msg: Message) -> None:
+        self.client.channel_state.quit(msg.nick)
+
+    @_on_response("NICK")
+    def _handle_nick(self, msg: Message) -> None:
+        if not msg.params:
+            return None
+
+        self.client.channel_state.nick_change(msg.nick, msg.params[0])
+        if self._is_self(msg.nick):
+            self.client.nick = msg.params[0]
+
+    @_on_response("AWAY")
+    def _handle_away(self, msg: Message) -> None:
+        # away-notify: AWAY :<message> when member goes away, AWAY without params when back
+        self.client.channel_state.set_away(msg.nick, bool(msg.params))
 
     @_on_response("MODE")
-    def _handle_mode(self, msg) -> None:
-        (channel, flag, param), err = MessageParser.get_mode_data(msg)
-        if err:
-            print(err)  # TODO: Proper error handling
+    def _handle_mode(self, msg: Message) -> None:
+        # <target> <modestring> [<params>...], user modes of the bot itself are not tracked
+        params = msg.params
+        if len(params) < 2 or params[0] not in self.client.channel_state:
             return None
 
-        if "o" in flag and param == self.client.nick:
-            self.client.set_op_state(channel, flag == "+o")
+        changes = self.client.channel_state.apply_mode(params[0], params[1], params[2:])
+        if any(self._is_self(nick) for nick, _, _ in changes):
+            self._sync_op_state(params[0])
+
+    @_on_response("331")  # numeric for RPL_NOTOPIC
+    @_on_response("332")  # numeric for RPL_TOPIC
+    def _handle_topic_reply(self, msg: Message) -> None:
+        # <nick> <channel> :<topic>, RPL_NOTOPIC has informational text instead of topic
+        params = msg.params
+        if len(params) < 3:
+            print(f"Malformed topic reply: {msg}")
+            return None
+
+        self.client.set_topic_cache(
+            params[1], params[2] if msg.command == "332" else ""
+        )
+
+    @_on_response("TOPIC")
+    def _handle_topic(self, msg: Message) -> None:
+        # <channel> :<topic>, sent when anyone (including us) changes the topic
+        params = msg.params
+        if len(params) < 2:
+            print(f"Malformed TOPIC message: {msg}")
+            return None
+
+        self.client.set_topic_cache(params[0], params[1])
+
+    @_on_response("PRIVMSG")
+    def _handle_privmsg(self, msg: Message) -> None:
+        # <target> :<text>. Commands in channels are schedule queries (see src/commands.py),
+        # private messages from admins control the bot
+        params = msg.params
+        if len(params) < 2 or not params[1].startswith("!"):
+            return None
+
+        target, text = params[0], params[1]
+        if self._is_self(target):
+            self._handle_admin_command(msg, text)
+        elif target in self.client.channel_state:
+            reply = self.commands.respond(target, msg.nick, text)
+            if reply is not None:
+                self.client.send_msg(target, reply)
+
+    def _handle_admin_command(self, msg: Message, text: str) -> None:
+        args = text.split()
+        if not args or args[0] != "!profile" or not self._is_admin(msg):
+            return None
+
+        self._profile_requester = msg.nick
+        self._report_profiling(self.profiler.command(args[1:]), msg.nick)
+        self._update_dispatch()
+
+    @_on_response("482")  # numeric for ERR_CHANOPRIVSNEEDED
+    def _handle_chanop_needed(self, msg: Message) -> None:
+        params = msg.params
+        if len(params) < 2:
+            return None
+
+        self.client.discard_pending_topic(params[1])
+        if self.client.has_op(params[1]):
+            self.client.set_op_state(params[1], False)
 
     def run_forever(self) -> None:
         """
@@ -139,15 +730,25 @@ class BotRunner:
         self._initialize_connection()
 
         while True:
-            raw_msg: bytes = self.client.receive_message()
-            msg: str = raw_msg.decode(encoding="utf-8")
-
-            if not msg:
+            if self._restart_requested:
+                self.warm_restart()
+
+            self._reload_config_if_needed()
+            self._run_profiler()
+            if self.client.proxy_standby is not None:
+                self.client.proxy_standby.poll()
+            if not self.client.check_health():
+                print("Server stopped responding, reconnecting", file=sys.stderr)
+                self.client.is_connected = False
+            else:
+                self._sync_calendars()
+                self._apply_scheduled_topics()
+                self.client.flush_send_queue()
+                # Wake up when there is other work to do even if server is quiet
+                for msg in MessageParser.parse_lines(
+                    self.client.receive_message(self._next_timeout())
+                ):
+                    self._dispatch(msg)
+
+            if not self.client.is_connected:
                 self.client.reconnect()
-
-            for line in MessageParser.parse_lines(raw_msg):
-                self._handle_ping(line)
-                self._handle_welcome(line)
-                self._handle_who(line)
-                self._handle_whois_channels(line)
-                self._handle_mode(line)
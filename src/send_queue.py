@@ -0,0 +1,220 @@
+import time
+
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import IntEnum
+
+# RFC1459 limits line to 512 bytes including trailing \r\n
+MAX_LINE_BYTES = 510
+
+
+class Priority(IntEnum):
+    """Smaller value is sent first. Lines with same priority are sent in FIFO order"""
+
+    URGENT = 0  # PONG, anything that keeps connection alive
+    HIGH = 1  # registration and other session critical commands
+    NORMAL = 2
+    LOW = 3  # bulk queries e.g WHO
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. Bucket holds at most capacity tokens
+    and is refilled with rate tokens per second
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self._clock: Callable[[], float] = clock
+        self._tokens: float = capacity
+        self._updated_at: float = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    @property
+    def tokens(self) -> float:
+        """Tokens currently available"""
+        self._refill()
+        return self._tokens
+
+    @tokens.setter
+    def tokens(self, value: float) -> None:
+        self._refill()
+        self._tokens = min(value, self.capacity)
+
+    def try_consume(self, amount: float = 1) -> bool:
+        self._refill()
+        if self._tokens < amount:
+            return False
+
+        self._tokens -= amount
+        return True
+
+    def time_until_available(self, amount: float = 1) -> float:
+        """Seconds until amount of tokens can be consumed, 0 if they can be consumed right away"""
+        self._refill()
+        missing = amount - self._tokens
+        return max(missing / self.rate, 0.0)
+
+
+@dataclass(slots=True)
+class _Entry:
+    line: str
+    # Set only for lines which can be merged with others e.g JOIN #a + JOIN #b -> JOIN #a,#b
+    command: str | None = None
+    target: str = ""
+    suffix: str = ""
+
+
+def _parse_coalescable(line: str) -> _Entry:
+    """
+    Recognizes single target JOIN/PART/WHO lines. Anything more complex
+    (channel keys, WHO flags, multiple targets) is kept as is.
+    """
+    command, _, rest = line.partition(" ")
+    command = command.upper()
+    if command not in SendQueue.COALESCABLE_COMMANDS:
+        return _Entry(line)
+
+    target, _, suffix = rest.lstrip(":").partition(" ")
+    if not target or "," in target:
+        return _Entry(line)
+
+    if suffix and (command != "PART" or not suffix.startswith(":")):
+        # JOIN with key or WHO with flags, only PART reason can be shared
+        return _Entry(line)
+
+    return _Entry(line, command, target, suffix)
+
+
+class SendQueue:
+    """
+    Prioritized outbound queue with token bucket flood control.
+
+    Consecutive single target JOIN/PART/WHO lines are merged into multi-target lines when they are
+    popped (not when they are queued) so that limits advertised by server in ISUPPORT (005) are
+    honored even if the lines were queued before 005 was received.
+    Merged lines never exceed target limit of the command or 512 byte line limit.
+    """
+
+    COALESCABLE_COMMANDS = frozenset({"JOIN", "PART", "WHO"})
+
+    def __init__(
+        self,
+        rate: float = 2.0,
+        burst: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bucket: TokenBucket = TokenBucket(rate, burst, clock)
+        self._queues: list[deque[_Entry]] = [deque() for _ in Priority]
+        self._length: int = 0
+        # Max targets per command, None means unlimited (only line length limits merging)
+        self._target_limits: dict[str, int | None] = {
+            "JOIN": None,
+            "PART": None,
+            "WHO": 1,
+        }
+
+    def __len__(self) -> int:
+        return self._length
+
+    def put(self, line: str, priority: Priority = Priority.NORMAL) -> None:
+        self._queues[priority].append(_parse_coalescable(line))
+        self._length += 1
+
+    def clear(self) -> None:
+        for queue in self._queues:
+            queue.clear()
+        self._length = 0
+
+    def pending(self) -> list[tuple[str, Priority]]:
+        """
+        Queued lines with their priorities in the order they would be sent (before merging).
+        Putting them into another queue in this order recreates the queue.
+        """
+        return [
+            (entry.line, priority)
+            for priority, queue in zip(Priority, self._queues)
+            for entry in queue
+        ]
+
+    def set_target_limits(
+        self, targmax: dict[str, int | None], maxtargets: int | None = None
+    ) -> None:
+        """
+        Updates merge limits from ISUPPORT. TARGMAX entries take precedence, MAXTARGETS
+        (older servers) is used as limit for JOIN/PART when TARGMAX doesn't mention them.
+        WHO is merged only if server explicitly advertises it in TARGMAX.
+        """
+        for command in ("JOIN", "PART"):
+            self._target_limits[command] = targmax.get(command, maxtargets)
+
+        self._target_limits["WHO"] = targmax.get("WHO", 1)
+
+    def next_send_delay(self) -> float | None:
+        """
+        Seconds until next line can be sent. None when queue is empty
+        and 0 when line can be sent right away.
+        """
+        if not self._length:
+            return None
+
+        return self.bucket.time_until_available()
+
+    def _pop(self) -> str:
+        queue = next(q for q in self._queues if q)
+        entry = queue.popleft()
+        self._length -= 1
+
+        if entry.command is None:
+            return entry.line
+
+        limit = self._target_limits.get(entry.command, 1)
+        if limit == 1:
+            return entry.line
+
+        targets = [entry.target]
+        size = len(entry.line.encode("utf-8"))
+        # Only consecutive lines are merged, merging over other commands could reorder
+        # e.g JOIN #a, PART #a, JOIN #b
+        while queue and (limit is None or len(targets) < limit):
+            other = queue[0]
+            # +1 for comma separating targets
+            other_size = len(other.target.encode("utf-8")) + 1
+            if (
+                other.command != entry.command
+                or other.suffix != entry.suffix
+                or size + other_size > MAX_LINE_BYTES
+            ):
+                break
+
+            queue.popleft()
+            self._length -= 1
+            targets.append(other.target)
+            size += other_size
+
+        if len(targets) == 1:
+            return entry.line
+
+        line = f"{entry.command} {','.join(targets)}"
+        return f"{line} {entry.suffix}" if entry.suffix else line
+
+    def pop_ready(self) -> list[str]:
+        """Pops every line which can be sent without exceeding the rate limit"""
+        lines: list[str] = []
+        while self._length and self.bucket.try_consume():
+            lines.append(self._pop())
+
+        return lines
@@ -0,0 +1,154 @@
+"""
+Runtime settings of the bot.
+
+config.json (see client._BotConfig) only mirrors fields required by IRC protocol. Everything else
+(rate limits, timeouts, credentials, ...) is configured here with environment variables prefixed
+with IRC_BOT_ e.g IRC_BOT_SEND_RATE=1.5. Variables can also be placed into .env file in working
+directory, real environment variables take precedence over .env.
+
+Style guide: every field must have sensible default so that bot runs without any settings.
+             Name fields in snake_case, environment variable name is derived from field name.
+"""
+
+import os
+
+from pydantic import BaseModel
+
+ENV_PREFIX = "IRC_BOT_"
+
+
+def _read_env_file(path: str) -> dict[str, str]:
+    values: dict[str, str] = {}
+    try:
+        with open(path, "r") as fp:
+            lines = fp.readlines()
+    except FileNotFoundError:
+        return values
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+
+        key, _, value = line.partition("=")
+        values[key.strip()] = value.strip().strip("\"'")
+
+    return values
+
+
+class RuntimeSettings(BaseModel):
+    # Outbound flood control: token bucket refilled with send_rate lines per second
+    # holding at most send_burst lines
+    send_rate: float = 2.0
+    send_burst: int = 5
+
+    # Socket traffic logging per direction. Traffic is logged with INFO level so WARNING
+    # or above disables logging of that direction. sample=n logs only every n:th read/write
+    traffic_log_level_in: str = "INFO"
+    traffic_log_level_out: str = "INFO"
+    traffic_log_sample_in: int = 1
+    traffic_log_sample_out: int = 1
+
+    # Directory where full byte stream of every connection is captured in binary format
+    # for replaying it later (see src/traffic_capture.py and tools/replay.py). Empty disables
+    traffic_capture_dir: str = ""
+
+    # Reconnecting: jittered exponential backoff between base and max delay (seconds).
+    # max_attempts=0 retries forever. Backoff starts over once connection has been
+    # registered for stable_after seconds
+    reconnect_base_delay: float = 1.0
+    reconnect_max_delay: float = 300.0
+    reconnect_max_attempts: int = 0
+    reconnect_stable_after: float = 60.0
+    connect_timeout: float = 10.0
+    # Servers tried in order after the one in config.json when connecting fails,
+    # comma separated host:port pairs e.g "irc2.example.org:6667,irc3.example.org:6697"
+    fallback_servers: str = ""
+
+    # TLS for every server (usually port 6697). Certificates are verified against system CAs
+    # or tls_ca_file (e.g self-signed certificate). Sessions are resumed on reconnect
+    tls: bool = False
+    tls_verify: bool = True
+    tls_ca_file: str = ""
+
+    # SOCKS5 proxy from config.json (PROXY_SERVER, PROXY_PORT) when started with --proxy.
+    # Empty username connects without authentication. One connection to the proxy is kept
+    # authenticated in reserve so that reconnect only waits for CONNECT, it's replaced every
+    # proxy_standby_max_age seconds since proxies drop idle connections. 0 disables standby
+    proxy_username: str = ""
+    proxy_password: str = ""
+    proxy_standby_max_age: float = 60.0
+
+    # Health check: PING is sent when nothing has been received for interval seconds and
+    # link is considered dead if PING isn't answered within timeout seconds
+    health_check_interval: float = 30.0
+    health_check_timeout: float = 20.0
+
+    # Seconds between checks whether config.json has changed, changes are applied without
+    # reconnecting (same as on SIGHUP). 0 disables watching
+    config_watch_interval: float = 0.0
+
+    # SASL PLAIN credentials used during registration when server supports it.
+    # Empty username disables SASL
+    sasl_username: str = ""
+    sasl_password: str = ""
+
+    # Calendars (see start.py --calendars) are fetched in pool of calendar_workers threads
+    # every calendar_poll_interval seconds. Fetch is given up after calendar_fetch_timeout
+    # seconds, failed backend calls are retried calendar_fetch_retries times within that
+    calendar_poll_interval: float = 300.0
+    calendar_workers: int = 4
+    calendar_fetch_timeout: float = 30.0
+    calendar_fetch_retries: int = 2
+
+    # Schedule queries in channels (!now, !next, !today). Answers are cached for at most
+    # command_cache_ttl seconds. Each user may send command_user_burst queries at once and
+    # then command_user_rate per second, channels have their own limits on top of that.
+    # Same answer isn't repeated in a channel within command_collapse_window seconds
+    command_cache_ttl: float = 60.0
+    command_user_rate: float = 0.1
+    command_user_burst: int = 3
+    command_channel_rate: float = 0.5
+    command_channel_burst: int = 5
+    command_collapse_window: float = 10.0
+
+    # Users allowed to control the bot with private messages (e.g "!profile cpu 30"),
+    # comma separated nick!user@host masks where * and ? are wildcards
+    # e.g "alice!*@admin.example.org". Empty allows nobody
+    admins: str = ""
+
+    # Profiling at runtime (SIGTTIN or "!profile" from admin). Results are written into
+    # profile_dir, profilers run for profile_duration seconds unless told otherwise and
+    # handler timing samples every profile_handler_sample:th message
+    profile_dir: str = "./.cache/profiles"
+    profile_duration: float = 30.0
+    profile_handler_sample: int = 10
+
+    # Where runtime state is written on warm restart (SIGUSR2). Cold starts reuse topic
+    # schedules from it
+    snapshot_path: str = "./.cache/state.json"
+
+    def parse_fallback_servers(self) -> list[tuple[str, int]]:
+        servers: list[tuple[str, int]] = []
+        for item in self.fallback_servers.split(","):
+            host, _, port = item.strip().rpartition(":")
+            if host and port.isdigit():
+                servers.append((host, int(port)))
+
+        return servers
+
+    def parse_admins(self) -> list[str]:
+        return [mask.strip() for mask in self.admins.split(",") if mask.strip()]
+
+    @classmethod
+    def from_env(cls, env_path: str = ".env") -> "RuntimeSettings":
+        env = _read_env_file(env_path)
+        env.update(os.environ)
+
+        values = {}
+        for name in cls.model_fields:
+            key = ENV_PREFIX + name.upper()
+            if key in env:
+                values[name] = env[key]
+
+        return cls(**values)
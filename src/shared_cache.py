@@ -0,0 +1,90 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from collections.abc import Callable
+from typing import Any
+
+
+class SharedCache:
+    """
+    Small on-disk cache which can be shared between processes e.g workers started by
+    NetworkSupervisor. Each entry is stored as separate JSON file which is replaced atomically
+    so readers never see half written data. get_or_fetch(...) holds exclusive file lock while
+    fetching so when several workers ask for same key at once only one of them fetches it
+    and the rest read the result from disk.
+
+    NOTE: values must be JSON serializable
+    """
+
+    def __init__(self, directory: str, default_ttl: float = 300):
+        self.directory: str = directory
+        self.default_ttl: float = default_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, suffix: str = ".json") -> str:
+        # keys can be anything (e.g calendar ids with @ and /) so hash them into safe filenames
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + suffix)
+
+    def get(self, key: str) -> Any | None:
+        """Returns cached value or None if there is no entry or it has expired"""
+        try:
+            with open(self._path(key), "r") as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        if entry["expires_at"] < time.time():
+            return None
+
+        return entry["value"]
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        entry = {
+            "key": key,
+            "expires_at": time.time() + (self.default_ttl if ttl is None else ttl),
+            "value": value,
+        }
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as fp:
+                json.dump(entry, fp, separators=(",", ":"))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def invalidate(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get_or_fetch(
+        self, key: str, fetch: Callable[[], Any], ttl: float | None = None
+    ) -> Any:
+        """
+        Returns cached value for key. If value is missing or expired fetch() is called
+        and its result is stored. Only one process fetches same key at a time.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with open(self._path(key, ".lock"), "a") as lock_fp:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+            try:
+                # Other process might have fetched the value while we were waiting for the lock
+                value = self.get(key)
+                if value is None:
+                    value = fetch()
+                    self.set(key, value, ttl)
+            finally:
+                fcntl.flock(lock_fp, fcntl.LOCK_UN)
+
+        return value
@@ -0,0 +1,408 @@
+"""
+Module for connecting to IRC servers through SOCKS5 proxy (RFC 1928) with optional
+username/password authentication (RFC 1929).
+
+Negotiation is a state machine over non-blocking socket. Socks5Negotiation.step() does every read
+and write possible right away and tells which readiness (selectors.EVENT_READ/EVENT_WRITE) it
+waits for next, so the same negotiation runs under blocking IRCClient (negotiate(...) waits with
+selector) and under asyncio (AsyncIRCClient waits with loop.add_reader/add_writer). Server host
+name is sent to the proxy as is and proxy resolves it (same as socks5h:// in curl).
+
+Connection through proxy costs TCP connect to the proxy, method selection and authentication
+before CONNECT is even sent. ProxyStandby keeps one connection which has gone through all of that
+in reserve, so that reconnect only pays for the CONNECT round trip. Standby stops short of CONNECT
+on purpose: server is only known when reconnecting (failover rotates servers) and idle connection
+to IRC server would be dropped by its registration timeout and counted by its connect throttling.
+
+Style guide: proxy handshake (credentials included) never reaches traffic logs or capture.
+             Negotiation runs on plain socket.socket or on TrackingSocket with track_traffic off.
+
+NOTE: proxy host name is resolved with blocking getaddrinfo, use IP address in PROXY_SERVER
+      to keep warming up standby connections fully non-blocking.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import errno
+import ipaddress
+import os
+import selectors
+import socket
+import sys
+import time
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+VERSION = 5
+_AUTH_VERSION = 1
+
+_NO_AUTH = 0x00
+_USERNAME_PASSWORD = 0x02
+_NO_ACCEPTABLE_METHODS = 0xFF
+
+_CONNECT = 0x01
+_IPV4 = 0x01
+_DOMAIN = 0x03
+_IPV6 = 0x04
+_ADDRESS_SIZES = {_IPV4: 4, _IPV6: 16}
+
+_REPLIES = {
+    0x01: "general SOCKS server failure",
+    0x02: "connection not allowed by ruleset",
+    0x03: "network unreachable",
+    0x04: "host unreachable",
+    0x05: "connection refused",
+    0x06: "TTL expired",
+    0x07: "command not supported",
+    0x08: "address type not supported",
+}
+
+_CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EALREADY, errno.EWOULDBLOCK)
+
+
+class Socks5Error(ConnectionError):
+    """Proxy refused the connection or doesn't speak SOCKS5"""
+
+
+@dataclass(frozen=True, slots=True)
+class ProxyConfig:
+    host: str
+    port: int
+    # empty username offers only "no authentication"
+    username: str = ""
+    password: str = ""
+
+
+class Socks5Negotiation:
+    """
+    SOCKS5 handshake over sock, which must not be connected yet. Negotiation connects to the
+    proxy and authenticates, then waits for connect_to(...) before sending CONNECT.
+    Errors are raised from step() as OSError (Socks5Error when proxy refuses).
+
+    Reads never go past proxy's reply, data server sends after it stays in the socket.
+    """
+
+    def __init__(self, sock: socket.socket, proxy: ProxyConfig):
+        self.sock: socket.socket = sock
+        self.proxy: ProxyConfig = proxy
+        self.target: tuple[str, int] | None = None
+        # set once proxy has accepted authentication and is ready for CONNECT
+        self.authenticated: bool = False
+        # set once proxy has connected to the target, socket now carries traffic of the server
+        self.established: bool = False
+        self._address: tuple | None = None
+        self._connected: bool = False
+        self._outgoing: bytes = b""
+        self._received: bytearray = bytearray()
+        self._expected: int = 0
+        # called with exactly _expected bytes of proxy's reply
+        self._on_reply: Callable[[bytes], None] | None = None
+        sock.setblocking(False)
+
+    def connect_to(self, host: str, port: int) -> None:
+        """Server proxy connects to, CONNECT is sent by step() once authentication is done"""
+        self.target = (host, port)
+
+    def step(self) -> int:
+        """
+        Advances negotiation as far as possible without blocking. Returns event negotiation waits
+        for (selectors.EVENT_READ or EVENT_WRITE), 0 when it's established or waits for connect_to(...)
+        """
+        if not self._connected:
+            if self._address is None:
+                self._address = socket.getaddrinfo(
+                    self.proxy.host,
+                    self.proxy.port,
+                    self.sock.family,
+                    socket.SOCK_STREAM,
+                )[0][4]
+            err = self.sock.connect_ex(self._address)
+            if err in _CONNECT_IN_PROGRESS:
+                return selectors.EVENT_WRITE
+            if err not in (0, errno.EISCONN):
+                raise OSError(
+                    err,
+                    f"{os.strerror(err)} (proxy {self.proxy.host}:{self.proxy.port})",
+                )
+
+            self._connected = True
+            self._greet()
+
+        while True:
+            if self._outgoing:
+                try:
+                    sent = self.sock.send(self._outgoing)
+                except BlockingIOError:
+                    return selectors.EVENT_WRITE
+                self._outgoing = self._outgoing[sent:]
+                continue
+
+            if self._on_reply is None:
+                if (
+                    self.authenticated
+                    and self.target is not None
+                    and not self.established
+                ):
+                    self._request(*self.target)
+                    continue
+                return 0
+
+            try:
+                chunk = self.sock.recv(self._expected - len(self._received))
+            except BlockingIOError:
+                return selectors.EVENT_READ
+            if not chunk:
+                raise Socks5Error("Proxy closed the connection during negotiation")
+
+            self._received += chunk
+            if len(self._received) < self._expected:
+                continue
+
+            reply, on_reply = bytes(self._received), self._on_reply
+            self._received.clear()
+            self._on_reply = None
+            on_reply(reply)
+
+    def _send(
+        self, data: bytes, expected: int, on_reply: Callable[[bytes], None]
+    ) -> None:
+        self._outgoing = data
+        self._expect(expected, on_reply)
+
+    def _expect(self, expected: int, on_reply: Callable[[bytes], None]) -> None:
+        self._expected = expected
+        self._on_reply = on_reply
+
+    def _greet(self) -> None:
+        methods = (
+            bytes([_NO_AUTH, _USERNAME_PASSWORD])
+            if self.proxy.username
+            else bytes([_NO_AUTH])
+        )
+        self._send(bytes([VERSION, len(methods)]) + methods, 2, self._method_selected)
+
+    def _method_selected(self, reply: bytes) -> None:
+        if reply[0] != VERSION:
+            raise Socks5Error("Proxy doesn't speak SOCKS5")
+
+        method = reply[1]
+        if method == _NO_AUTH:
+            self.authenticated = True
+        elif method == _USERNAME_PASSWORD and self.proxy.username:
+            username = self.proxy.username.encode("utf-8")
+            password = self.proxy.password.encode("utf-8")
+            if len(username) > 255 or len(password) > 255:
+                raise Socks5Error(
+                    "Proxy username and password must be at most 255 bytes"
+                )
+            self._send(
+                bytes([_AUTH_VERSION, len(username)])
+                + username
+                + bytes([len(password)])
+                + password,
+                2,
+                self._authentication_done,
+            )
+        elif method == _NO_ACCEPTABLE_METHODS:
+            raise Socks5Error(
+                "Proxy accepts none of the offered authentication methods"
+            )
+        else:
+            raise Socks5Error(f"Proxy selected unknown authentication method {method}")
+
+    def _authentication_done(self, reply: bytes) -> None:
+        if reply[1] != 0:
+            raise Socks5Error("Proxy rejected username or password")
+
+        self.authenticated = True
+
+    def _request(self, host: str, port: int) -> None:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            name = host.encode("idna")
+            if len(name) > 255:
+                raise Socks5Error(
+                    f"Host name {host!r} is too long for SOCKS5"
+                ) from None
+            destination = bytes([_DOMAIN, len(name)]) + name
+        else:
+            destination = (
+                bytes([_IPV4 if address.version == 4 else _IPV6]) + address.packed
+            )
+
+        self._send(
+            bytes([VERSION, _CONNECT, 0]) + destination + port.to_bytes(2, "big"),
+            4,
+            self._reply_received,
+        )
+
+    def _reply_received(self, reply: bytes) -> None:
+        if reply[0] != VERSION:
+            raise Socks5Error("Proxy doesn't speak SOCKS5")
+
+        if reply[1] != 0:
+            host, port = self.target or ("?", 0)
+            reason = _REPLIES.get(reply[1], f"error {reply[1]}")
+            raise Socks5Error(f"Proxy couldn't connect to {host}:{port}: {reason}")
+
+        # bound address and port of the proxy follow, they are only read off the socket
+        address_type = reply[3]
+        if address_type == _DOMAIN:
+            self._expect(
+                1, lambda length: self._expect(length[0] + 2, self._bound_address)
+            )
+        elif address_type in _ADDRESS_SIZES:
+            self._expect(_ADDRESS_SIZES[address_type] + 2, self._bound_address)
+        else:
+            raise Socks5Error(f"Proxy replied with unknown address type {address_type}")
+
+    def _bound_address(self, reply: bytes) -> None:
+        self.established = True
+
+
+def negotiate(negotiation: Socks5Negotiation, timeout: float | None) -> None:
+    """Runs negotiation until it's established, raises TimeoutError after timeout seconds"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        while event := negotiation.step():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"Proxy negotiation timed out after {timeout}s")
+
+            selector.register(negotiation.sock, event)
+            try:
+                selector.select(remaining)
+            finally:
+                selector.unregister(negotiation.sock)
+
+
+def _is_idle(sock: socket.socket) -> bool:
+    """Proxy sends nothing before CONNECT, anything readable means it has dropped the connection"""
+    try:
+        sock.recv(1, socket.MSG_PEEK)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+
+    return False
+
+
+class ProxyStandby:
+    """
+    Keeps one connection to the proxy authenticated and ready for CONNECT in reserve, see
+    module docstring. Owner calls poll() whenever it has the chance (BotRunner on every loop
+    iteration, AsyncBotRunner when socket of the pending negotiation is ready) and take()
+    when connecting. Taken standby is replaced right away.
+
+    param float max_age: seconds standby is kept before it's replaced with a fresh one, proxies
+                         drop idle connections. Failed warm-ups are retried after the same delay
+    param float timeout: seconds warm-up may take before it's given up
+    """
+
+    def __init__(
+        self,
+        proxy: ProxyConfig,
+        max_age: float = 60.0,
+        timeout: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.proxy: ProxyConfig = proxy
+        self.max_age: float = max_age
+        self.timeout: float = timeout
+        self._clock: Callable[[], float] = clock
+        self._negotiation: Socks5Negotiation | None = None
+        self._started_at: float = 0.0
+        # time warm-up finished, None while it's in progress
+        self._ready_at: float | None = None
+        self._next_attempt: float = clock()
+
+    @property
+    def socket(self) -> socket.socket | None:
+        """Socket of standby connection, e.g for waiting until pending warm-up can continue"""
+        return None if self._negotiation is None else self._negotiation.sock
+
+    def pending(self) -> bool:
+        """Whether warm-up is in progress"""
+        return self._negotiation is not None and self._ready_at is None
+
+    def time_until_next(self) -> float:
+        """Seconds until poll() has work to do even if standby socket doesn't become ready"""
+        now = self._clock()
+        if self._negotiation is None:
+            deadline = self._next_attempt
+        elif self._ready_at is None:
+            deadline = self._started_at + self.timeout
+        else:
+            deadline = self._ready_at + self.max_age
+
+        return max(deadline - now, 0.0)
+
+    def poll(self) -> int:
+        """
+        Starts, advances or replaces standby connection. Returns event pending warm-up waits
+        for (selectors.EVENT_READ or EVENT_WRITE), 0 if nothing is pending
+        """
+        now = self._clock()
+        if self._negotiation is None:
+            if now < self._next_attempt:
+                return 0
+            self._started_at = now
+            self._negotiation = Socks5Negotiation(
+                socket.socket(socket.AF_INET, socket.SOCK_STREAM), self.proxy
+            )
+        elif self._ready_at is not None:
+            if now - self._ready_at < self.max_age:
+                return 0
+            # proxies drop idle connections, old one is replaced before that happens
+            self._discard(now)
+            return self.poll()
+        elif now - self._started_at >= self.timeout:
+            self._failed(now, f"timed out after {self.timeout}s")
+            return 0
+
+        try:
+            event = self._negotiation.step()
+        except OSError as err:
+            self._failed(now, err)
+            return 0
+
+        if not event:
+            self._ready_at = now
+        return event
+
+    def take(self) -> Socks5Negotiation | None:
+        """Authenticated connection ready for connect_to(...), None if there isn't one"""
+        negotiation = self._negotiation
+        if negotiation is None or self._ready_at is None:
+            return None
+
+        now = self._clock()
+        alive = now - self._ready_at < self.max_age and _is_idle(negotiation.sock)
+        self._negotiation = None
+        self._ready_at = None
+        self._next_attempt = now
+        if not alive:
+            negotiation.sock.close()
+            return None
+
+        return negotiation
+
+    def _discard(self, now: float, retry_after: float = 0.0) -> None:
+        if self._negotiation is not None:
+            self._negotiation.sock.close()
+        self._negotiation = None
+        self._ready_at = None
+        self._next_attempt = now + retry_after
+
+    def _failed(self, now: float, reason: object) -> None:
+        print(
+            f"Warming up standby connection to proxy {self.proxy.host}:{self.proxy.port} "
+            f"failed: {reason}",
+            file=sys.stderr,
+        )
+        self._discard(now, self.max_age)
@@ -0,0 +1,311 @@
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import time
+
+from dataclasses import dataclass
+from multiprocessing.process import BaseProcess
+from types import FrameType
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.topic_template import TopicTemplate
+
+# warm restart of worker re-executes python with this code, see _worker_main
+_WORKER_MAIN = (
+    "import sys; sys.path.insert(0, {root!r}); "
+    "from src.supervisor import _worker_main; _worker_main()"
+)
+
+
+def worker_snapshot_path(cache_dir: str, config_path: str) -> str:
+    """Warm restart snapshot of the worker running config_path, one per config in cache_dir"""
+    name = os.path.splitext(os.path.basename(config_path))[0]
+    digest = hashlib.sha1(os.path.abspath(config_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"state-{name}-{digest[:8]}.json")
+
+
+def _worker_main() -> None:
+    """Entry point of worker re-executed by warm restart, argv has _run_network arguments as JSON"""
+    _run_network(*json.loads(sys.argv[1]))
+
+
+def _run_network(
+    config_path: str,
+    use_asyncio: bool,
+    cache_dir: str,
+    proxy: bool = False,
+    topics_path: str | None = None,
+    metrics_port: int | None = None,
+    calendars_path: str | None = None,
+    topic_template: str | None = None,
+) -> None:
+    """
+    Entry point of worker process. Runs single bot (one network) until it exits.
+    Imports are done here so that spawned process only loads what it needs.
+    """
+    from src.calendar_sync import load_calendar_sync
+    from src.metrics import MetricsServer, install_dump_signal
+    from src.shared_cache import SharedCache
+    from src.topic_scheduler import load_scheduler
+    from src.topic_template import TopicTemplate
+
+    # command line of spawned process can't be executed again, warm restart uses this instead
+    restart_argv = [
+        sys.executable,
+        "-c",
+        _WORKER_MAIN.format(
+            root=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ),
+        json.dumps(
+            [
+                config_path,
+                use_asyncio,
+                cache_dir,
+                proxy,
+                topics_path,
+                metrics_port,
+                calendars_path,
+                topic_template,
+            ]
+        ),
+    ]
+    snapshot_path = worker_snapshot_path(cache_dir, config_path)
+    template = TopicTemplate(topic_template) if topic_template is not None else None
+
+    # Supervisor handles stopping workers, let SIGINT (e.g ctrl+c in terminal) reach only supervisor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # each worker has its own metrics and profilers, dump them with kill -USR1 <worker pid>
+    # and toggle profiling with kill -TTIN <worker pid>. Warm restart (SIGUSR2) restarts worker
+    # in place, supervisor keeps tracking it since pid stays the same
+    install_dump_signal()
+    if metrics_port is not None:
+        MetricsServer(metrics_port).start()
+    shared_cache = SharedCache(cache_dir)
+    topic_scheduler = load_scheduler(topics_path) if topics_path is not None else None
+
+    if use_asyncio:
+        import asyncio
+
+        from src.async_client import AsyncIRCClient
+        from src.async_runner import AsyncBotRunner
+
+        client = AsyncIRCClient(proxy=proxy, config_path=config_path)
+        client.settings.snapshot_path = snapshot_path
+        runner = AsyncBotRunner(
+            client,
+            topic_scheduler=topic_scheduler,
+            calendar_sync=(
+                load_calendar_sync(
+                    calendars_path, client.settings, template, shared_cache
+                )
+                if calendars_path is not None
+                else None
+            ),
+        )
+        runner.restart_argv = restart_argv
+        runner.install_reload_signal()
+        runner.install_restart_signal()
+        runner.install_stop_signal()
+        runner.install_profile_signal()
+        asyncio.run(runner.run_forever())
+
+    else:
+        from src.client import IRCClient
+        from src.runner import BotRunner
+
+        client = IRCClient(proxy=proxy, config_path=config_path)
+        client.settings.snapshot_path = snapshot_path
+        runner = BotRunner(
+            client,
+            topic_scheduler=topic_scheduler,
+            calendar_sync=(
+                load_calendar_sync(
+                    calendars_path, client.settings, template, shared_cache
+                )
+                if calendars_path is not None
+                else None
+            ),
+        )
+        runner.restart_argv = restart_argv
+        runner.install_reload_signal()
+        runner.install_restart_signal()
+        runner.install_stop_signal()
+        runner.install_profile_signal()
+        runner.run_forever()
+
+
+@dataclass
+class _Worker:
+    config_path: str
+    process: BaseProcess | None = None
+    started_at: float = 0
+    restart_delay: float = 0
+    restart_at: float | None = None
+    # port of the worker's metrics server, ports are consecutive in the order of configs
+    metrics_port: int | None = None
+
+
+class NetworkSupervisor:
+    """
+    Runs one bot per network config in separate processes so that networks don't compete
+    for the same GIL and problems on one network (e.g reconnect storm) don't stall the others.
+
+    Crashed workers (non zero exit code) are restarted independently with exponential delay.
+    Delay is reset when worker has been running for stable_after seconds.
+    Workers share SharedCache in cache_dir so calendars (--calendars) are fetched only once
+    per poll interval instead of once per network.
+    """
+
+    def __init__(
+        self,
+        config_paths: list[str],
+        *,
+        use_asyncio: bool = False,
+        cache_dir: str = "./.cache",
+        proxy: bool = False,
+        topics_path: str | None = None,
+        metrics_port: int | None = None,
+        calendars_path: str | None = None,
+        topic_template: TopicTemplate | None = None,
+        min_restart_delay: float = 5,
+        max_restart_delay: float = 300,
+        stable_after: float = 600,
+    ):
+        self.use_asyncio: bool = use_asyncio
+        self.cache_dir: str = cache_dir
+        # workers connect through SOCKS5 proxy of their config
+        self.proxy: bool = proxy
+        # every worker schedules topics of its channels from the same files
+        self.topics_path: str | None = topics_path
+        self.calendars_path: str | None = calendars_path
+        self.topic_template: TopicTemplate | None = topic_template
+        self.min_restart_delay: float = min_restart_delay
+        self.max_restart_delay: float = max_restart_delay
+        self.stable_after: float = stable_after
+
+        self._workers: list[_Worker] = [
+            _Worker(
+                path, metrics_port=None if metrics_port is None else metrics_port + i
+            )
+            for i, path in enumerate(config_paths)
+        ]
+        # spawn instead of fork so that workers don't inherit sockets or threads of supervisor
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._stopping: bool = False
+
+    def _start(self, worker: _Worker) -> None:
+        process = self._mp_context.Process(
+            target=_run_network,
+            args=(
+                worker.config_path,
+                self.use_asyncio,
+                self.cache_dir,
+                self.proxy,
+                self.topics_path,
+                worker.metrics_port,
+                self.calendars_path,
+                self.topic_template.source if self.topic_template else None,
+            ),
+            name=f"bot:{worker.config_path}",
+            daemon=True,
+        )
+        process.start()
+        worker.process = process
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+
+    def _on_exit(self, worker: _Worker, now: float) -> None:
+        assert worker.process is not None
+        exitcode = worker.process.exitcode
+        worker.process.close()
+        worker.process = None
+
+        if exitcode == 0:
+            print(f"Worker for {worker.config_path} exited cleanly", file=sys.stderr)
+            return
+
+        if now - worker.started_at >= self.stable_after:
+            worker.restart_delay = self.min_restart_delay
+        else:
+            worker.restart_delay = min(
+                max(worker.restart_delay * 2, self.min_restart_delay),
+                self.max_restart_delay,
+            )
+
+        worker.restart_at = now + worker.restart_delay
+        print(
+            f"Worker for {worker.config_path} crashed (exit code {exitcode}).",
+            f"Restarting in {worker.restart_delay}s",
+            file=sys.stderr,
+        )
+
+    def _handle_signal(self, signum: int, frame: FrameType | None) -> None:
+        self._stopping = True
+
+    def _forward_signal(self, signum: int, frame: FrameType | None) -> None:
+        """Passes signal (e.g SIGHUP for config reload) to every running worker"""
+        for worker in self._workers:
+            if worker.process is not None and worker.process.pid is not None:
+                try:
+                    os.kill(worker.process.pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    def stop(self) -> None:
+        """Terminates all workers and waits them to exit"""
+        self._stopping = True
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=10)
+                if worker.process.is_alive():
+                    worker.process.kill()
+
+    def run_forever(self) -> None:
+        """
+        Starts worker for each config and supervises them until SIGTERM/SIGINT is received
+        or every worker has exited cleanly.
+        """
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGHUP, self._forward_signal)
+        signal.signal(signal.SIGUSR2, self._forward_signal)
+
+        for worker in self._workers:
+            self._start(worker)
+
+        try:
+            while not self._stopping:
+                now = time.monotonic()
+                timeout = 1.0
+                sentinels = []
+                for worker in self._workers:
+                    if worker.process is not None and not worker.process.is_alive():
+                        self._on_exit(worker, now)
+
+                    if worker.restart_at is not None and worker.restart_at <= now:
+                        self._start(worker)
+
+                    if worker.process is not None:
+                        sentinels.append(worker.process.sentinel)
+                    elif worker.restart_at is not None:
+                        timeout = min(timeout, worker.restart_at - now)
+
+                if not sentinels and all(w.restart_at is None for w in self._workers):
+                    break
+
+                multiprocessing.connection.wait(sentinels, timeout=max(timeout, 0))
+        finally:
+            self.stop()
@@ -0,0 +1,179 @@
+"""
+Module for TLS connections (usually port 6697) with session resumption.
+
+Full TLS handshake costs extra round trips and public key operations on both ends. Session of
+the previous connection to a server is cached and offered on the next handshake, server which
+still knows the session (or accepts the ticket) skips certificate exchange altogether. This
+matters most in reconnect storms e.g after netsplit when every client reconnects at once.
+
+Traffic is logged and counted as plaintext IRC lines same way as on plain connections: blocking
+IRCClient reads and writes TrackingSSLSocket and asyncio (which does TLS over memory buffers, the
+socket under it only sees encrypted bytes) goes through TrackingSSLObject.
+
+Style guide: sessions are only looked up and offered by TLSContext. Callers wrap sockets
+             (or pass context to asyncio) as with plain ssl.SSLContext and call remember(...)
+             before closing the connection.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import ssl
+
+from typing import TYPE_CHECKING
+
+from src.metrics import MetricsRegistry
+from src.tracking_socket import TrackingSocket, TrafficTracker
+
+if TYPE_CHECKING:
+    from src.tracking_socket import ReadableBuffer
+
+
+class TrackingSSLSocket(TrackingSocket, ssl.SSLSocket):
+    """
+    TrackingSocket over TLS, logs plaintext. Created by TLSContext.wrap_socket(...)
+
+    NOTE: in non-blocking mode (timeout 0) reads raise ssl.SSLWantReadError
+          instead of BlockingIOError when no complete record is available
+    """
+
+    @classmethod
+    def _create(cls, *args, **kwargs):  # type: ignore[override]
+        # SSLSocket skips __init__ of subclasses, see ssl.SSLSocket._create
+        self = super()._create(*args, **kwargs)
+        self._init_tracking()
+        return self
+
+
+class TrackingSSLObject(TrafficTracker, ssl.SSLObject):
+    """TLS state of asyncio connection which logs plaintext. Created by TLSContext.wrap_bio(...)"""
+
+    @classmethod
+    def _create(cls, *args, **kwargs):  # type: ignore[override]
+        self = super()._create(*args, **kwargs)
+        self._init_tracking()
+        return self
+
+    def read(self, length: int = 1024, buffer=None):
+        result = super().read(length, buffer)
+        if buffer is None:
+            self._bytes_received.inc(len(result))
+            self._log_traffic(result, "in")
+        else:
+            self._bytes_received.inc(result)
+            self._log_traffic(buffer, "in", length=result)
+
+        return result
+
+    def write(self, data: ReadableBuffer) -> int:
+        written = super().write(data)
+        self._bytes_sent.inc(written)
+        self._log_traffic(data, "out", length=written)
+        return written
+
+
+class TLSContext(ssl.SSLContext):
+    """
+    Client side SSLContext which resumes sessions. Session of the latest connection to each
+    server (see remember(...)) is offered when socket or BIO is wrapped for the same
+    server_hostname, server decides whether it is accepted. Expired or unknown sessions
+    simply fall back to full handshake.
+    """
+
+    sslsocket_class = TrackingSSLSocket
+    sslobject_class = TrackingSSLObject
+
+    def __init__(self, protocol: int = ssl.PROTOCOL_TLS_CLIENT):
+        # server hostname -> session of the latest connection to it
+        self._sessions: dict[str, ssl.SSLSession] = {}
+        metrics = MetricsRegistry()
+        self._handshakes = {
+            resumed: metrics.counter(
+                "irc_tls_handshakes_total",
+                "Completed TLS handshakes",
+                resumed="true" if resumed else "false",
+            )
+            for resumed in (False, True)
+        }
+        self._handshake_seconds = metrics.histogram(
+            "irc_tls_handshake_seconds", "Time spent in TLS handshakes"
+        )
+
+    def wrap_socket(  # type: ignore[override]
+        self,
+        sock,
+        server_side: bool = False,
+        do_handshake_on_connect: bool = True,
+        suppress_ragged_eofs: bool = True,
+        server_hostname: str | None = None,
+        session: ssl.SSLSession | None = None,
+    ) -> TrackingSSLSocket:
+        if session is None and server_hostname and not server_side:
+            session = self._sessions.get(server_hostname)
+
+        return super().wrap_socket(  # type: ignore[return-value]
+            sock,
+            server_side,
+            do_handshake_on_connect,
+            suppress_ragged_eofs,
+            server_hostname,
+            session,
+        )
+
+    def wrap_bio(  # type: ignore[override]
+        self,
+        incoming: ssl.MemoryBIO,
+        outgoing: ssl.MemoryBIO,
+        server_side: bool = False,
+        server_hostname: str | None = None,
+        session: ssl.SSLSession | None = None,
+    ) -> TrackingSSLObject:
+        if session is None and server_hostname and not server_side:
+            session = self._sessions.get(server_hostname)
+
+        return super().wrap_bio(  # type: ignore[return-value]
+            incoming, outgoing, server_side, server_hostname, session
+        )
+
+    def remember(self, tls: ssl.SSLSocket | ssl.SSLObject) -> None:
+        """
+        Caches session of the connection for its server. Call this before closing,
+        session isn't available afterwards. TLS 1.3 sends session ticket after handshake,
+        connection which closed before getting it has nothing to resume.
+        """
+        try:
+            session = tls.session
+            version = tls.version()
+        except (AttributeError, ValueError):
+            return
+
+        if session is None or not tls.server_hostname:
+            return
+
+        if session.has_ticket or version != "TLSv1.3":
+            self._sessions[tls.server_hostname] = session
+
+    def record_handshake(
+        self, tls: ssl.SSLSocket | ssl.SSLObject, seconds: float
+    ) -> None:
+        """Counts completed handshake, resumed ones separately"""
+        self._handshakes[tls.session_reused].inc()
+        self._handshake_seconds.observe(seconds)
+
+
+def create_tls_context(verify: bool = True, ca_file: str = "") -> TLSContext:
+    """
+    Context for connecting to IRC servers. Certificates are verified against system CAs
+    (or ca_file, e.g self-signed certificate of test server) unless verify is False.
+    """
+    context = TLSContext(ssl.PROTOCOL_TLS_CLIENT)
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif ca_file:
+        context.load_verify_locations(ca_file)
+    else:
+        context.load_default_certs()
+
+    return context
@@ -0,0 +1,291 @@
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import heapq
+import itertools
+import json
+import time
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from src.calendar_backend import CalendarEvent, parse_datetime
+from src.interval_tree import IntervalTree
+
+if TYPE_CHECKING:
+    from src.topic_template import TemplatedTopic
+
+
+@dataclass(frozen=True, slots=True)
+class TopicEntry:
+    """
+    Topic which should be set for channel within [start, end) (unix timestamps).
+    Templated topic is rendered when it is sent, see src/topic_template.py
+    """
+
+    start: float
+    end: float
+    topic: str | TemplatedTopic
+
+
+def entries_from_events(
+    events: Iterable[CalendarEvent],
+    render: Callable[[CalendarEvent], str] = lambda event: event.summary,
+) -> list[TopicEntry]:
+    """Converts calendar events into topic entries, by default topic is summary of the event"""
+    return [
+        TopicEntry(event.start.timestamp(), event.end.timestamp(), render(event))
+        for event in events
+    ]
+
+
+def load_schedule_file(path: str) -> dict[str, tuple[list[TopicEntry], str | None]]:
+    """
+    Loads per channel topic schedules from JSON file in following format:
+
+        {
+            "#channel": {
+                "default": "Topic when nothing is scheduled",  # optional
+                "entries": [
+                    {"start": "2024-01-01T10:00:00Z", "end": "2024-01-01T11:00:00Z", "topic": "..."}
+                ]
+            }
+        }
+    """
+    with open(path, "r") as fp:
+        data = json.load(fp)
+
+    return {
+        channel: (
+            [
+                TopicEntry(
+                    parse_datetime(item["start"]).timestamp(),
+                    parse_datetime(item["end"]).timestamp(),
+                    item["topic"],
+                )
+                for item in schedule.get("entries", [])
+            ],
+            schedule.get("default"),
+        )
+        for channel, schedule in data.items()
+    }
+
+
+def load_scheduler(path: str) -> TopicScheduler:
+    """Creates scheduler with schedules of load_schedule_file(path)"""
+    scheduler = TopicScheduler()
+    for channel, (entries, default) in load_schedule_file(path).items():
+        scheduler.set_schedule(channel, entries, default)
+
+    return scheduler
+
+
+class _ChannelSchedule:
+    __slots__ = ("index", "default_topic", "generation")
+
+    def __init__(
+        self,
+        index: IntervalTree[TopicEntry],
+        default_topic: str | None,
+        generation: int,
+    ):
+        self.index: IntervalTree[TopicEntry] = index
+        self.default_topic: str | None = default_topic
+        self.generation: int = generation
+
+    def topic_at(self, at: float) -> str | TemplatedTopic | None:
+        active = self.index.at(at)
+        if not active:
+            return self.default_topic
+
+        # When entries overlap the one which started last wins
+        return max(active, key=lambda interval: interval[0])[2].topic
+
+    def next_boundary(self, after: float) -> float | None:
+        """Earliest time after given time when topic of the channel may change"""
+        boundaries = [end for _, end, _ in self.index.at(after)]
+        upcoming = self.index.next_after(after)
+        if upcoming is not None:
+            boundaries.append(upcoming[0])
+
+        return min(boundaries, default=None)
+
+
+class TopicScheduler:
+    """
+    Keeps track of when channel topics must change. Instead of polling every channel
+    scheduler keeps the next start/end boundary of each channel in min-heap so that
+    caller only needs to sleep until next_deadline() and then ask pop_due() for
+    channels whose topic changed.
+
+    Changing schedule of a channel is O(log n): old heap item is left in place and
+    skipped when popped (generation doesn't match anymore).
+
+    NOTE: newly added schedules are due immediately so that current topic gets applied
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock: Callable[[], float] = clock
+        self._channels: dict[str, _ChannelSchedule] = {}
+        # (deadline, tiebreaker, channel, generation)
+        self._heap: list[tuple[float, int, str, int]] = []
+        self._counter = itertools.count()
+        self._generations = itertools.count(1)
+        # called whenever schedules change, e.g for waking up sleeping event loop
+        self.listener: Callable[[], None] | None = None
+
+    def __contains__(self, channel: str) -> bool:
+        return channel in self._channels
+
+    def _push(self, deadline: float, channel: str, generation: int) -> None:
+        heapq.heappush(self._heap, (deadline, next(self._counter), channel, generation))
+
+        # Stale items are skipped lazily, rebuild heap if they start to dominate it
+        if len(self._heap) > 64 and len(self._heap) > 4 * len(self._channels):
+            self._heap = [
+                item
+                for item in self._heap
+                if item[2] in self._channels
+                and self._channels[item[2]].generation == item[3]
+            ]
+            heapq.heapify(self._heap)
+
+    def _notify(self) -> None:
+        if self.listener is not None:
+            self.listener()
+
+    def set_schedule(
+        self,
+        channel: str,
+        entries: Iterable[TopicEntry],
+        default_topic: str | None = None,
+    ) -> None:
+        """Replaces schedule of the channel. Channel becomes due right away"""
+        schedule = _ChannelSchedule(
+            IntervalTree((entry.start, entry.end, entry) for entry in entries),
+            default_topic,
+            next(self._generations),
+        )
+        self._channels[channel] = schedule
+        self._push(self._clock(), channel, schedule.generation)
+        self._notify()
+
+    def remove_channel(self, channel: str) -> None:
+        # heap items of removed channel are skipped when popped
+        self._channels.pop(channel, None)
+        self._notify()
+
+    def schedules(self) -> dict[str, tuple[list[TopicEntry], str | None]]:
+        """
+        Current schedules in same format as load_schedule_file(...) returns,
+        entries which have already ended are left out.
+        """
+        now = self._clock()
+        return {
+            channel: (
+                [entry for _, end, entry in schedule.index if end > now],
+                schedule.default_topic,
+            )
+            for channel, schedule in self._channels.items()
+        }
+
+    def topic_at(
+        self, channel: str, at: float | None = None
+    ) -> str | TemplatedTopic | None:
+        schedule = self._channels.get(channel)
+        if schedule is None:
+            return None
+
+        return schedule.topic_at(self._clock() if at is None else at)
+
+    def generation(self, channel: str) -> int | None:
+        """Changes whenever schedule of the channel is replaced, None if channel has no schedule"""
+        schedule = self._channels.get(channel)
+        return None if schedule is None else schedule.generation
+
+    def channels(self) -> list[str]:
+        return list(self._channels)
+
+    def active_entries(self, channel: str, at: float | None = None) -> list[TopicEntry]:
+        """Entries of the channel ongoing at given time (default now) ordered by start"""
+        schedule = self._channels.get(channel)
+        if schedule is None:
+            return []
+
+        active = schedule.index.at(self._clock() if at is None else at)
+        active.sort(key=lambda interval: interval[0])
+        return [entry for _, _, entry in active]
+
+    def next_entry(self, channel: str, after: float | None = None) -> TopicEntry | None:
+        """Entry of the channel which starts first after given time (default now)"""
+        schedule = self._channels.get(channel)
+        if schedule is None:
+            return None
+
+        upcoming = schedule.index.next_after(self._clock() if after is None else after)
+        return None if upcoming is None else upcoming[2]
+
+    def entries_starting(
+        self, channel: str, start: float, end: float
+    ) -> list[TopicEntry]:
+        """Entries of the channel starting within [start, end) ordered by start"""
+        schedule = self._channels.get(channel)
+        if schedule is None:
+            return []
+
+        return [entry for _, _, entry in schedule.index.starting_between(start, end)]
+
+    def next_boundary(self, channel: str, after: float | None = None) -> float | None:
+        """Earliest time after given time (default now) when topic of the channel may change"""
+        schedule = self._channels.get(channel)
+        if schedule is None:
+            return None
+
+        return schedule.next_boundary(self._clock() if after is None else after)
+
+    def _discard_stale(self) -> None:
+        while self._heap:
+            _, _, channel, generation = self._heap[0]
+            schedule = self._channels.get(channel)
+            if schedule is not None and schedule.generation == generation:
+                return
+
+            heapq.heappop(self._heap)
+
+    def next_deadline(self) -> float | None:
+        """Timestamp of the earliest boundary or None if nothing is scheduled"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def time_until_next(self) -> float | None:
+        """Seconds until next boundary (0 if something is already due), None if nothing is scheduled"""
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+
+        return max(deadline - self._clock(), 0.0)
+
+    def pop_due(self) -> list[tuple[str, str | TemplatedTopic | None]]:
+        """
+        Returns (channel, topic) for every channel which has reached its boundary and
+        schedules their next boundary. Topic is None when channel has nothing scheduled
+        and no default topic i.e topic should be left as is.
+        """
+        now = self._clock()
+        due: list[tuple[str, str | TemplatedTopic | None]] = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+
+            _, _, channel, generation = heapq.heappop(self._heap)
+            schedule = self._channels[channel]
+            due.append((channel, schedule.topic_at(now)))
+
+            boundary = schedule.next_boundary(now)
+            if boundary is not None:
+                self._push(boundary, channel, generation)
+
+        return due
@@ -0,0 +1,283 @@
+"""
+Module for building channel topics from calendar events with templates.
+
+Topic has to fit server's TOPICLEN (advertised in RPL_ISUPPORT) and single TOPIC line, otherwise
+server cuts it wherever it happens to be, possibly in the middle of UTF-8 character, and topic
+cache never matches what bot wanted to set. Templates are compiled once and rendered with
+length limit, fitting is done in single pass: optional sections are dropped starting from the
+lowest priority and only if that isn't enough the text is cut at character boundary.
+
+Template syntax:
+
+    {current}                   summary of ongoing event
+    {current.start:%H:%M}       start/end of ongoing event, strftime format (default %H:%M)
+    {next} {next.start} ...     same for the next event
+    [2: | Next: {next}]         optional section with priority 2. Section is left out when any
+                                of its fields has no value and dropped (lowest priority first,
+                                later sections first among equals) when topic doesn't fit.
+                                Priority defaults to 0
+    {{ }} [[ ]]                 literal braces and brackets
+
+    "{current} ({current.start}-{current.end})[1: | Next: {next} at {next.start:%a %H:%M}]"
+
+Style guide: rendered topics are memoized per context and limit, contexts must stay immutable
+             (CalendarEvent and TopicContext are frozen dataclasses).
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import re
+
+from bisect import bisect_left
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import tzinfo
+
+from src.calendar_backend import CalendarEvent
+from src.send_queue import MAX_LINE_BYTES
+from src.topic_scheduler import TopicEntry
+
+_ELLIPSIS = "…"
+_ELLIPSIS_BYTES = len(_ELLIPSIS.encode("utf-8"))
+# rendered topics kept per template before memo is cleared
+_MEMO_SIZE = 256
+
+# CR/LF would end TOPIC line early and NUL isn't allowed in IRC lines at all
+_UNSAFE = str.maketrans({"\r": " ", "\n": " ", "\0": " "})
+
+_TOKENS = re.compile(r"\{\{|\}\}|\[\[|\]\]|\{[^{}]*\}|\[(?:\d+:)?|[\]{}]|[^\[\]{}]+")
+_FIELDS: dict[str, tuple[str, str]] = {
+    f"{slot}{suffix}": (slot, attr)
+    for slot in ("current", "next")
+    for suffix, attr in (
+        (".summary", "summary"),
+        ("", "summary"),
+        (".start", "start"),
+        (".end", "end"),
+    )
+}
+
+
+def fit_topic(topic: str, max_bytes: int | None) -> str:
+    """
+    Makes topic safe to send: line breaks are replaced and topic longer than max_bytes
+    (UTF-8) is cut at character boundary with ellipsis
+    """
+    topic = topic.translate(_UNSAFE)
+    if max_bytes is None:
+        return topic
+
+    encoded = topic.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return topic
+
+    if max_bytes < _ELLIPSIS_BYTES * 2:
+        return encoded[:max_bytes].decode("utf-8", errors="ignore")
+
+    # decoding with errors="ignore" drops character which got cut in half
+    cut = encoded[: max_bytes - _ELLIPSIS_BYTES].decode("utf-8", errors="ignore")
+    return cut + _ELLIPSIS
+
+
+def topic_limit(isupport: dict[str, str], channel: str) -> int:
+    """
+    Maximum topic length in bytes on the server: TOPICLEN or whatever is left of
+    the line after "TOPIC <channel> :". When server advertises CHANNELLEN the line
+    is counted for the longest possible channel name so that limit is the same for
+    every channel (and rendered topics are memoized once per network).
+    """
+    channellen = isupport.get("CHANNELLEN", "")
+    channel_bytes = (
+        int(channellen) if channellen.isdigit() else len(channel.encode("utf-8"))
+    )
+    limit = MAX_LINE_BYTES - len(b"TOPIC  :") - channel_bytes
+    topiclen = isupport.get("TOPICLEN", "")
+    if topiclen.isdigit():
+        limit = min(limit, int(topiclen))
+
+    return max(limit, 0)
+
+
+@dataclass(frozen=True, slots=True)
+class TopicContext:
+    """Values templates are rendered from"""
+
+    current: CalendarEvent | None = None
+    next: CalendarEvent | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class _Field:
+    slot: str
+    attr: str
+    spec: str
+
+    def value(self, context: TopicContext, tz: tzinfo | None) -> str | None:
+        event: CalendarEvent | None = getattr(context, self.slot)
+        if event is None:
+            return None
+
+        if self.attr == "summary":
+            return event.summary.translate(_UNSAFE)
+
+        return format(getattr(event, self.attr).astimezone(tz), self.spec or "%H:%M")
+
+
+@dataclass(frozen=True, slots=True)
+class _Segment:
+    # None for text outside sections, which is never dropped
+    priority: int | None
+    pieces: tuple[str | _Field, ...]
+
+
+class TopicTemplate:
+    """
+    Compiled topic template, see module docstring for the syntax.
+    Raises ValueError if template is malformed.
+
+    param tzinfo tz: time zone of event times, None uses local time
+    """
+
+    def __init__(self, source: str, tz: tzinfo | None = None):
+        self.source: str = source
+        self.tz: tzinfo | None = tz
+        self._segments: tuple[_Segment, ...] = self._compile(source)
+        # indexes of optional segments in the order they are dropped
+        self._elision_order: tuple[int, ...] = tuple(
+            sorted(
+                (i for i, s in enumerate(self._segments) if s.priority is not None),
+                key=lambda i: (self._segments[i].priority, -i),
+            )
+        )
+        self._memo: dict[tuple[TopicContext, int | None], str] = {}
+
+    @staticmethod
+    def _compile(source: str) -> tuple[_Segment, ...]:
+        segments: list[_Segment] = []
+        pieces: list[str | _Field] = []
+        # priority of the section being parsed, None outside sections
+        priority: int | None = None
+        for match in _TOKENS.finditer(source):
+            token = match.group()
+            if token in ("{{", "}}", "[[", "]]"):
+                pieces.append(token[0])
+            elif token.startswith("{") and len(token) > 1:
+                name, _, spec = token[1:-1].partition(":")
+                if name.strip() not in _FIELDS:
+                    raise ValueError(f"Unknown field {name!r} in topic template")
+                pieces.append(_Field(*_FIELDS[name.strip()], spec))
+            elif token.startswith("["):
+                if priority is not None:
+                    raise ValueError("Sections of topic template can't be nested")
+                if pieces:
+                    segments.append(_Segment(None, tuple(pieces)))
+                pieces = []
+                priority = int(token[1:-1]) if len(token) > 1 else 0
+            elif token == "]":
+                if priority is None:
+                    raise ValueError("Unmatched ']' in topic template")
+                segments.append(_Segment(priority, tuple(pieces)))
+                pieces = []
+                priority = None
+            elif token in ("{", "}"):
+                raise ValueError(f"Unmatched {token!r} in topic template")
+            else:
+                pieces.append(token)
+
+        if priority is not None:
+            raise ValueError("Unterminated section in topic template")
+        if pieces:
+            segments.append(_Segment(None, tuple(pieces)))
+
+        return tuple(segments)
+
+    def render(self, context: TopicContext, max_bytes: int | None = None) -> str:
+        """Topic for the context which is at most max_bytes long when encoded as UTF-8"""
+        key = (context, max_bytes)
+        topic = self._memo.get(key)
+        if topic is None:
+            if len(self._memo) >= _MEMO_SIZE:
+                self._memo.clear()
+            topic = self._memo[key] = self._render(context, max_bytes)
+
+        return topic
+
+    def _render(self, context: TopicContext, max_bytes: int | None) -> str:
+        rendered: list[str | None] = []
+        sizes: list[int] = []
+        for segment in self._segments:
+            values: list[str] = []
+            for piece in segment.pieces:
+                if isinstance(piece, str):
+                    values.append(piece)
+                    continue
+
+                value = piece.value(context, self.tz)
+                if value is None:
+                    if segment.priority is not None:
+                        break
+                    value = ""
+                values.append(value)
+            else:
+                text = "".join(values)
+                rendered.append(text)
+                sizes.append(len(text.encode("utf-8")))
+                continue
+
+            # optional section with missing value
+            rendered.append(None)
+            sizes.append(0)
+
+        if max_bytes is not None:
+            total = sum(sizes)
+            for index in self._elision_order:
+                if total <= max_bytes:
+                    break
+                if rendered[index] is not None:
+                    total -= sizes[index]
+                    rendered[index] = None
+
+        return fit_topic("".join(t for t in rendered if t is not None), max_bytes)
+
+
+@dataclass(frozen=True, slots=True)
+class TemplatedTopic:
+    """
+    Topic which is rendered only when it is sent, once server's limits are known
+    (see IRCClient.change_topic). str(...) renders it without limit.
+    """
+
+    template: TopicTemplate
+    context: TopicContext
+
+    def render(self, max_bytes: int | None = None) -> str:
+        return self.template.render(self.context, max_bytes)
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+def entries_from_template(
+    events: Iterable[CalendarEvent], template: TopicTemplate
+) -> list[TopicEntry]:
+    """
+    Topic entries for events rendered with template. Next event of an entry is
+    the first one starting after the event has ended.
+    """
+    ordered = sorted(events, key=lambda event: event.start)
+    starts = [event.start for event in ordered]
+    entries: list[TopicEntry] = []
+    for event in ordered:
+        index = bisect_left(starts, event.end)
+        upcoming = ordered[index] if index < len(ordered) else None
+        entries.append(
+            TopicEntry(
+                event.start.timestamp(),
+                event.end.timestamp(),
+                TemplatedTopic(template, TopicContext(event, upcoming)),
+            )
+        )
+
+    return entries
@@ -2,6 +2,7 @@ from __future__ import (
     annotations,
 )  # Keep this for compatibility with 3.11 or older
 
+import re
 import socket
 import logging
 import sys
@@ -10,6 +11,8 @@ from typing import TYPE_CHECKING
 
 # from collections.abc import Buffer # Use this if you are using newer python version 3.12+
 from src.logger import LoggerManager
+from src.metrics import MetricsRegistry
+from src.traffic_capture import RECEIVED, SENT, open_capture
 
 if TYPE_CHECKING:
     from typing import TypeAlias, Literal
@@ -34,6 +37,21 @@ if TYPE_CHECKING:
     # is deprecated. So if later on support for 3.11. is dropped favor more modern syntax
     # type ReadableBuffer = Buffer
     ReadableBuffer: TypeAlias = Buffer
+    WriteableBuffer: TypeAlias = Buffer
+
+
+# SASL credentials (AUTHENTICATE <base64>) must never end up in traffic logs.
+# Mechanism names, empty "+" chunks and aborts ("*") are harmless and kept readable
+_SASL_PAYLOAD = re.compile(
+    rb"(AUTHENTICATE )(?!(?:\+|\*|PLAIN|EXTERNAL|SCRAM-SHA-\d+)(?:\r|\n|$))[^\r\n]*"
+)
+
+
+def _redact(chunk: bytes) -> bytes:
+    if b"AUTHENTICATE " not in chunk:
+        return chunk
+
+    return _SASL_PAYLOAD.sub(rb"\1<redacted>", chunk)
 
 
 def _first_n_bytes(payload: ReadableBuffer, n: int) -> bytes:
@@ -46,43 +64,111 @@ def _first_n_bytes(payload: ReadableBuffer, n: int) -> bytes:
     return bytes(view[:n])
 
 
-class TrackingSocket(socket.socket):
+class _TrafficPayload:
     """
-    Adds monitoring and tracking of incoming and outgoing
-    messages sent/received by socket
+    Lazily formatted socket payload. Logging call only stores reference to the payload,
+    truncating and repr/decoding is done when record is actually emitted (in logging thread).
+
+    Immutable bytes are referenced as is, any other buffer is copied since caller
+    is free to reuse it (e.g receive buffer) before record gets formatted.
     """
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    __slots__ = ("data", "length", "decode")
+
+    def __init__(
+        self, payload: ReadableBuffer, length: int, truncate: int, decode: bool
+    ):
+        self.length: int = min(length, truncate)
+        self.data: bytes = (
+            payload if type(payload) is bytes else _first_n_bytes(payload, self.length)
+        )
+        self.decode: bool = decode
+
+    def __str__(self) -> str:
+        chunk = _redact(self.data[: self.length])
+        if self.decode:
+            return chunk.decode("utf-8", errors="replace")
+
+        return repr(chunk)
+
+
+class TrafficTracker:
+    """
+    Traffic logging and byte counters shared by TrackingSocket and TLS layers
+    (see src/tls.py). Classes which aren't created through __init__ (ssl.SSLSocket,
+    ssl.SSLObject) must call _init_tracking() themselves.
+    """
+
+    def _init_tracking(self) -> None:
         self._supress_send_logging: bool = False
-        self._socket_logger: logging.Logger = LoggerManager().get_logger("socket")
+        # cleared when layer above (TLS) tracks the plaintext instead of encrypted bytes
+        self.track_traffic: bool = True
+        logger_manager = LoggerManager()
+        self._socket_logger: logging.Logger = logger_manager.get_logger("socket")
+        self._in_logger: logging.Logger = logger_manager.get_logger("socket.in")
+        self._out_logger: logging.Logger = logger_manager.get_logger("socket.out")
+        metrics = MetricsRegistry()
+        self._bytes_received = metrics.counter(
+            "irc_socket_received_bytes_total", "Bytes received from server"
+        )
+        self._bytes_sent = metrics.counter(
+            "irc_socket_sent_bytes_total", "Bytes sent to server"
+        )
+        # start of each connection is marked by IRCClient, see src/traffic_capture.py
+        self._capture = open_capture()
 
     def _log_traffic(
         self,
         payload: ReadableBuffer,
         traffic: Literal["in", "out"],
         *,
+        length: int | None = None,
         truncate: int = 512,
         decode=False,
     ) -> None:
-        chunk: bytes = _first_n_bytes(payload, truncate)
-        if decode:
-            try:
-                msg = chunk.decode("utf-8", errors="replace")
-            except UnicodeDecodeError as e:
-                msg = repr(chunk)
-                self._socket_logger.warning(
-                    "Warning!: Decode failed, falling back to repr",
-                    f"Error: {e}",
-                    extra={"traffic_direction": ""},
+        """
+        Logs payload (or its first length bytes) to direction specific logger and writes
+        it into traffic capture if capturing is on. Nothing is allocated when traffic logging
+        of the direction is disabled.
+        """
+        if self._capture is not None:
+            if traffic == "in":
+                self._capture.write(
+                    RECEIVED,
+                    payload,
+                    memoryview(payload).nbytes if length is None else length,
                 )
-        else:
-            msg = repr(chunk)
+            else:
+                chunk = _redact(bytes(memoryview(payload)[:length]))
+                self._capture.write(SENT, chunk, len(chunk))
 
         if traffic == "in":
-            self._socket_logger.info(msg, extra={"traffic_direction": "RECEIVED <<"})
-        elif traffic == "out":
-            self._socket_logger.info(msg, extra={"traffic_direction": "SENT >>"})
+            logger, direction = self._in_logger, "RECEIVED <<"
+        else:
+            logger, direction = self._out_logger, "SENT >>"
+
+        if not logger.isEnabledFor(logging.INFO):
+            return
+
+        if length is None:
+            length = memoryview(payload).nbytes
+
+        logger.info(
+            "%s",
+            _TrafficPayload(payload, length, truncate, decode),
+            extra={"traffic_direction": direction},
+        )
+
+
+class TrackingSocket(TrafficTracker, socket.socket):
+    """
+    Adds monitoring and tracking of incoming and outgoing
+    messages sent/received by socket
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_tracking()
 
     def send(
         self,
@@ -100,9 +186,10 @@ class TrackingSocket(socket.socket):
         """
 
         bytes_sent: int = super().send(data, flags)
-        sent_data = _first_n_bytes(data, n=bytes_sent)
-        if not self._supress_send_logging:
-            self._log_traffic(sent_data, "out", decode=logging_decode)
+        # sendall(...) of TLS socket calls send(...) for every chunk, sendall tracks those
+        if self.track_traffic and not self._supress_send_logging:
+            self._bytes_sent.inc(bytes_sent)
+            self._log_traffic(data, "out", length=bytes_sent, decode=logging_decode)
 
         return bytes_sent
 
@@ -116,10 +203,15 @@ class TrackingSocket(socket.socket):
         param bool logging_decode: Same as in self.send(...).
         """
 
+        if not self.track_traffic:
+            super().sendall(data, flags)
+            return
+
         self._supress_send_logging = True
         self._log_traffic(data, "out", decode=logging_decode)
         try:
             super().sendall(data, flags)
+            self._bytes_sent.inc(memoryview(data).nbytes)
         finally:
             self._supress_send_logging = False
 
@@ -133,5 +225,30 @@ class TrackingSocket(socket.socket):
         param bool logging_decode: Same as in self.send(...).
         """
         received_message: bytes = super().recv(bufsize, flags)
-        self._log_traffic(received_message, "in", decode=logging_decode)
+        if self.track_traffic:
+            self._bytes_received.inc(len(received_message))
+            self._log_traffic(received_message, "in", decode=logging_decode)
         return received_message
+
+    def recv_into(
+        self,
+        buffer: WriteableBuffer,
+        nbytes: int = 0,
+        flags: int = 0,
+        /,
+        *,
+        logging_decode: bool = False,
+    ) -> int:
+        """
+        Extends socket.recv_into(...) with logging. Prefer this over self.recv(...) on hot paths
+        since data is written straight into caller's buffer instead of allocating new bytes object.
+
+        param bool logging_decode: Same as in self.send(...).
+        """
+        bytes_received: int = super().recv_into(buffer, nbytes, flags)
+        if self.track_traffic:
+            self._bytes_received.inc(bytes_received)
+            self._log_traffic(
+                buffer, "in", length=bytes_received, decode=logging_decode
+            )
+        return bytes_received
@@ -0,0 +1,171 @@
+"""
+Module for capturing raw socket traffic into binary file and reading it back (see tools/replay.py).
+
+Traffic log (bot.socket.* loggers) only shows truncated repr of each read, capture keeps the whole
+byte stream so that incidents can be replayed exactly. Capture is enabled with
+RuntimeSettings.traffic_capture_dir, each process writes its own file:
+
+    traffic-<time>-<pid>.cap
+
+File format (little endian):
+
+    header  b"IRCCAP" + version (2 bytes) + wall clock time of capture start in ns (int64)
+    record  direction (uint8) + ns since capture start (uint64) + payload length (uint32) + payload
+
+Direction is one of RECEIVED, SENT or CONNECTED. CONNECTED has no payload, client writes it once
+per successful connect (data after it isn't continuation of partial line before it). Payloads are plaintext
+also over TLS and SASL credentials are redacted same way as in traffic log.
+
+Style guide: writing is only packing record header and appending to buffered file, nothing is
+             formatted. Buffer is flushed when record is written over a second after the previous
+             flush, when buffer fills up, on exit (SIGTERM too, see BotRunner.install_stop_signal)
+             and before warm restart (see flush_capture). Capture of killed process (SIGKILL)
+             may lack traffic of the last second before it went quiet.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import atexit
+import mmap
+import os
+import struct
+import time
+
+from collections.abc import Iterator
+from functools import cache
+from typing import TYPE_CHECKING, BinaryIO
+
+from src.settings import RuntimeSettings
+
+if TYPE_CHECKING:
+    from src.tracking_socket import ReadableBuffer
+
+MAGIC = b"IRCCAP\x00\x01"
+_HEADER = struct.Struct("<8sq")
+_RECORD = struct.Struct("<BQI")
+
+RECEIVED = 0
+SENT = 1
+CONNECTED = 2
+
+# records are written in chunks of this size
+_WRITE_BUFFER = 1 << 16
+# buffered records are flushed when next record is written this long after previous flush
+_FLUSH_INTERVAL_NS = 1_000_000_000
+
+
+class TrafficCapture:
+    """Appends traffic records into capture file, see module docstring for the format"""
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._fp: BinaryIO = open(path, "xb", buffering=_WRITE_BUFFER)
+        self._started: int = time.monotonic_ns()
+        self._flushed_at: int = self._started
+        self._fp.write(_HEADER.pack(MAGIC, time.time_ns()))
+
+    def write(self, direction: int, payload: ReadableBuffer, length: int) -> None:
+        now = time.monotonic_ns()
+        self._fp.write(_RECORD.pack(direction, now - self._started, length))
+        if length:
+            self._fp.write(memoryview(payload)[:length])
+        if now - self._flushed_at >= _FLUSH_INTERVAL_NS:
+            self.flush()
+
+    def flush(self) -> None:
+        self._fp.flush()
+        self._flushed_at = time.monotonic_ns()
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+@cache  # one capture file per process shared by every socket
+def open_capture() -> TrafficCapture | None:
+    """Capture configured with RuntimeSettings.traffic_capture_dir, None if capturing is off"""
+    directory = RuntimeSettings.from_env().traffic_capture_dir
+    if not directory:
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    # milliseconds tell apart files of warm restart which keeps pid
+    now = time.time()
+    name = (
+        f"traffic-{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}"
+        f".{int(now * 1000) % 1000:03d}-{os.getpid()}.cap"
+    )
+    capture = TrafficCapture(os.path.join(directory, name))
+    atexit.register(capture.close)
+    return capture
+
+
+def flush_capture() -> None:
+    """Writes buffered records of opened capture. Call before os.exec*(...)"""
+    if open_capture.cache_info().currsize:
+        capture = open_capture()
+        if capture is not None:
+            capture.flush()
+
+
+class CaptureReader:
+    """
+    Memory maps capture file and iterates its records without copying payloads.
+    Raises ValueError if file isn't a capture.
+
+    NOTE: payloads are views into the mapping, drop them (or copy with bytes(...))
+          before calling close()
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fp:
+            try:
+                self._map: mmap.mmap = mmap.mmap(
+                    fp.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except ValueError:
+                raise ValueError(f"{path} is empty") from None
+
+        if len(self._map) < _HEADER.size or self._map[: len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a traffic capture")
+
+        _, started = _HEADER.unpack_from(self._map)
+        # wall clock time of capture start in seconds
+        self.started_at: float = started / 1e9
+        # set when iteration hits record cut short e.g by killed process
+        self.truncated: bool = False
+
+    def __enter__(self) -> CaptureReader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def records(self) -> Iterator[tuple[int, int, memoryview]]:
+        """Yields (direction, ns since capture start, payload) in the order they were written"""
+        view = memoryview(self._map)
+        unpack_from = _RECORD.unpack_from
+        header_size = _RECORD.size
+        pos = _HEADER.size
+        end = len(view)
+        try:
+            while pos < end:
+                if pos + header_size > end:
+                    self.truncated = True
+                    return
+
+                direction, timestamp, length = unpack_from(view, pos)
+                pos += header_size
+                if pos + length > end:
+                    self.truncated = True
+                    return
+
+                yield direction, timestamp, view[pos : pos + length]
+                pos += length
+        finally:
+            view.release()
+
+    def close(self) -> None:
+        self._map.close()
@@ -0,0 +1,188 @@
+"""
+Module for warm restarts i.e replacing running bot process with a new one (e.g after deploy)
+without dropping the IRC connection.
+
+Bot writes snapshot of its runtime state to disk and executes itself again with os.execve(...).
+Socket of the connection is left open over exec, so the new process continues the same session:
+no reconnect, no registration, no JOINs and no queries. Snapshot holds one-time token which is
+passed to the new process in RESUME_TOKEN_ENV, that is how the new process tells warm restart
+apart from cold start finding an old snapshot (process id can't tell, e.g in container bot is
+always PID 1). Inherited socket must also still be connected to the same server.
+
+Snapshot is resumed at most once, loading it removes descriptor and token from the file.
+Cold starts load the snapshot too but only take state which doesn't depend on the connection
+(topic schedules). Membership, op status and topics are learned again from replies to JOIN,
+since server doesn't resend anything it hasn't got (e.g channel without topic) stale values
+could stick around otherwise.
+
+Style guide: snapshot holds only plain data (see StateSnapshot). Classes which own the state
+             provide export/restore methods for it, state is not reached into from here.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import os
+import secrets
+import socket
+import stat
+import tempfile
+
+from pydantic import BaseModel, ValidationError
+
+# Bump when fields change incompatibly, snapshots of other versions are ignored
+SNAPSHOT_VERSION = 1
+
+# environment variable holding token of the snapshot process should resume, set only for exec
+RESUME_TOKEN_ENV = "IRC_BOT_RESUME_TOKEN"
+
+
+class StateSnapshot(BaseModel):
+    """
+    Runtime state of single bot written on warm restart.
+
+    NOTE: prefix mode bits of channels are only meaningful with PREFIX token of isupport,
+          restore isupport before channels (see IRCClient.resume_session)
+    """
+
+    version: int = SNAPSHOT_VERSION
+    pid: int
+    created_at: float
+    # absolute path of config.json, snapshot of other network (config) is never used
+    config_path: str
+    # descriptor of connected socket which is kept open over exec, None if bot wasn't connected
+    fd: int | None = None
+    # "host:port" the socket was connected to, inherited descriptor must still match it
+    peer: str | None = None
+    # one-time token given to the new process in RESUME_TOKEN_ENV, empty if not resumable
+    token: str = ""
+
+    server: str
+    port: int
+    nick: str
+    is_registered: bool
+    chan: list[str]
+    isupport: dict[str, str]
+    # enabled IRCv3 capabilities
+    caps: list[str] = []
+    op_state: dict[str, bool]
+    topics: dict[str, str]
+    # casefolded channel -> casefolded nick -> prefix mode bits (see ChannelStateStore.export)
+    channels: dict[str, dict[str, int]]
+    # casefolded nicks of members who are away
+    away: list[str] = []
+    # received bytes which weren't dispatched yet, latin-1 keeps arbitrary bytes intact in JSON
+    recv_buffer: str = ""
+    # queued outgoing lines and their priorities in send order
+    send_queue: list[tuple[str, int]] = []
+    # flood control tokens left, so that restart doesn't grant a fresh burst
+    send_tokens: float | None = None
+
+    # channel -> ([(start, end, topic), ...], default topic), see TopicScheduler.schedules
+    schedules: dict[str, tuple[list[tuple[float, float, str]], str | None]] = {}
+
+
+def save_snapshot(path: str, snapshot: StateSnapshot) -> None:
+    """Writes snapshot to path atomically, missing directories are created"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            fp.write(snapshot.model_dump_json())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(path: str) -> tuple[StateSnapshot | None, str | None]:
+    """
+    Reads snapshot written by save_snapshot(...).
+    Returns (snapshot, None) on success, (None, None) if there is no snapshot
+    and (None, error) if snapshot can't be used.
+    """
+    try:
+        with open(path, "r") as fp:
+            data = fp.read()
+    except FileNotFoundError:
+        return None, None
+    except OSError as err:
+        return None, f"Reading snapshot {path} failed: {err}"
+
+    try:
+        snapshot = StateSnapshot.model_validate_json(data)
+    except ValidationError as err:
+        return None, f"Invalid snapshot {path}: {err}"
+
+    if snapshot.version != SNAPSHOT_VERSION:
+        return None, f"Snapshot {path} has unsupported version {snapshot.version}"
+
+    return snapshot, None
+
+
+def new_resume_token() -> str:
+    return secrets.token_hex(16)
+
+
+def take_resume_token() -> str | None:
+    """
+    Token of the snapshot this process was started to resume, None on cold start.
+    Token is removed from environment so that it never reaches processes started later.
+    """
+    return os.environ.pop(RESUME_TOKEN_ENV, None) or None
+
+
+def socket_peer(sock: socket.socket) -> str | None:
+    """Address sock is connected to as "host:port", None if it isn't connected"""
+    try:
+        address = sock.getpeername()
+    except OSError:
+        return None
+
+    if isinstance(address, tuple):
+        return f"{address[0]}:{address[1]}"
+    return str(address)
+
+
+def is_resumable(
+    snapshot: StateSnapshot, token: str | None, own_fds: tuple[int, ...] = ()
+) -> bool:
+    """
+    True if this process was started (with token) to resume the session of snapshot and
+    socket it refers to is still open and connected to the same peer. Descriptors in own_fds
+    belong to this process already (e.g socket created at startup) and are never adopted.
+    """
+    fd = snapshot.fd
+    if not token or not snapshot.token or token != snapshot.token or fd is None:
+        return False
+
+    if fd in own_fds:
+        return False
+
+    try:
+        mode = os.fstat(fd).st_mode
+    except OSError:
+        return False
+
+    if not stat.S_ISSOCK(mode):
+        return False
+
+    # wraps the descriptor only for the check, detach() leaves it open
+    sock = socket.socket(fileno=fd)
+    try:
+        return snapshot.peer is not None and socket_peer(sock) == snapshot.peer
+    finally:
+        sock.detach()
+
+
+def consume_snapshot(path: str, snapshot: StateSnapshot) -> None:
+    """
+    Rewrites snapshot without descriptor and token so that it can't be resumed again,
+    state for cold starts (topic schedules) is kept
+    """
+    if snapshot.fd is None and not snapshot.token:
+        return
+
+    save_snapshot(path, snapshot.model_copy(update={"fd": None, "token": ""}))
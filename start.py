@@ -1,13 +1,187 @@
+import argparse
+import asyncio
+
 from src.runner import BotRunner
+from src.calendar_sync import load_calendar_sync
 from src.client import IRCClient
+from src.metrics import MetricsServer, install_dump_signal
+from src.topic_scheduler import load_scheduler
+from src.topic_template import TopicTemplate
+
+
+def _setup_metrics(metrics_port: int | None) -> None:
+    install_dump_signal()
+    if metrics_port is not None:
+        MetricsServer(metrics_port).start()
 
 
-def main():
-    client = IRCClient()
-    runner = BotRunner(client)
+def main(
+    config_path: str = "./config.json",
+    topics_path: str | None = None,
+    metrics_port: int | None = None,
+    calendars_path: str | None = None,
+    topic_template: TopicTemplate | None = None,
+    proxy: bool = False,
+):
+    _setup_metrics(metrics_port)
+    client = IRCClient(proxy=proxy, config_path=config_path)
+    runner = BotRunner(
+        client,
+        topic_scheduler=(
+            load_scheduler(topics_path) if topics_path is not None else None
+        ),
+        calendar_sync=(
+            load_calendar_sync(calendars_path, client.settings, topic_template)
+            if calendars_path is not None
+            else None
+        ),
+    )
+    runner.install_reload_signal()
+    runner.install_stop_signal()
+    runner.install_restart_signal()
+    runner.install_profile_signal()
     runner.run_forever()
 
 
+def main_async(
+    config_path: str = "./config.json",
+    topics_path: str | None = None,
+    metrics_port: int | None = None,
+    calendars_path: str | None = None,
+    topic_template: TopicTemplate | None = None,
+    proxy: bool = False,
+):
+    # imported here so that blocking mode doesn't pay for asyncio machinery
+    from src.async_client import AsyncIRCClient
+    from src.async_runner import AsyncBotRunner
+
+    _setup_metrics(metrics_port)
+    client = AsyncIRCClient(proxy=proxy, config_path=config_path)
+    runner = AsyncBotRunner(
+        client,
+        topic_scheduler=(
+            load_scheduler(topics_path) if topics_path is not None else None
+        ),
+        calendar_sync=(
+            load_calendar_sync(calendars_path, client.settings, topic_template)
+            if calendars_path is not None
+            else None
+        ),
+    )
+    runner.install_reload_signal()
+    runner.install_stop_signal()
+    runner.install_restart_signal()
+    runner.install_profile_signal()
+    asyncio.run(runner.run_forever())
+
+
+def main_supervised(
+    config_paths: list[str],
+    use_asyncio: bool,
+    cache_dir: str,
+    topics_path: str | None = None,
+    metrics_port: int | None = None,
+    calendars_path: str | None = None,
+    topic_template: TopicTemplate | None = None,
+    proxy: bool = False,
+):
+    from src.supervisor import NetworkSupervisor
+
+    NetworkSupervisor(
+        config_paths,
+        use_asyncio=use_asyncio,
+        cache_dir=cache_dir,
+        topics_path=topics_path,
+        metrics_port=metrics_port,
+        calendars_path=calendars_path,
+        topic_template=topic_template,
+        proxy=proxy,
+    ).run_forever()
+
+
 if __name__ == "__main__":
-    # main()
-    main()
+    parser = argparse.ArgumentParser(description="IRC google calendar bot")
+    parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="run bot on asyncio event loop instead of blocking loop",
+    )
+    parser.add_argument(
+        "--proxy",
+        action="store_true",
+        help="connect through SOCKS5 proxy PROXY_SERVER:PROXY_PORT of the config "
+        "(credentials from IRC_BOT_PROXY_USERNAME/_PASSWORD)",
+    )
+    parser.add_argument(
+        "--config",
+        action="append",
+        dest="configs",
+        help="path to network config, repeat to run bot on multiple networks "
+        "(each in its own process). Defaults to ./config.json",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default="./.cache",
+        help="directory for cache shared between networks",
+    )
+    parser.add_argument(
+        "--topics",
+        help="path to JSON file with timed topic entries per channel "
+        "(see src/topic_scheduler.py for the format)",
+    )
+    parser.add_argument(
+        "--calendars",
+        help="path to JSON file mapping channels to iCalendar files whose events "
+        "become topics of the channel (see src/calendar_sync.py for the format)",
+    )
+    parser.add_argument(
+        "--topic-template",
+        help="template of topics built from --calendars events, e.g "
+        "'{current} ({current.start}-{current.end})[1: | Next: {next}]' "
+        "(see src/topic_template.py for the syntax)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="serve Prometheus metrics on http://127.0.0.1:<port>/metrics. With multiple "
+        "--config workers use consecutive ports starting from <port> in the order of "
+        "--config. Metrics can also be dumped to stderr with SIGUSR1",
+    )
+    args = parser.parse_args()
+    configs: list[str] = args.configs or ["./config.json"]
+    template: TopicTemplate | None = None
+    if args.topic_template is not None:
+        try:
+            template = TopicTemplate(args.topic_template)
+        except ValueError as err:
+            parser.error(str(err))
+
+    if len(configs) > 1:
+        main_supervised(
+            configs,
+            args.asyncio,
+            args.cache_dir,
+            args.topics,
+            args.metrics_port,
+            args.calendars,
+            template,
+            args.proxy,
+        )
+    elif args.asyncio:
+        main_async(
+            configs[0],
+            args.topics,
+            args.metrics_port,
+            args.calendars,
+            template,
+            args.proxy,
+        )
+    else:
+        main(
+            configs[0],
+            args.topics,
+            args.metrics_port,
+            args.calendars,
+            template,
+            args.proxy,
+        )
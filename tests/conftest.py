@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from src.client import IRCClient
+from src.runner import BotRunner
+from src.warm_restart import RESUME_TOKEN_ENV
+
+
+@pytest.fixture
+def channels():
+    """CHAN of the config, override in test module for other channels"""
+    return ["#a"]
+
+
+@pytest.fixture
+def config(channels):
+    """Contents of config.json, override in test module e.g to point it to other server"""
+    return {
+        "NICK": "bot",
+        "SERVER": "127.0.0.1",
+        "PORT": 6667,
+        "IDENT": "bot",
+        "REALNAME": "bot",
+        "CHAN": channels,
+        "PROXY_SERVER": "",
+        "PROXY_PORT": 0,
+    }
+
+
+@pytest.fixture
+def config_path(tmp_path, config):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config))
+    return path
+
+
+@pytest.fixture
+def runner(config_path, tmp_path, monkeypatch):
+    """BotRunner which isn't connected, state files are kept in tmp_path"""
+    monkeypatch.setenv("IRC_BOT_SNAPSHOT_PATH", str(tmp_path / "state.json"))
+    monkeypatch.setenv("IRC_BOT_TRAFFIC_CAPTURE_DIR", "")
+    monkeypatch.delenv(RESUME_TOKEN_ENV, raising=False)
+    runner = BotRunner(IRCClient(config_path=str(config_path)))
+    yield runner
+    runner.client.socket.close()
+
+
+@pytest.fixture
+def registered_runner(runner):
+    """runner which acts as if it had connected and registered, sent lines stay queued"""
+    runner.client.is_connected = True
+    runner.client.is_registered = True
+    return runner
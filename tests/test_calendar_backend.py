@@ -0,0 +1,46 @@
+import os
+
+from src.calendar_backend import ICSFileBackend
+from src.event_store import EventStore
+
+_EVENT = """BEGIN:VEVENT
+UID:{uid}
+SUMMARY:{summary}
+DTSTART:20300101T{hour}0000Z
+DTEND:20300101T{hour}3000Z
+DTSTAMP:20290101T000000Z
+END:VEVENT
+"""
+
+
+def _write_calendar(path, *events, mtime_ns=None):
+    body = "".join(
+        _EVENT.format(uid=uid, summary=summary, hour=10 + i)
+        for i, (uid, summary) in enumerate(events)
+    )
+    path.write_text(f"BEGIN:VCALENDAR\n{body}END:VCALENDAR\n")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_event_removed_from_file_is_removed_from_store(tmp_path):
+    path = tmp_path / "work.ics"
+    _write_calendar(path, ("a", "Planning"), ("b", "Lunch"), mtime_ns=10**18)
+    store = EventStore(ICSFileBackend({"work": str(path)}))
+    store.sync("work")
+    assert sorted(event.id for event in store.events("work")) == ["a", "b"]
+
+    _write_calendar(path, ("a", "Planning"), mtime_ns=10**18 + 10**9)
+    store.sync("work")
+    assert [event.id for event in store.events("work")] == ["a"]
+
+
+def test_unchanged_file_syncs_nothing(tmp_path):
+    path = tmp_path / "work.ics"
+    _write_calendar(path, ("a", "Planning"))
+    backend = ICSFileBackend({"work": str(path)})
+    first = backend.list_events("work", None)
+    assert first.full_sync and len(first.events) == 1
+
+    again = backend.list_events("work", first.next_sync_token)
+    assert not again.full_sync and again.events == []
@@ -0,0 +1,42 @@
+import threading
+from datetime import datetime, timezone
+
+from src.calendar_backend import CalendarBackend, CalendarEvent, SyncResult
+from src.calendar_sync import CalendarFetcher
+from src.shared_cache import SharedCache
+
+_START = datetime(2030, 1, 1, 10, tzinfo=timezone.utc)
+
+
+class _CountingBackend(CalendarBackend):
+    def __init__(self):
+        self.calls = 0
+
+    def list_events(self, calendar_id, sync_token):
+        self.calls += 1
+        event = CalendarEvent("a", "Planning", _START, _START, _START)
+        return SyncResult([event], "v1", full_sync=True)
+
+
+def _fetch(fetcher, calendar_id):
+    done = threading.Event()
+    fetcher.listener = done.set
+    fetcher.submit(calendar_id, None)
+    assert done.wait(5)
+    (outcome,) = fetcher.results()
+    fetcher.shutdown()
+    return outcome
+
+
+def test_fetchers_sharing_cache_call_backend_once(tmp_path):
+    # e.g two supervised workers polling the same calendar file
+    cache = SharedCache(str(tmp_path))
+    backends = [_CountingBackend(), _CountingBackend()]
+    outcomes = [
+        _fetch(CalendarFetcher(backend, shared_cache=cache, cache_ttl=60), "work")
+        for backend in backends
+    ]
+
+    assert [backend.calls for backend in backends] == [1, 0]
+    assert outcomes[0].result == outcomes[1].result
+    assert outcomes[1].result.events[0].summary == "Planning"
@@ -0,0 +1,14 @@
+from src.parsing import MessageParser
+from src.runner import _MAX_COMMAND_LABELS
+
+
+def test_commands_past_label_limit_share_other_counter(runner):
+    extra = 50
+    for i in range(_MAX_COMMAND_LABELS + extra):
+        runner._dispatch(MessageParser.parse(f":srv CMD{i} bot"))
+    # repeated command past the limit is counted again instead of getting its own label
+    runner._dispatch(MessageParser.parse(f":srv CMD{_MAX_COMMAND_LABELS} bot"))
+
+    assert len(runner._command_counters) == _MAX_COMMAND_LABELS
+    assert runner._other_commands is not None
+    assert runner._other_commands.value == extra + 1
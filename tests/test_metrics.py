@@ -0,0 +1,27 @@
+import os
+import signal
+import time
+
+from src.metrics import MetricsRegistry, install_dump_signal
+
+
+def test_dump_signal_does_not_deadlock_while_registry_lock_is_held(capfd):
+    previous = signal.getsignal(signal.SIGUSR1)
+    install_dump_signal()
+    registry = MetricsRegistry()
+    registry.counter("irc_test_dumps_total", "Test counter").inc()
+    try:
+        # e.g signal arriving while main thread registers a new metric
+        with registry._lock:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            time.sleep(0.1)
+
+        output = ""
+        deadline = time.monotonic() + 5
+        while "irc_test_dumps_total 1" not in output and time.monotonic() < deadline:
+            time.sleep(0.01)
+            output += capfd.readouterr().err
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+    assert "irc_test_dumps_total 1" in output
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from src.parsing import MessageParser
+from src.runner import BotRunner
+from src.topic_scheduler import TopicEntry
+
+
+@pytest.fixture
+def channels():
+    return ["#Chan"]
+
+
+def _receive(runner: BotRunner, *lines: str) -> None:
+    for line in lines:
+        runner._dispatch(MessageParser.parse(line))
+
+
+def _sent_topics(runner: BotRunner) -> list[str]:
+    return [
+        line
+        for line, _ in runner.client.send_queue.pending()
+        if line.startswith("TOPIC")
+    ]
+
+
+def test_scheduled_topic_is_set_when_server_sends_channel_in_other_case(
+    registered_runner,
+):
+    # server reports the channel in lower case, config and scheduler use "#Chan"
+    _receive(
+        registered_runner,
+        ":bot!bot@host JOIN #chan",
+        ":srv 353 bot = #chan :@bot member",
+        ":srv 366 bot #chan :End of /NAMES list.",
+    )
+    assert registered_runner.client.has_op("#Chan")
+
+    now = time.time()
+    registered_runner.topic_scheduler.set_schedule(
+        "#Chan", [TopicEntry(now - 1, now + 60, "Now")]
+    )
+    registered_runner._apply_scheduled_topics()
+    assert _sent_topics(registered_runner) == ["TOPIC #Chan :Now"]
+
+
+def test_op_lost_in_other_case_stops_topic_changes(registered_runner):
+    _receive(
+        registered_runner,
+        ":bot!bot@host JOIN #chan",
+        ":srv 353 bot = #chan :@bot member",
+        ":srv 366 bot #chan :End of /NAMES list.",
+        ":srv MODE #CHAN -o bot",
+    )
+    assert not registered_runner.client.has_op("#Chan")
+    assert not registered_runner.client.change_topic("#Chan", "Now")
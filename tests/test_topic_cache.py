@@ -0,0 +1,53 @@
+import pytest
+
+from src.parsing import MessageParser
+from src.runner import BotRunner
+
+
+@pytest.fixture
+def channels():
+    return ["#Chan"]
+
+
+@pytest.fixture
+def runner(registered_runner):
+    # bot is operator on the channel which server reports in lower case
+    _receive(
+        registered_runner,
+        ":bot!bot@host JOIN #chan",
+        ":srv 353 bot = #chan :@bot member",
+        ":srv 366 bot #chan :End of /NAMES list.",
+    )
+    return registered_runner
+
+
+def _receive(runner: BotRunner, *lines: str) -> None:
+    for line in lines:
+        runner._dispatch(MessageParser.parse(line))
+
+
+def test_topic_confirmed_in_other_case_is_not_pending(runner):
+    assert runner.client.change_topic("#Chan", "Now")
+    _receive(runner, ":bot!bot@host TOPIC #chan :Now")
+    assert not runner.client.change_topic("#Chan", "Now")
+
+    # someone else changed the topic, scheduled one must be restored
+    _receive(runner, ":member!m@host TOPIC #chan :Other")
+    assert runner.client.change_topic("#Chan", "Now")
+
+
+def test_topic_reply_in_other_case_skips_redundant_topic(runner):
+    _receive(runner, ":srv 332 bot #CHAN :Now")
+
+    assert not runner.client.change_topic("#Chan", "Now")
+
+
+def test_rejected_topic_in_other_case_is_sent_again_after_op(runner):
+    assert runner.client.change_topic("#Chan", "Now")
+    _receive(
+        runner,
+        ":srv 482 bot #chan :You're not channel operator",
+        ":srv MODE #chan +o bot",
+    )
+
+    assert runner.client.change_topic("#Chan", "Now")
@@ -0,0 +1,65 @@
+import socket
+
+import pytest
+
+from src import client, tracking_socket, traffic_capture
+from src.client import IRCClient
+from src.traffic_capture import (
+    CONNECTED,
+    RECEIVED,
+    SENT,
+    CaptureReader,
+    TrafficCapture,
+)
+
+
+@pytest.fixture
+def listener():
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        yield listener
+
+
+@pytest.fixture
+def config(config, listener):
+    return {**config, "PORT": listener.getsockname()[1]}
+
+
+def _read(path):
+    with CaptureReader(str(path)) as reader:
+        return [
+            (direction, bytes(payload)) for direction, _, payload in reader.records()
+        ]
+
+
+def test_records_are_flushed_once_interval_has_passed(tmp_path, monkeypatch):
+    path = tmp_path / "traffic.cap"
+    capture = TrafficCapture(str(path))
+    capture.write(SENT, b"NICK bot\r\n", 10)
+    # still in the write buffer
+    assert path.stat().st_size == 0
+
+    monkeypatch.setattr(traffic_capture, "_FLUSH_INTERVAL_NS", 0)
+    capture.write(RECEIVED, b"PING :x\r\n", 9)
+    # readable without close(), e.g after the process has been killed
+    assert _read(path) == [(SENT, b"NICK bot\r\n"), (RECEIVED, b"PING :x\r\n")]
+    capture.close()
+
+
+def test_connected_is_written_once_per_connect(
+    tmp_path, monkeypatch, config_path, listener
+):
+    path = tmp_path / "traffic.cap"
+    capture = TrafficCapture(str(path))
+    for module in (client, tracking_socket):
+        monkeypatch.setattr(module, "open_capture", lambda: capture)
+
+    irc = IRCClient(config_path=str(config_path))
+    # sockets created for connections (and re-wrapped ones) aren't connections yet
+    irc.socket.close()
+    irc.socket = irc._create_socket()
+    irc.connect()
+    listener.accept()[0].close()
+    capture.close()
+    irc.socket.close()
+
+    assert [direction for direction, _ in _read(path)] == [CONNECTED]
@@ -0,0 +1,122 @@
+import os
+import socket
+import time
+
+import pytest
+
+from src.runner import BotRunner
+from src.supervisor import worker_snapshot_path
+from src.topic_scheduler import TopicEntry
+from src.warm_restart import (
+    RESUME_TOKEN_ENV,
+    is_resumable,
+    load_snapshot,
+    save_snapshot,
+    socket_peer,
+)
+
+START = time.time() + 3600
+
+
+@pytest.fixture
+def connection():
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        client = socket.create_connection(listener.getsockname())
+        server, _ = listener.accept()
+    yield client
+    client.close()
+    server.close()
+
+
+def _write_snapshot(runner: BotRunner, **fields) -> str:
+    snapshot = runner.export_state()
+    snapshot.schedules = {"#a": ([(START, START + 3600, "Planned")], "Default")}
+    path = runner.client.settings.snapshot_path
+    save_snapshot(path, snapshot.model_copy(update=fields))
+    return path
+
+
+def test_cold_start_ignores_stale_snapshot_of_same_pid(runner):
+    # e.g bot running as PID 1 in container: pid matches and fd points to bot's fresh socket
+    own_fd = runner.client.socket.fileno()
+    path = _write_snapshot(runner, pid=os.getpid(), fd=own_fd)
+
+    assert runner._load_snapshot() is None
+    assert runner.client.socket.fileno() == own_fd
+    # schedules are still used by cold start
+    assert runner.topic_scheduler.schedules()["#a"] == (
+        [TopicEntry(START, START + 3600, "Planned")],
+        "Default",
+    )
+    snapshot, _ = load_snapshot(path)
+    assert snapshot is not None and snapshot.fd is None and not snapshot.token
+
+
+def test_snapshot_is_not_resumed_without_matching_token(
+    runner, connection, monkeypatch
+):
+    _write_snapshot(
+        runner, fd=connection.fileno(), peer=socket_peer(connection), token="a" * 32
+    )
+    monkeypatch.setenv(RESUME_TOKEN_ENV, "b" * 32)
+
+    assert runner._load_snapshot() is None
+    assert RESUME_TOKEN_ENV not in os.environ
+
+
+def test_snapshot_is_resumed_once_with_token(runner, connection, monkeypatch):
+    path = _write_snapshot(
+        runner, fd=connection.fileno(), peer=socket_peer(connection), token="a" * 32
+    )
+    monkeypatch.setenv(RESUME_TOKEN_ENV, "a" * 32)
+
+    snapshot = runner._load_snapshot()
+    assert snapshot is not None and snapshot.fd == connection.fileno()
+    # token is consumed from both environment and file
+    assert RESUME_TOKEN_ENV not in os.environ
+    stored, _ = load_snapshot(path)
+    assert stored is not None and stored.fd is None and not stored.token
+
+    monkeypatch.setenv(RESUME_TOKEN_ENV, "a" * 32)
+    assert runner._load_snapshot() is None
+
+
+def test_descriptor_must_still_be_connected_to_same_peer(runner, connection):
+    snapshot = runner.export_state().model_copy(
+        update={"fd": connection.fileno(), "token": "a" * 32}
+    )
+
+    assert is_resumable(
+        snapshot.model_copy(update={"peer": socket_peer(connection)}), "a" * 32
+    )
+    assert not is_resumable(
+        snapshot.model_copy(update={"peer": "127.0.0.1:1"}), "a" * 32
+    )
+    # e.g listening socket of metrics server which got the same descriptor number
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        assert not is_resumable(
+            snapshot.model_copy(update={"fd": listener.fileno(), "peer": None}),
+            "a" * 32,
+        )
+
+
+def test_own_socket_is_never_adopted(runner, connection):
+    snapshot = runner.export_state().model_copy(
+        update={
+            "fd": connection.fileno(),
+            "peer": socket_peer(connection),
+            "token": "a" * 32,
+        }
+    )
+
+    assert not is_resumable(snapshot, "a" * 32, (connection.fileno(),))
+
+
+def test_supervised_workers_have_own_snapshots(tmp_path):
+    paths = {
+        worker_snapshot_path(str(tmp_path), config)
+        for config in ("a/config.json", "b/config.json", "b/other.json")
+    }
+
+    assert len(paths) == 3
+    assert all(os.path.dirname(path) == str(tmp_path) for path in paths)
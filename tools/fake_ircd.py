@@ -0,0 +1,968 @@
+"""
+Scriptable fake IRC server for load and failure testing of IRCClient/BotRunner over loopback.
+
+Server implements just enough of RFC2812 for the bot: registration (001/005/376), PING/PONG,
+JOIN with NAMES burst, WHOIS (319), WHO (352), TOPIC and channel MODE. IRCv3 capability
+negotiation (CAP LS/REQ/END) holds registration like real servers do, SASL PLAIN checks
+credentials against accounts and negotiated server-time, batch (netsplits), extended-join
+and away-notify change what clients receive. With SSLContext (tls=...) connections are served
+over TLS and session resumption is counted. Failures are injected
+from the test script (or from the command line) through FakeIRCd and FakeSession methods:
+
+    server = FakeIRCd()
+    server.add_channel("#big", members=10000)
+    server.start()
+    ...  # point bot's config.json to 127.0.0.1:server.port and start it
+    session = server.wait_for_client()
+    session.wait_joined(["#big"])        # seconds from connect until every channel was joined
+    session.ping()                       # PING -> PONG round trip time in seconds
+    server.netsplit("#big", 0.5)         # half of the members QUIT, netjoin(...) brings them back
+    server.set_away("member1", "lunch")  # AWAY to clients with away-notify
+    session.pause_reading()              # slow reader, client's writes start to block
+    session.disconnect(abort=True)       # connection reset without ERROR
+
+Or from command line, printing latencies of every client which connects:
+
+    python -m tools.fake_ircd --port 6667 --channel "#big" --members 10000 --ping-interval 5
+
+NOTE: this is testing tool, not a real server. There is no flood control, no nick collision
+      handling and every client sees every other client (and fake member) as if on same server.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import argparse
+import base64
+import itertools
+import select
+import socket
+import ssl
+import struct
+import sys
+import threading
+import time
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+from src.line_buffer import LineBuffer
+from src.parsing import Message
+
+DEFAULT_ISUPPORT: dict[str, str | None] = {
+    "CASEMAPPING": "rfc1459",
+    "CHANTYPES": "#",
+    "PREFIX": "(ov)@+",
+    "TARGMAX": "JOIN:,PART:,WHOIS:1,PRIVMSG:4",
+    "TOPICLEN": "390",
+    "NICKLEN": "30",
+}
+
+# Capabilities offered in CAP LS, value is advertised with CAP LS 302
+DEFAULT_CAPS: dict[str, str | None] = {
+    "multi-prefix": None,
+    "batch": None,
+    "message-tags": None,
+    "server-time": None,
+    "away-notify": None,
+    "extended-join": None,
+    "sasl": "PLAIN",
+}
+
+# RFC2812 line length without \r\n
+_MAX_LINE = 510
+
+# Commands accepted before registration is complete
+_PRE_REGISTRATION = frozenset(
+    ("NICK", "USER", "CAP", "AUTHENTICATE", "PASS", "PING", "PONG", "QUIT")
+)
+
+
+@dataclass
+class FakeChannel:
+    name: str
+    topic: str = ""
+    # nick -> membership prefix ("@", "+" or "")
+    members: dict[str, str] = field(default_factory=dict)
+
+
+def _mask(nick: str) -> str:
+    return f"{nick}!~{nick[:9].lower()}@fake.host"
+
+
+class FakeSession:
+    """
+    Connection of single client. Timestamps (time.monotonic) of connection milestones are
+    recorded so that end-to-end latencies can be measured from the outside.
+    """
+
+    def __init__(self, server: FakeIRCd, sock: socket.socket):
+        self.server: FakeIRCd = server
+        self.sock: socket.socket = sock
+        self.nick: str = "*"
+        self.user: str | None = None
+        self.registered: bool = False
+        # enabled capabilities, registration waits for CAP END while negotiating
+        self.caps: set[str] = set()
+        self.cap_negotiating: bool = False
+        # account name after successful SASL
+        self.account: str | None = None
+        self._sasl_chunks: list[str] | None = None
+
+        self.connected_at: float = time.monotonic()
+        self.registered_at: float | None = None
+        # channel -> time when NAMES burst (366) of the channel was written
+        self.joined_at: dict[str, float] = {}
+        # every message received from client with time it was received
+        self.received: list[tuple[float, Message]] = []
+
+        self._write_lock = threading.Lock()
+        # set while reading is allowed, cleared by pause_reading()
+        self._reading = threading.Event()
+        self._reading.set()
+        self._changed = threading.Condition()
+        self._ping_tokens = itertools.count(1)
+        self.closed: bool = False
+
+    # ---- writing ----
+
+    def send(self, line: str) -> None:
+        self.send_lines((line,))
+
+    def send_lines(self, lines: Iterable[str]) -> None:
+        """Writes lines in single sendall so that bursts arrive as one stream"""
+        if "server-time" in self.caps:
+            lines = [self._with_time(line) for line in lines]
+
+        data = b"".join(f"{line}\r\n".encode("utf-8") for line in lines)
+        if not data or self.closed:
+            return
+
+        try:
+            with self._write_lock:
+                self.sock.sendall(data)
+        except OSError:
+            self._close()
+
+    @staticmethod
+    def _with_time(line: str) -> str:
+        now = time.time()
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now))
+        tag = f"time={stamp}.{int(now % 1 * 1000):03d}Z"
+        if line.startswith("@"):
+            return f"@{tag};{line[1:]}"
+
+        return f"@{tag} {line}"
+
+    def _reply(self, numeric: str, *params: str) -> str:
+        return f":{self.server.name} {numeric} {self.nick} {' '.join(params)}"
+
+    # ---- failure injection ----
+
+    def pause_reading(self) -> None:
+        """
+        Stops reading from the client. Once kernel buffers fill up (see FakeIRCd recv_buffer)
+        client's writes block or fail with EAGAIN i.e server applies backpressure.
+        """
+        self._reading.clear()
+
+    def resume_reading(self) -> None:
+        self._reading.set()
+
+    def disconnect(self, error: str | None = None, abort: bool = False) -> None:
+        """
+        Closes the connection. With error client first receives "ERROR :<error>" like
+        on K-line or server shutdown. abort resets connection (RST) instead of clean close.
+        """
+        if error is not None:
+            self.send(f"ERROR :Closing Link: {error}")
+
+        try:
+            if abort:
+                # zero linger timeout makes close() send RST
+                self.sock.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+                )
+            # wakes up session thread blocked in recv, without that close() is delayed
+            # until recv returns. Shutting down only reading side doesn't send FIN
+            self.sock.shutdown(socket.SHUT_RD if abort else socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self._close()
+
+    def _close(self) -> None:
+        if self.closed:
+            return
+
+        self.closed = True
+        self._reading.set()
+        self.sock.close()
+        self.server._remove_session(self)
+        with self._changed:
+            self._changed.notify_all()
+
+    # ---- measurements ----
+
+    def wait_for(
+        self,
+        command: str,
+        timeout: float = 5,
+        predicate: Callable[[Message], bool] | None = None,
+        since: float | None = None,
+    ) -> Message | None:
+        """Waits until client sends command (received after since). Returns None on timeout"""
+        found = self._wait_for(command, timeout, predicate, since)
+        return None if found is None else found[1]
+
+    def _wait_for(
+        self,
+        command: str,
+        timeout: float,
+        predicate: Callable[[Message], bool] | None,
+        since: float | None,
+    ) -> tuple[float, Message] | None:
+        since = self.connected_at if since is None else since
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                for received_at, msg in self.received:
+                    if (
+                        received_at >= since
+                        and msg.command == command
+                        and (predicate is None or predicate(msg))
+                    ):
+                        return received_at, msg
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.closed:
+                    return None
+
+                self._changed.wait(remaining)
+
+    def wait_joined(self, channels: Iterable[str], timeout: float = 30) -> float | None:
+        """Seconds from connect until client had joined every channel, None on timeout"""
+        channels = list(channels)
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while not all(channel in self.joined_at for channel in channels):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.closed:
+                    return None
+
+                self._changed.wait(remaining)
+
+        return max(self.joined_at[channel] for channel in channels) - self.connected_at
+
+    def ping(self, timeout: float = 5) -> float | None:
+        """Sends PING and returns seconds until matching PONG arrived, None on timeout"""
+        token = f"fake-{next(self._ping_tokens)}"
+        sent_at = time.monotonic()
+        self.send(f"PING :{token}")
+        pong = self._wait_for(
+            "PONG", timeout, lambda msg: msg.trailing == token, sent_at
+        )
+        return None if pong is None else pong[0] - sent_at
+
+    # ---- protocol ----
+
+    def run(self) -> None:
+        buffer = LineBuffer()
+        try:
+            while not self.closed:
+                self._reading.wait()
+                if self.closed or buffer.fill(self.sock) == 0:
+                    break
+
+                for line in buffer.lines():
+                    msg = Message.from_bytes(line)
+                    with self._changed:
+                        self.received.append((time.monotonic(), msg))
+                    self._handle(msg)
+                    with self._changed:
+                        self._changed.notify_all()
+        except OSError:
+            pass
+        finally:
+            self._close()
+
+    def _handle(self, msg: Message) -> None:
+        handler = getattr(self, f"_handle_{msg.command.lower()}", None)
+        if not self.registered and msg.command not in _PRE_REGISTRATION:
+            self.send(self._reply("451", ":You have not registered"))
+        elif handler is not None:
+            handler(msg)
+        elif self.registered:
+            self.send(self._reply("421", msg.command, ":Unknown command"))
+
+    def _handle_nick(self, msg: Message) -> None:
+        if msg.params:
+            self.nick = msg.params[0]
+            self._try_register()
+
+    def _handle_user(self, msg: Message) -> None:
+        if msg.params:
+            self.user = msg.params[0]
+            self._try_register()
+
+    def _try_register(self) -> None:
+        if (
+            self.registered
+            or self.cap_negotiating
+            or self.user is None
+            or self.nick == "*"
+        ):
+            return
+
+        self.registered = True
+        self.registered_at = time.monotonic()
+        tokens = [
+            key if value is None else f"{key}={value}"
+            for key, value in self.server.isupport.items()
+        ]
+        self.send_lines(
+            (
+                self._reply("001", f":Welcome to the fake network {self.nick}"),
+                self._reply("005", *tokens, ":are supported by this server"),
+                self._reply("376", ":End of /MOTD command."),
+            )
+        )
+
+    def _handle_ping(self, msg: Message) -> None:
+        self.send(f":{self.server.name} PONG {self.server.name} :{msg.trailing}")
+
+    def _handle_pong(self, msg: Message) -> None:
+        # answers to ping(...), it waits for them from received messages
+        pass
+
+    def _handle_cap(self, msg: Message) -> None:
+        params = msg.params
+        if not params:
+            return
+
+        subcommand = params[0].upper()
+        head = f":{self.server.name} CAP {self.nick}"
+        if subcommand == "LS":
+            if not self.registered:
+                self.cap_negotiating = True
+            with_values = (
+                len(params) > 1 and params[1].isdigit() and int(params[1]) >= 302
+            )
+            offered = " ".join(
+                cap if value is None or not with_values else f"{cap}={value}"
+                for cap, value in self.server.caps.items()
+            )
+            self.send(f"{head} LS :{offered}")
+        elif subcommand == "LIST":
+            self.send(f"{head} LIST :{' '.join(sorted(self.caps))}")
+        elif subcommand == "REQ" and len(params) > 1:
+            requested = params[1].split()
+            if all(cap.lstrip("-") in self.server.caps for cap in requested):
+                for cap in requested:
+                    if cap.startswith("-"):
+                        self.caps.discard(cap[1:])
+                    else:
+                        self.caps.add(cap)
+                self.send(f"{head} ACK :{params[1]}")
+            else:
+                self.send(f"{head} NAK :{params[1]}")
+        elif subcommand == "END":
+            self.cap_negotiating = False
+            self._try_register()
+
+    def _handle_authenticate(self, msg: Message) -> None:
+        if not msg.params or "sasl" not in self.caps:
+            return
+
+        data = msg.params[0]
+        if self._sasl_chunks is None:
+            if data.upper() != "PLAIN":
+                self.send_lines(
+                    (
+                        self._reply("908", "PLAIN", ":are available SASL mechanisms"),
+                        self._reply("904", ":SASL authentication failed"),
+                    )
+                )
+                return
+
+            self._sasl_chunks = []
+            self.send("AUTHENTICATE +")
+            return
+
+        if data == "*":
+            self._sasl_chunks = None
+            self.send(self._reply("906", ":SASL authentication aborted"))
+            return
+
+        if data != "+":
+            self._sasl_chunks.append(data)
+        # 400 byte chunk means that more is coming
+        if len(data) == 400:
+            return
+
+        payload, self._sasl_chunks = "".join(self._sasl_chunks), None
+        try:
+            _, user, password = base64.b64decode(payload).decode("utf-8").split("\0")
+        except ValueError:
+            user, password = "", None
+
+        if self.server.accounts.get(user) != password:
+            self.send(self._reply("904", ":SASL authentication failed"))
+            return
+
+        self.account = user
+        self.send_lines(
+            (
+                self._reply(
+                    "900", _mask(self.nick), user, f":You are now logged in as {user}"
+                ),
+                self._reply("903", ":SASL authentication successful"),
+            )
+        )
+
+    def _handle_join(self, msg: Message) -> None:
+        if not msg.params:
+            return
+
+        for name in msg.params[0].split(","):
+            self.server._join(self, name)
+
+    def _handle_part(self, msg: Message) -> None:
+        if not msg.params:
+            return
+
+        for name in msg.params[0].split(","):
+            channel = self.server.channels.get(name)
+            if channel is not None and self.nick in channel.members:
+                self.server.broadcast(channel, f":{_mask(self.nick)} PART {name}")
+                del channel.members[self.nick]
+                self.joined_at.pop(name, None)
+
+    def _handle_whois(self, msg: Message) -> None:
+        if not msg.params:
+            return
+
+        nick = msg.params[-1]
+        channels = [
+            channel.members[nick] + channel.name
+            for channel in self.server.channels.values()
+            if nick in channel.members
+        ]
+        self.send_lines(
+            (
+                self._reply(
+                    "311", nick, f"~{nick[:9].lower()}", "fake.host", "*", ":-"
+                ),
+                self._reply("319", nick, ":" + " ".join(channels)),
+                self._reply("318", nick, ":End of /WHOIS list."),
+            )
+        )
+
+    def _handle_who(self, msg: Message) -> None:
+        if not msg.params:
+            return
+
+        name = msg.params[0]
+        channel = self.server.channels.get(name)
+        lines = []
+        if channel is not None:
+            for nick, prefix in list(channel.members.items()):
+                lines.append(
+                    self._reply(
+                        "352",
+                        name,
+                        f"~{nick[:9].lower()}",
+                        "fake.host",
+                        self.server.name,
+                        nick,
+                        f"{'G' if nick in self.server.away else 'H'}{prefix}",
+                        ":0 fake member",
+                    )
+                )
+        lines.append(self._reply("315", name, ":End of /WHO list."))
+        self.send_lines(lines)
+
+    def _handle_topic(self, msg: Message) -> None:
+        params = msg.params
+        if not params:
+            return
+
+        channel = self.server.channels.get(params[0])
+        if channel is None or self.nick not in channel.members:
+            self.send(self._reply("442", params[0], ":You're not on that channel"))
+        elif len(params) == 1:
+            self.send(self._topic_reply(channel))
+        elif channel.members[self.nick] != "@":
+            self.send(self._reply("482", channel.name, ":You're not channel operator"))
+        else:
+            # real servers cut topics to TOPICLEN bytes, possibly mid character
+            topiclen = self.server.isupport.get("TOPICLEN")
+            topic = params[1]
+            if topiclen and topiclen.isdigit():
+                topic = topic.encode("utf-8")[: int(topiclen)].decode(
+                    "utf-8", errors="replace"
+                )
+            channel.topic = topic
+            self.server.broadcast(
+                channel, f":{_mask(self.nick)} TOPIC {channel.name} :{channel.topic}"
+            )
+
+    def _handle_quit(self, msg: Message) -> None:
+        self.send(f"ERROR :Closing Link: {self.nick} (Quit: {msg.trailing})")
+        self.disconnect()
+
+    def _topic_reply(self, channel: FakeChannel) -> str:
+        if not channel.topic:
+            return self._reply("331", channel.name, ":No topic is set")
+
+        return self._reply("332", channel.name, f":{channel.topic}")
+
+    def _names_burst(self, channel: FakeChannel) -> list[str]:
+        head = self._reply("353", "=", channel.name, ":")
+        lines: list[str] = []
+        names: list[str] = []
+        length = len(head)
+        for nick, prefix in list(channel.members.items()):
+            name = prefix + nick
+            if names and length + len(name) + 1 > _MAX_LINE:
+                lines.append(head + " ".join(names))
+                names, length = [], len(head)
+
+            names.append(name)
+            length += len(name) + 1
+
+        if names:
+            lines.append(head + " ".join(names))
+
+        lines.append(self._reply("366", channel.name, ":End of /NAMES list."))
+        return lines
+
+
+class FakeIRCd:
+    """
+    Fake server listening on loopback. Every connection is served by its own thread.
+
+    param int recv_buffer: SO_RCVBUF of accepted sockets. Small value makes
+                           FakeSession.pause_reading() apply backpressure sooner.
+    param bool auto_op: clients get channel operator status on join so that they can set topics
+    param dict caps: capabilities offered to clients, defaults to DEFAULT_CAPS. Empty dict makes
+                     server behave like one without IRCv3 support (CAP LS lists nothing)
+    param dict accounts: username -> password pairs accepted by SASL PLAIN
+    param SSLContext tls: server side context, every connection is served over TLS.
+                          Sessions are cached by the context, so clients can resume them.
+                          TLS is terminated in a proxy thread per connection, which buffers
+                          data and makes pause_reading() backpressure less exact
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        name: str = "fake.ircd",
+        isupport: dict[str, str | None] | None = None,
+        recv_buffer: int | None = None,
+        auto_op: bool = True,
+        caps: dict[str, str | None] | None = None,
+        accounts: dict[str, str] | None = None,
+        tls: ssl.SSLContext | None = None,
+    ):
+        self.name: str = name
+        self.isupport: dict[str, str | None] = dict(isupport or DEFAULT_ISUPPORT)
+        self.recv_buffer: int | None = recv_buffer
+        self.auto_op: bool = auto_op
+        self.caps: dict[str, str | None] = dict(DEFAULT_CAPS if caps is None else caps)
+        # SASL PLAIN username -> password
+        self.accounts: dict[str, str] = dict(accounts or {})
+        self.tls: ssl.SSLContext | None = tls
+        # completed TLS handshakes and how many of them resumed earlier session
+        self.tls_handshakes: int = 0
+        self.tls_resumed: int = 0
+        # nick -> away message of members who are away
+        self.away: dict[str, str] = {}
+        self._batch_ids = itertools.count(1)
+        self.channels: dict[str, FakeChannel] = {}
+        self.sessions: list[FakeSession] = []
+        # called with every new session, e.g for printing latencies from command line
+        self.on_session: Callable[[FakeSession], None] | None = None
+
+        self._listener = socket.create_server((host, port))
+        self._lock = threading.Lock()
+        self._new_session = threading.Condition(self._lock)
+        # every session ever accepted, including closed ones
+        self._accepted: list[FakeSession] = []
+        self._thread = threading.Thread(
+            target=self._accept_loop, name="fake-ircd", daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self._listener.getsockname()[1]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        try:
+            # wakes up accept loop, close() alone leaves blocked accept() running
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self._listener.close()
+        for session in list(self.sessions):
+            session.disconnect()
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+
+            if self.recv_buffer is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+
+            if self.tls is not None:
+                sock = self._start_tls_proxy(sock, self.tls)
+
+            session = FakeSession(self, sock)
+            with self._lock:
+                self.sessions.append(session)
+                self._accepted.append(session)
+                self._new_session.notify_all()
+
+            if self.on_session is not None:
+                self.on_session(session)
+
+            threading.Thread(
+                target=session.run, name="fake-ircd-session", daemon=True
+            ).start()
+
+    def _start_tls_proxy(
+        self, sock: socket.socket, context: ssl.SSLContext
+    ) -> socket.socket:
+        """
+        Returns plain socket for the session, proxy thread does TLS with the client. SSL objects
+        can't be read and written from different threads at once, session does exactly that.
+        """
+        session_end, proxy_end = socket.socketpair()
+        threading.Thread(
+            target=self._tls_proxy,
+            args=(sock, proxy_end, context),
+            name="fake-ircd-tls",
+            daemon=True,
+        ).start()
+        return session_end
+
+    def _tls_proxy(
+        self, sock: socket.socket, plain: socket.socket, context: ssl.SSLContext
+    ) -> None:
+        try:
+            sock.settimeout(10)
+            tls = context.wrap_socket(sock, server_side=True)
+        except OSError:
+            sock.close()
+            plain.close()
+            return
+
+        with self._lock:
+            self.tls_handshakes += 1
+            self.tls_resumed += tls.session_reused
+
+        tls.setblocking(False)
+        try:
+            while True:
+                # decrypted data may be buffered in SSL object without socket being readable
+                if not tls.pending():
+                    select.select([tls, plain], [], [])
+
+                try:
+                    data = tls.recv(65536)
+                except ssl.SSLWantReadError:
+                    pass
+                else:
+                    if not data:
+                        break
+                    plain.sendall(data)
+
+                plain.setblocking(False)
+                try:
+                    data = plain.recv(65536)
+                except BlockingIOError:
+                    pass
+                else:
+                    if not data:
+                        break
+                    tls.setblocking(True)
+                    tls.sendall(data)
+                    tls.setblocking(False)
+                finally:
+                    plain.setblocking(True)
+        except OSError:
+            pass
+        finally:
+            tls.close()
+            plain.close()
+
+    def _remove_session(self, session: FakeSession) -> None:
+        with self._lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+        for channel in self.channels.values():
+            channel.members.pop(session.nick, None)
+
+    def wait_for_client(
+        self, timeout: float = 10, count: int = 1
+    ) -> FakeSession | None:
+        """
+        Waits until count:th client (counting every connection since start, so reconnects
+        count as well) has connected and returns it. None on timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while len(self._accepted) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+
+                self._new_session.wait(remaining)
+
+            return self._accepted[count - 1]
+
+    # ---- channels ----
+
+    def add_channel(
+        self, name: str, topic: str = "", members: int = 0, ops: int = 1
+    ) -> FakeChannel:
+        """Creates channel with members fake users, first ops of them are operators"""
+        channel = FakeChannel(name, topic)
+        for i in range(members):
+            nick = f"member{i}"
+            channel.members[nick] = "@" if i < ops else "+" if i % 20 == 0 else ""
+
+        self.channels[name] = channel
+        return channel
+
+    def broadcast(self, channel: FakeChannel, line: str) -> None:
+        """Sends line to every connected client on the channel"""
+        for session in list(self.sessions):
+            if session.nick in channel.members:
+                session.send(line)
+
+    def _join(self, session: FakeSession, name: str) -> None:
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.add_channel(name)
+
+        if session.nick in channel.members:
+            return
+
+        channel.members[session.nick] = "@" if self.auto_op else ""
+        join = f":{_mask(session.nick)} JOIN {name}"
+        extended = f"{join} {session.account or '*'} :{session.nick}"
+        for other in list(self.sessions):
+            if other.nick in channel.members:
+                other.send(extended if "extended-join" in other.caps else join)
+        session.send_lines(
+            [session._topic_reply(channel), *session._names_burst(channel)]
+        )
+        with session._changed:
+            session.joined_at[name] = time.monotonic()
+            session._changed.notify_all()
+
+    def set_mode(
+        self,
+        name: str,
+        flag: str,
+        nick: str,
+        source: str = "ChanServ!ChanServ@services.",
+    ) -> None:
+        """Changes membership mode (+o/-o/+v/-v) of nick on channel and tells clients about it"""
+        channel = self.channels[name]
+        if nick not in channel.members:
+            return
+
+        prefix = {"o": "@", "v": "+"}.get(flag[1:], "")
+        if flag.startswith("+"):
+            channel.members[nick] = prefix
+        elif channel.members[nick] == prefix:
+            channel.members[nick] = ""
+
+        self.broadcast(channel, f":{source} MODE {name} {flag} {nick}")
+
+    def set_topic(self, name: str, topic: str, source: str = "ChanServ") -> None:
+        channel = self.channels[name]
+        channel.topic = topic
+        self.broadcast(channel, f":{_mask(source)} TOPIC {name} :{topic}")
+
+    def set_away(self, nick: str, message: str | None) -> None:
+        """Marks member away (None marks back) and tells clients with away-notify about it"""
+        if message is None:
+            self.away.pop(nick, None)
+            line = f":{_mask(nick)} AWAY"
+        else:
+            self.away[nick] = message
+            line = f":{_mask(nick)} AWAY :{message}"
+
+        for session in list(self.sessions):
+            if "away-notify" in session.caps and any(
+                nick in channel.members and session.nick in channel.members
+                for channel in self.channels.values()
+            ):
+                session.send(line)
+
+    def netsplit(self, name: str, fraction: float = 0.5) -> list[str]:
+        """
+        Splits given fraction of fake members off the channel (QUIT with split reason).
+        Returns nicks which quit, pass them to netjoin(...) to bring them back.
+        Connected clients are never split, only fake members.
+        """
+        channel = self.channels[name]
+        connected = {session.nick for session in self.sessions}
+        fake = [nick for nick in channel.members if nick not in connected]
+        split = fake[: int(len(fake) * fraction)]
+        lines = [f":{_mask(nick)} QUIT :{self.name} split.example" for nick in split]
+        for nick in split:
+            del channel.members[nick]
+
+        for session in list(self.sessions):
+            if session.nick not in channel.members:
+                continue
+
+            if "batch" in session.caps:
+                # https://ircv3.net/specs/batches/netsplit
+                batch = f"split{next(self._batch_ids)}"
+                session.send_lines(
+                    (
+                        f":{self.name} BATCH +{batch} netsplit {self.name} split.example",
+                        *(f"@batch={batch} {line}" for line in lines),
+                        f":{self.name} BATCH -{batch}",
+                    )
+                )
+            else:
+                session.send_lines(lines)
+
+        return split
+
+    def netjoin(self, name: str, nicks: Iterable[str]) -> None:
+        """Members come back from netsplit, every one of them rejoins and operators are re-opped"""
+        channel = self.channels[name]
+        lines = []
+        ops = []
+        for nick in nicks:
+            channel.members[nick] = ""
+            lines.append(f":{_mask(nick)} JOIN {name}")
+            ops.append(nick)
+
+        # services re-op returning members in batches like servers do after netjoin
+        for i in range(0, len(ops), 4):
+            batch = ops[i : i + 4]
+            lines.append(
+                f":split.example MODE {name} +{'o' * len(batch)} {' '.join(batch)}"
+            )
+            for nick in batch:
+                channel.members[nick] = "@"
+
+        for session in list(self.sessions):
+            if session.nick in channel.members:
+                session.send_lines(lines)
+
+
+def _report(session: FakeSession, channels: list[str], ping_interval: float) -> None:
+    joined = session.wait_joined(channels)
+    print(
+        f"client {session.nick}: connect -> all channels joined",
+        "timed out" if joined is None else f"{joined * 1000:.1f}ms",
+        file=sys.stderr,
+    )
+    while not session.closed:
+        time.sleep(ping_interval)
+        rtt = session.ping()
+        print(
+            f"client {session.nick}: PING -> PONG",
+            "timed out" if rtt is None else f"{rtt * 1000:.1f}ms",
+            file=sys.stderr,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake IRC server for testing the bot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6667)
+    parser.add_argument(
+        "--channel",
+        action="append",
+        default=[],
+        help="channel to create, can be given multiple times",
+    )
+    parser.add_argument(
+        "--members", type=int, default=0, help="fake members per channel"
+    )
+    parser.add_argument("--topic", default="")
+    parser.add_argument("--ping-interval", type=float, default=5)
+    parser.add_argument(
+        "--disconnect-after",
+        type=float,
+        help="reset every connection after this many seconds to exercise reconnecting",
+    )
+    parser.add_argument(
+        "--account",
+        action="append",
+        default=[],
+        metavar="USER:PASSWORD",
+        help="account accepted by SASL PLAIN, can be given multiple times",
+    )
+    parser.add_argument(
+        "--tls-cert",
+        help="serve TLS with this certificate (PEM, may contain the key as well)",
+    )
+    parser.add_argument("--tls-key", help="private key of --tls-cert")
+    parser.add_argument(
+        "--no-caps",
+        action="store_true",
+        help="behave like server without IRCv3 capability negotiation",
+    )
+    args = parser.parse_args()
+
+    tls = None
+    if args.tls_cert:
+        tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        tls.load_cert_chain(args.tls_cert, args.tls_key)
+
+    server = FakeIRCd(
+        args.host,
+        args.port,
+        caps={} if args.no_caps else None,
+        accounts=dict(account.partition(":")[::2] for account in args.account),
+        tls=tls,
+    )
+    for name in args.channel:
+        server.add_channel(name, args.topic, args.members)
+
+    def on_session(session: FakeSession) -> None:
+        threading.Thread(
+            target=_report,
+            args=(session, args.channel, args.ping_interval),
+            daemon=True,
+        ).start()
+        if args.disconnect_after is not None:
+            timer = threading.Timer(
+                args.disconnect_after, session.disconnect, kwargs={"abort": True}
+            )
+            timer.daemon = True
+            timer.start()
+
+    server.on_session = on_session
+    server.start()
+    print(f"Fake ircd listening on {args.host}:{server.port}", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Stand-in SOCKS5 proxy for testing IRCClient's proxy transport (see src/socks5.py) over loopback.
+
+Proxy supports CONNECT with "no authentication" or username/password (accounts=...) and relays
+data both ways until either end closes. Added latency (latency=...) is slept before every reply
+of the handshake, which makes the cost of negotiating and the benefit of standby connections
+visible on loopback:
+
+    proxy = FakeSocks5Proxy(latency=0.1, accounts={"bot": "secret"})
+    proxy.start()
+    ...  # PROXY_SERVER 127.0.0.1, PROXY_PORT proxy.port in bot's config.json
+    proxy.wait_for_requests(1)           # (host, port) pairs clients asked to connect to
+    proxy.drop_idle()                    # closes connections which haven't sent CONNECT yet
+
+Or from command line:
+
+    python -m tools.fake_socks5 --port 1080 --latency 0.1 --account bot:secret
+
+NOTE: this is testing tool, not a real proxy. Target host names are resolved with blocking
+      getaddrinfo in the connection's thread and BIND/UDP ASSOCIATE aren't supported.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import argparse
+import ipaddress
+import select
+import socket
+import threading
+import time
+
+VERSION = 5
+
+# replies to CONNECT
+_SUCCEEDED = 0x00
+_FAILURE = 0x01
+_REFUSED = 0x05
+_COMMAND_NOT_SUPPORTED = 0x07
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("client closed the connection")
+        data += chunk
+
+    return data
+
+
+class FakeSocks5Proxy:
+    """
+    Fake proxy listening on loopback, every connection is served by its own thread.
+
+    param dict accounts: username -> password pairs, when given clients must authenticate
+    param float latency: seconds slept before every handshake reply
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        accounts: dict[str, str] | None = None,
+        latency: float = 0.0,
+    ):
+        self.accounts: dict[str, str] = dict(accounts or {})
+        self.latency: float = latency
+        # accepted connections and how many of them completed authentication
+        self.connections: int = 0
+        self.authenticated: int = 0
+        # (host, port) of every CONNECT request in the order they were received
+        self.requests: list[tuple[str, int]] = []
+        self._listener = socket.create_server((host, port))
+        self._lock = threading.Lock()
+        self._new_request = threading.Condition(self._lock)
+        # connections which have authenticated but not sent CONNECT yet
+        self._idle: set[socket.socket] = set()
+        self._thread = threading.Thread(
+            target=self._accept_loop, name="fake-socks5", daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self._listener.getsockname()[1]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        try:
+            # wakes up accept loop, close() alone leaves blocked accept() running
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self._listener.close()
+        self.drop_idle()
+
+    def drop_idle(self) -> int:
+        """Closes connections waiting for CONNECT (e.g standby connections), returns their count"""
+        with self._lock:
+            idle, self._idle = self._idle, set()
+
+        for sock in idle:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        return len(idle)
+
+    def wait_for_requests(self, count: int, timeout: float = 10) -> bool:
+        """Waits until count CONNECT requests have been received in total"""
+        with self._lock:
+            return self._new_request.wait_for(
+                lambda: len(self.requests) >= count, timeout
+            )
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+
+            with self._lock:
+                self.connections += 1
+            threading.Thread(
+                target=self._serve, args=(sock,), name="fake-socks5-conn", daemon=True
+            ).start()
+
+    def _reply(self, sock: socket.socket, data: bytes) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        sock.sendall(data)
+
+    def _serve(self, sock: socket.socket) -> None:
+        try:
+            with sock:
+                target = self._handshake(sock)
+                if target is not None:
+                    self._relay(sock, target)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._idle.discard(sock)
+
+    def _handshake(self, sock: socket.socket) -> socket.socket | None:
+        version, count = _recv_exactly(sock, 2)
+        methods = _recv_exactly(sock, count)
+        if version != VERSION:
+            return None
+
+        method = 0x02 if self.accounts else 0x00
+        if method not in methods:
+            self._reply(sock, bytes([VERSION, 0xFF]))
+            return None
+
+        self._reply(sock, bytes([VERSION, method]))
+        if self.accounts:
+            _, length = _recv_exactly(sock, 2)
+            username = _recv_exactly(sock, length).decode("utf-8", errors="replace")
+            password = _recv_exactly(sock, _recv_exactly(sock, 1)[0]).decode(
+                "utf-8", errors="replace"
+            )
+            accepted = self.accounts.get(username) == password
+            self._reply(sock, bytes([1, 0 if accepted else 1]))
+            if not accepted:
+                return None
+
+        with self._lock:
+            self.authenticated += 1
+            self._idle.add(sock)
+
+        _, command, _, address_type = _recv_exactly(sock, 4)
+        with self._lock:
+            self._idle.discard(sock)
+        if address_type == 0x01:
+            host = str(ipaddress.IPv4Address(_recv_exactly(sock, 4)))
+        elif address_type == 0x04:
+            host = str(ipaddress.IPv6Address(_recv_exactly(sock, 16)))
+        else:
+            host = _recv_exactly(sock, _recv_exactly(sock, 1)[0]).decode("idna")
+        port = int.from_bytes(_recv_exactly(sock, 2), "big")
+
+        with self._lock:
+            self.requests.append((host, port))
+            self._new_request.notify_all()
+
+        if command != 0x01:
+            self._reply(sock, self._connect_reply(_COMMAND_NOT_SUPPORTED))
+            return None
+
+        try:
+            target = socket.create_connection((host, port), timeout=10)
+        except ConnectionRefusedError:
+            self._reply(sock, self._connect_reply(_REFUSED))
+            return None
+        except OSError:
+            self._reply(sock, self._connect_reply(_FAILURE))
+            return None
+
+        target.settimeout(None)
+        self._reply(sock, self._connect_reply(_SUCCEEDED, target.getsockname()))
+        return target
+
+    @staticmethod
+    def _connect_reply(status: int, bound: tuple[str, int] = ("0.0.0.0", 0)) -> bytes:
+        address = ipaddress.ip_address(bound[0])
+        return (
+            bytes([VERSION, status, 0, 0x01 if address.version == 4 else 0x04])
+            + address.packed
+            + bound[1].to_bytes(2, "big")
+        )
+
+    @staticmethod
+    def _relay(client: socket.socket, target: socket.socket) -> None:
+        with target:
+            peers = {client: target, target: client}
+            while True:
+                readable, _, _ = select.select(list(peers), [], [])
+                for sock in readable:
+                    data = sock.recv(65536)
+                    if not data:
+                        return
+                    peers[sock].sendall(data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fake SOCKS5 proxy for testing the bot"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1080)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds slept before every handshake reply",
+    )
+    parser.add_argument(
+        "--account",
+        action="append",
+        default=[],
+        metavar="USER:PASSWORD",
+        help="require username/password authentication, can be given multiple times",
+    )
+    args = parser.parse_args()
+
+    accounts = dict(account.partition(":")[::2] for account in args.account)
+    proxy = FakeSocks5Proxy(
+        args.host, args.port, accounts=accounts, latency=args.latency
+    )
+    proxy.start()
+    print(f"Listening on {args.host}:{proxy.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        proxy.stop()
+
+
+if __name__ == "__main__":
+    main()
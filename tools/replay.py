@@ -0,0 +1,180 @@
+"""
+Replays traffic capture (see src/traffic_capture.py) through BotRunner faster than real time.
+
+Received data goes through the same path as in BotRunner.run_forever: LineBuffer framing,
+MessageParser and dispatch to handlers of real BotRunner. Capture file is memory mapped,
+so captures of any size replay without reading them into memory. Lines bot queues as answers
+are dropped, nothing is sent anywhere.
+
+    python -m tools.replay traffic.cap                          # as fast as possible
+    python -m tools.replay traffic.cap --speed 10               # 10x real time
+    python -m tools.replay traffic.cap --repeat 20 --profile cpu
+
+Replay is deterministic, same capture always drives handlers through the same states, which
+makes it good for reproducing incidents and as realistic load for --profile
+(results are written into IRC_BOT_PROFILE_DIR, see src/profiling.py).
+
+NOTE: only message handlers run. Timers of the main loop (health checks, topic schedules,
+      calendar polling) are not driven by the replay.
+"""
+
+from __future__ import (
+    annotations,
+)  # Keep this for compatibility with 3.11 or older
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from src.line_buffer import LineBuffer
+from src.parsing import MessageParser
+from src.profiling import KINDS
+from src.traffic_capture import CONNECTED, RECEIVED, SENT, CaptureReader
+
+# used when capture doesn't contain NICK sent by the bot
+DEFAULT_NICK = "bot"
+
+
+def captured_nick(reader: CaptureReader) -> str:
+    """Nick the bot registered with, handlers need it to tell own messages apart"""
+    for direction, _, payload in reader.records():
+        if direction != SENT:
+            continue
+
+        for line in bytes(payload).splitlines():
+            if line.startswith(b"NICK "):
+                return line[5:].strip().lstrip(b":").decode("utf-8", errors="replace")
+
+    return DEFAULT_NICK
+
+
+def _create_runner(config_dir: str, nick: str):
+    # imported here so that capturing can be disabled before first socket is created
+    from src.client import IRCClient
+    from src.runner import BotRunner
+
+    config_path = os.path.join(config_dir, "config.json")
+    with open(config_path, "w") as fp:
+        json.dump(
+            {
+                "NICK": nick,
+                "SERVER": "127.0.0.1",
+                "PORT": 6667,
+                "IDENT": nick,
+                "REALNAME": nick,
+                "CHAN": [],
+                "PROXY_SERVER": "",
+                "PROXY_PORT": 0,
+            },
+            fp,
+        )
+
+    client = IRCClient(config_path=config_path)
+    # handlers queue replies (e.g PONG) which require connection, nothing is actually sent
+    client.is_connected = True
+    return BotRunner(client)
+
+
+def replay(runner, reader: CaptureReader, speed: float = 0) -> tuple[int, int, int]:
+    """
+    Feeds received data of the capture to runner. speed > 0 keeps timing of the capture
+    sped up by that factor, 0 replays as fast as possible.
+    Returns (lines, bytes, capture duration in ns).
+    """
+    buffer = LineBuffer()
+    client = runner.client
+    lines = 0
+    received = 0
+    timestamp = 0
+    started = time.perf_counter()
+    for direction, timestamp, payload in reader.records():
+        if direction == CONNECTED:
+            buffer.clear()
+            client._reset_connection_state()
+            client.nick = client.config.NICK
+            continue
+
+        if direction != RECEIVED or not payload:
+            continue
+
+        if speed > 0:
+            delay = started + timestamp / 1e9 / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        received += len(payload)
+        buffer.feed(payload)
+        for msg in MessageParser.parse_lines(buffer.lines()):
+            runner._dispatch(msg)
+            lines += 1
+        client.send_queue.clear()
+
+    return lines, received, timestamp
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("capture", help="capture file written by the bot")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="replay at this multiple of real time, 0 (default) replays as fast as possible",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="replay capture this many times"
+    )
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=KINDS,
+        default=[],
+        help="profile the replay, can be given multiple times",
+    )
+    args = parser.parse_args()
+
+    # replaying must not capture anything itself
+    os.environ["IRC_BOT_TRAFFIC_CAPTURE_DIR"] = ""
+
+    try:
+        reader = CaptureReader(args.capture)
+    except (OSError, ValueError) as err:
+        print(err, file=sys.stderr)
+        return 1
+
+    with reader, tempfile.TemporaryDirectory() as config_dir:
+        runner = _create_runner(config_dir, captured_nick(reader))
+        for kind in args.profile:
+            print(runner.profiler.start(kind), file=sys.stderr)
+        runner._update_dispatch()
+
+        lines = received = duration = 0
+        started = time.perf_counter()
+        try:
+            for _ in range(args.repeat):
+                count, size, duration = replay(runner, reader, args.speed)
+                lines += count
+                received += size
+        finally:
+            elapsed = max(time.perf_counter() - started, 1e-9)
+            for outcome in runner.profiler.stop_all():
+                print(outcome, file=sys.stderr)
+            runner.client.socket.close()
+
+    if reader.truncated:
+        print("Capture ends with incomplete record, it was ignored", file=sys.stderr)
+
+    print(
+        f"Replayed {lines} lines ({received / 1024:.1f} KiB) in {elapsed:.3f}s: "
+        f"{lines / elapsed:.0f} lines/s, "
+        f"{duration / 1e9 * args.repeat / elapsed:.1f}x real time",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())